@@ -0,0 +1,248 @@
+"""Content-addressed cache for Excel analysis results.
+
+Results are keyed by the SHA-256 of the workbook bytes plus the parser
+version, so an unchanged model is never re-analyzed. Two tiers are used:
+
+- an in-process LRU tier bounded by the serialized size of its entries
+- an on-disk tier shared by every uvicorn worker on the host
+
+Disk writes go to a temporary file in the target directory followed by an
+atomic ``os.replace``, so concurrent workers never observe partial entries.
+Within a process, ``get_or_compute`` makes concurrent misses on the same key
+wait for a single computation instead of each analyzing the workbook.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def content_hasher():
+    """Incremental hasher for cache keys
+
+    The one place the key's hash algorithm is chosen: uploads hash their
+    chunks with it as they stream to disk and hash_file uses it for files
+    already on disk, so both produce the same key for the same bytes.
+    """
+    return hashlib.sha256()
+
+
+def hash_file(path: str, chunk_size: int = HASH_CHUNK_SIZE) -> str:
+    """SHA-256 hex digest of a file, read in fixed-size chunks"""
+    digest = content_hasher()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_cache_key(content_hash: str, parser_version: str) -> str:
+    """Combine the workbook hash with the parser version"""
+    return f"{content_hash}-v{parser_version}"
+
+
+class AnalysisCache:
+    """Two-tier (memory LRU + disk) cache of serialized pydantic results"""
+
+    def __init__(self, model_type: Type[BaseModel], cache_dir: Optional[str],
+                 max_memory_bytes: int, max_disk_bytes: int = 0):
+        self.model_type = model_type
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Future] = {}
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'shared_computations': 0}
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get(self, key: str) -> Optional[BaseModel]:
+        """Return a cached result, promoting disk hits into memory"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return entry[0]
+
+        payload = self._read_disk(key)
+        if payload is None:
+            with self._lock:
+                self.stats['misses'] += 1
+            return None
+
+        result = self.model_type.model_validate_json(payload)
+        with self._lock:
+            self.stats['disk_hits'] += 1
+        self._remember(key, result, len(payload))
+        return result
+
+    def get_or_compute(self, key: str, compute: Callable[[], BaseModel]) -> Tuple[BaseModel, bool]:
+        """Return ``(result, cached)``, computing and storing the result on a miss
+
+        Concurrent callers missing on the same key share one computation;
+        only the first caller runs ``compute``, the others wait for it and
+        see its result (or its exception) as cached.
+        """
+        result = self.get(key)
+        if result is not None:
+            return result, True
+
+        with self._lock:
+            pending = self._pending.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._pending[key] = Future()
+            else:
+                self.stats['shared_computations'] += 1
+        if not owner:
+            return pending.result(), True
+
+        try:
+            result = compute()
+            self.put(key, result)
+            pending.set_result(result)
+            return result, False
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._pending[key]
+
+    def in_memory(self, key: str) -> bool:
+        """Whether a result is resident in the memory tier (without touching LRU order)"""
+        with self._lock:
+            return key in self._entries
+
+    def put(self, key: str, result: BaseModel) -> None:
+        """Store a result in both tiers"""
+        payload = result.model_dump_json().encode('utf-8')
+        self._remember(key, result, len(payload))
+        self._write_disk(key, payload)
+
+    def discard(self, key: str) -> None:
+        """Drop one entry from both tiers"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._memory_bytes -= entry[1]
+        if self.cache_dir:
+            try:
+                os.remove(self._path_for(key))
+            except FileNotFoundError:
+                pass
+
+    def clear(self) -> None:
+        """Drop the memory tier and every disk entry"""
+        with self._lock:
+            self._entries.clear()
+            self._memory_bytes = 0
+        if not self.cache_dir:
+            return
+        for path, _, _ in self._disk_entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def info(self) -> Dict[str, Any]:
+        """Cache statistics for diagnostics endpoints"""
+        with self._lock:
+            return {
+                **self.stats,
+                'memory_entries': len(self._entries),
+                'memory_bytes': self._memory_bytes,
+                'max_memory_bytes': self.max_memory_bytes,
+                'cache_dir': self.cache_dir
+            }
+
+    def _remember(self, key: str, result: BaseModel, size: int) -> None:
+        if size > self.max_memory_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= previous[1]
+            self._entries[key] = (result, size)
+            self._memory_bytes += size
+
+            # Evict least recently used entries until we fit the budget
+            while self._memory_bytes > self.max_memory_bytes and self._entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._memory_bytes -= evicted_size
+                self.stats['evictions'] += 1
+
+    def _path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        if not self.cache_dir:
+            return None
+        path = self._path_for(key)
+        try:
+            with open(path, 'rb') as f:
+                payload = f.read()
+            # Touch the entry so disk pruning approximates LRU order
+            os.utime(path, None)
+        except FileNotFoundError:
+            return None
+        return payload
+
+    def _write_disk(self, key: str, payload: bytes) -> None:
+        if not self.cache_dir:
+            return
+        path = self._path_for(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+        if self.max_disk_bytes:
+            self._prune_disk()
+
+    def _disk_entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_mtime, stat.st_size
+
+    def _prune_disk(self) -> None:
+        """Remove the oldest disk entries once the tier exceeds its budget"""
+        entries = sorted(self._disk_entries(), key=lambda entry: entry[1])
+        total = sum(size for _, _, size in entries)
+        for path, _, size in entries:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
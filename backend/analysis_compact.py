@@ -0,0 +1,115 @@
+"""Compact, deduplicated encoding of ExcelAnalysisResult.
+
+The full schema serializes every field twice (once in ``section.fields``
+and again in ``section.headings[name]['fields']``) and repeats the same
+type, dataType, unit, section and heading strings on every field. The
+compact schema, requested with ``?compact=true``, instead sends:
+
+- ``fields``: one flat list of positional arrays in ``FIELD_COLUMNS`` order
+- ``strings``: an interned table; columns in ``INTERNED_COLUMNS`` hold an
+  index into it instead of the string itself
+- ``sections``: each with ``fieldRange`` ``[start, count]`` into ``fields``
+  and headings whose ``fields`` are global field indexes
+
+It is serialized with orjson straight from the pydantic models, without a
+``model_dump`` pass. ``src/lib/analysis-compact.ts`` rebuilds the full shape.
+"""
+
+from typing import Any, Dict, List
+
+import orjson
+
+COMPACT_SCHEMA = "compact-1"
+
+FIELD_COLUMNS = (
+    'id', 'name', 'row', 'column', 'type', 'dataType', 'value', 'formula',
+    'isNamedCell', 'namedCell', 'required', 'unit', 'section', 'heading'
+)
+INTERNED_COLUMNS = ('type', 'dataType', 'unit', 'section', 'heading')
+
+
+class _StringTable:
+    def __init__(self):
+        self.strings: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def ref(self, value):
+        if value is None:
+            return None
+        index = self._index.get(value)
+        if index is None:
+            index = len(self.strings)
+            self._index[value] = index
+            self.strings.append(value)
+        return index
+
+
+def _default(value: Any) -> Any:
+    # orjson serializes datetime/date/time natively; anything else (e.g. timedelta) falls back to str
+    return str(value)
+
+
+def _cell_key(field) -> tuple:
+    if isinstance(field, dict):
+        return field['row'], field['column']
+    return field.row, field.column
+
+
+def compact_analysis(analysis) -> Dict[str, Any]:
+    """Build the compact representation of an ExcelAnalysisResult"""
+    strings = _StringTable()
+    ref = strings.ref
+    fields: List[tuple] = []
+    sections = []
+
+    for section in analysis.sections:
+        start = len(fields)
+        # Heading entries are FieldInfo objects on a fresh analysis but plain dicts
+        # once a result has round-tripped through the cache, so match by cell
+        field_indexes = {}
+        for field in section.fields:
+            field_indexes[(field.row, field.column)] = len(fields)
+            fields.append((
+                field.id, field.name, field.row, field.column, ref(field.type), ref(field.dataType),
+                field.value, field.formula, field.isNamedCell, field.namedCell, field.required,
+                ref(field.unit), ref(field.section), ref(field.heading)
+            ))
+
+        headings = {}
+        for name, heading in section.headings.items():
+            headings[name] = {
+                'id': heading.get('id'),
+                'name': heading.get('name'),
+                'fields': [field_indexes[_cell_key(field)] for field in heading.get('fields', [])]
+            }
+
+        compact_section = {
+            'id': section.id,
+            'name': section.name,
+            'row': section.row,
+            'headings': headings,
+            'fieldRange': [start, len(fields) - start]
+        }
+        if section.sheet is not None:
+            compact_section['sheet'] = section.sheet
+        sections.append(compact_section)
+
+    return {
+        'schema': COMPACT_SCHEMA,
+        'totalSheets': analysis.totalSheets,
+        'totalFields': analysis.totalFields,
+        'inputFields': analysis.inputFields,
+        'calculatedFields': analysis.calculatedFields,
+        'formulaPatterns': analysis.formulaPatterns,
+        'analysisTimestamp': analysis.analysisTimestamp,
+        'fieldColumns': list(FIELD_COLUMNS),
+        'internedColumns': list(INTERNED_COLUMNS),
+        'strings': strings.strings,
+        'sections': sections,
+        'fields': fields
+    }
+
+
+def encode_compact_analysis(analysis) -> bytes:
+    """Compact representation serialized with orjson"""
+    return orjson.dumps(compact_analysis(analysis), default=_default)
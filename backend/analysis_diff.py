@@ -0,0 +1,92 @@
+"""Field-level differences between two analyses of a model.
+
+Fields are matched by sheet and cell (``column`` holds the coordinate, e.g.
+``G12``), because field ids restart on every sheet and field names repeat. A
+field found in only one analysis is added or removed; a field found in both
+is changed when any compared attribute differs. Sheets whose sections are
+identical are skipped without looking at their fields, so diffing two
+versions where one sheet changed only walks that sheet.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+COMPARED_ATTRIBUTES = (
+    'name', 'type', 'dataType', 'value', 'formula', 'isNamedCell', 'namedCell', 'unit', 'heading', 'sectionName'
+)
+
+
+def _sections_by_sheet(analysis: BaseModel) -> Dict[Optional[str], List[BaseModel]]:
+    sheets: Dict[Optional[str], List[BaseModel]] = {}
+    for section in analysis.sections:
+        sheets.setdefault(section.sheet, []).append(section)
+    return sheets
+
+
+def _fields_by_cell(sections: List[BaseModel]) -> Dict[str, Dict[str, Any]]:
+    fields = {}
+    for section in sections:
+        for field in section.fields:
+            fields[field.column] = {
+                **field.model_dump(mode='json', include=set(COMPARED_ATTRIBUTES)),
+                'sectionName': section.name
+            }
+    return fields
+
+
+def diff_analyses(base: BaseModel, current: BaseModel, limit: Optional[int] = None) -> Dict[str, Any]:
+    """Added, removed and changed fields of ``current`` relative to ``base``
+
+    ``limit`` caps each list; the summary always counts every difference.
+    """
+    base_sheets = _sections_by_sheet(base)
+    current_sheets = _sections_by_sheet(current)
+    summary = {'added': 0, 'removed': 0, 'changed': 0}
+    added: List[Dict[str, Any]] = []
+    removed: List[Dict[str, Any]] = []
+    changed: List[Dict[str, Any]] = []
+    changed_sheets = []
+
+    def keep(items: List, item: Dict[str, Any]) -> None:
+        if limit is None or len(items) < limit:
+            items.append(item)
+
+    for sheet in list(current_sheets) + [sheet for sheet in base_sheets if sheet not in current_sheets]:
+        old_sections = base_sheets.get(sheet, [])
+        new_sections = current_sheets.get(sheet, [])
+        if old_sections == new_sections:
+            continue
+
+        old_fields = _fields_by_cell(old_sections)
+        new_fields = _fields_by_cell(new_sections)
+        counts: Tuple[int, int, int] = (summary['added'], summary['removed'], summary['changed'])
+        for cell, field in new_fields.items():
+            old = old_fields.get(cell)
+            if old is None:
+                summary['added'] += 1
+                keep(added, {'sheet': sheet, 'cell': cell, **field})
+                continue
+            changes = {
+                attribute: {'from': old[attribute], 'to': field[attribute]}
+                for attribute in COMPARED_ATTRIBUTES if old[attribute] != field[attribute]
+            }
+            if changes:
+                summary['changed'] += 1
+                keep(changed, {'sheet': sheet, 'cell': cell, 'name': field['name'], 'changes': changes})
+        for cell, field in old_fields.items():
+            if cell not in new_fields:
+                summary['removed'] += 1
+                keep(removed, {'sheet': sheet, 'cell': cell, **field})
+
+        if counts != (summary['added'], summary['removed'], summary['changed']):
+            changed_sheets.append(sheet)
+
+    return {
+        'summary': summary,
+        'changedSheets': changed_sheets,
+        'truncated': limit is not None and any(summary[key] > limit for key in summary),
+        'added': added,
+        'removed': removed,
+        'changed': changed
+    }
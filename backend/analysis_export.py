@@ -0,0 +1,74 @@
+"""Streaming tabular exports of stored analyses.
+
+Field rows are read from the analysis store in batches and encoded batch
+by batch, so the first bytes go out immediately and memory stays bounded
+by the batch size rather than the size of the model.
+"""
+
+import csv
+import io
+import json
+from typing import Iterable, Iterator, List, Tuple
+
+# Output columns, one row per field
+EXPORT_COLUMNS = (
+    'sheet', 'sectionId', 'sectionName', 'heading', 'id', 'name', 'row', 'column', 'type',
+    'dataType', 'value', 'formula', 'formulaPattern', 'isNamedCell', 'namedCell', 'required', 'unit'
+)
+
+# Non-string Parquet columns; everything else, including values, is written as text
+PARQUET_TYPES = {'row': 'int64', 'isNamedCell': 'bool_', 'required': 'bool_'}
+
+
+def _export_rows(batch: List[Tuple]) -> Iterator[Tuple]:
+    # Store column order: position, sheet, section_id, section_name, heading, field_id, name,
+    # row, cell, type, data_type, formula, formula_pattern, value, is_named_cell, named_cell, required, unit
+    for (_, sheet, section_id, section_name, heading, field_id, name, row, cell, field_type,
+         data_type, formula, pattern, value, is_named, named_cell, required, unit) in batch:
+        if value is not None:
+            value = json.loads(value)
+            if not isinstance(value, str):
+                value = json.dumps(value)
+        yield (sheet, section_id, section_name, heading, field_id, name, row, cell, field_type,
+               data_type, value, formula, pattern, bool(is_named), named_cell, bool(required), unit)
+
+
+def iter_csv(batches: Iterable[List[Tuple]]) -> Iterator[str]:
+    """CSV text, one chunk per batch of field rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for batch in batches:
+        writer.writerows(_export_rows(batch))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only when the analysis has no fields
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_parquet(batches: Iterable[List[Tuple]]) -> Iterator[bytes]:
+    """Parquet file bytes, one row group per batch of field rows; requires pyarrow"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        (column, getattr(pa, PARQUET_TYPES.get(column, 'string'))()) for column in EXPORT_COLUMNS
+    ])
+    sink = io.BytesIO()
+    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    try:
+        for batch in batches:
+            columns = list(zip(*_export_rows(batch)))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema
+            ))
+            # Each row group is flushed to the sink as it is written
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    finally:
+        writer.close()
+    yield sink.getvalue()
@@ -0,0 +1,107 @@
+"""Analysis sessions keyed by project and version.
+
+A session is a (project id, version id) pair from the frontend's project
+version manager, bound to the analysis last published for it. Bindings live
+in the analysis store, so they survive restarts and are shared by every
+uvicorn worker, and a bound analysis is never pruned from the store.
+
+Results are served through the analysis cache: recently used sessions stay
+resident in its memory tier (bounded by ``ANALYSIS_CACHE_MEMORY_MB``, least
+recently used first out), evicted ones are read back from its disk tier, and
+the store's compressed copy backs both. Opening a session never re-analyzes
+the workbook.
+
+Each binding also remembers the analysis it replaced (the session's previous
+version, or the project's latest version for a new one) so a revised model
+can be diffed field by field against its base.
+
+Requests that name no project use the default session, which behaves like the
+old single current analysis and falls back to the latest stored analysis
+until something is published to it.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from analysis_cache import AnalysisCache
+from analysis_diff import diff_analyses
+from analysis_store import AnalysisStore
+
+DEFAULT_PROJECT_ID = 'default'
+DEFAULT_VERSION_ID = 'current'
+
+SessionKey = Tuple[str, str]
+
+
+def session_key(project_id: Optional[str] = None, version_id: Optional[str] = None) -> SessionKey:
+    """Fill in the default project and version for missing ids"""
+    return project_id or DEFAULT_PROJECT_ID, version_id or DEFAULT_VERSION_ID
+
+
+class AnalysisSessions:
+    """Binds sessions to stored analyses and loads them through the cache"""
+
+    def __init__(self, store: AnalysisStore, cache: AnalysisCache):
+        self.store = store
+        self.cache = cache
+
+    def publish(self, key: SessionKey, analysis: BaseModel, filename: str,
+                cache_key: str) -> Tuple[int, Optional[int]]:
+        """Persist an analysis and bind the session to it, returning (analysis id, base analysis id)"""
+        analysis_id = self.store.save(analysis, filename, cache_key)
+        return analysis_id, self.store.bind_session(key[0], key[1], analysis_id)
+
+    def analysis_id(self, key: SessionKey) -> Optional[int]:
+        session = self.store.session(*key)
+        if session is not None:
+            return session['analysisId']
+        if key == (DEFAULT_PROJECT_ID, DEFAULT_VERSION_ID):
+            return self.store.resolve_id('latest')
+        return None
+
+    def get(self, key: SessionKey) -> Optional[BaseModel]:
+        """The session's analysis from memory, the disk tier or the store, in that order"""
+        session = self.store.session(*key)
+        if session is None:
+            analysis_id = self.analysis_id(key)
+            return self.load(analysis_id) if analysis_id is not None else None
+        return self.load(session['analysisId'], session['cacheKey'])
+
+    def load(self, analysis_id: int, cache_key: Optional[str] = None) -> Optional[BaseModel]:
+        """A stored analysis, through the cache when its key is known"""
+        cache_key = cache_key or self.store.cache_key(analysis_id)
+        analysis = self.cache.get(cache_key) if cache_key else None
+        if analysis is None:
+            analysis = self.store.load(analysis_id)
+            if analysis is not None and cache_key:
+                self.cache.put(cache_key, analysis)
+        return analysis
+
+    def diff(self, key: SessionKey, limit: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Field-level diff of the session's analysis against its base, None without a base"""
+        session = self.store.session(*key)
+        if session is None or session['baseAnalysisId'] is None:
+            return None
+        base = self.load(session['baseAnalysisId'], session['baseCacheKey'])
+        current = self.load(session['analysisId'], session['cacheKey'])
+        if base is None or current is None:
+            return None
+        return {
+            'analysisId': session['analysisId'],
+            'baseAnalysisId': session['baseAnalysisId'],
+            **diff_analyses(base, current, limit)
+        }
+
+    def describe(self, key: SessionKey) -> Optional[Dict[str, Any]]:
+        session = self.store.session(*key)
+        return self._with_residency(session) if session is not None else None
+
+    def list(self, project_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        return [self._with_residency(session) for session in self.store.list_sessions(project_id)]
+
+    def delete(self, key: SessionKey) -> bool:
+        return self.store.delete_session(*key)
+
+    def _with_residency(self, session: Dict[str, Any]) -> Dict[str, Any]:
+        return {**session, 'resident': self.cache.in_memory(session['cacheKey'])}
@@ -0,0 +1,388 @@
+"""Persistent SQLite store for workbook analyses.
+
+Every published analysis is written once: a compressed copy of the full
+result (so /get-analysis survives a restart) plus one row per field with
+indexes on sheet, section, heading, field type, data type and formula
+pattern. Field queries run against those indexes and return only the
+matching page, without deserializing the whole model.
+
+Sessions bind a (project id, version id) pair to one stored analysis and
+remember the analysis it replaced (its base, for diffs); analyses bound to or
+used as the base of a session are never pruned.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    cache_key TEXT NOT NULL UNIQUE,
+    filename TEXT NOT NULL,
+    total_sheets INTEGER NOT NULL,
+    total_fields INTEGER NOT NULL,
+    input_fields INTEGER NOT NULL,
+    calculated_fields INTEGER NOT NULL,
+    analysis_timestamp TEXT NOT NULL,
+    stored_at TEXT NOT NULL,
+    result BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sections (
+    analysis_id INTEGER NOT NULL REFERENCES analyses(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    sheet TEXT,
+    section_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    field_count INTEGER NOT NULL,
+    PRIMARY KEY (analysis_id, position)
+);
+CREATE TABLE IF NOT EXISTS fields (
+    analysis_id INTEGER NOT NULL REFERENCES analyses(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    section_position INTEGER NOT NULL,
+    sheet TEXT,
+    section_id TEXT NOT NULL,
+    section_name TEXT NOT NULL,
+    heading TEXT NOT NULL,
+    field_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    cell TEXT NOT NULL,
+    type TEXT NOT NULL,
+    data_type TEXT NOT NULL,
+    formula TEXT,
+    formula_pattern TEXT,
+    value TEXT,
+    is_named_cell INTEGER NOT NULL,
+    named_cell TEXT,
+    required INTEGER NOT NULL,
+    unit TEXT,
+    PRIMARY KEY (analysis_id, position)
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    project_id TEXT NOT NULL,
+    version_id TEXT NOT NULL,
+    analysis_id INTEGER NOT NULL REFERENCES analyses(id) ON DELETE CASCADE,
+    base_analysis_id INTEGER REFERENCES analyses(id) ON DELETE SET NULL,
+    bound_at TEXT NOT NULL,
+    PRIMARY KEY (project_id, version_id)
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_analysis ON sessions (analysis_id);
+CREATE INDEX IF NOT EXISTS idx_fields_sheet ON fields (analysis_id, sheet);
+CREATE INDEX IF NOT EXISTS idx_fields_section ON fields (analysis_id, section_id);
+CREATE INDEX IF NOT EXISTS idx_fields_heading ON fields (analysis_id, heading);
+CREATE INDEX IF NOT EXISTS idx_fields_type ON fields (analysis_id, type);
+CREATE INDEX IF NOT EXISTS idx_fields_data_type ON fields (analysis_id, data_type);
+CREATE INDEX IF NOT EXISTS idx_fields_pattern ON fields (analysis_id, formula_pattern);
+"""
+
+# Query parameter -> indexed column for exact-match field filters
+FIELD_FILTERS = {
+    'sheet': 'sheet',
+    'section': 'section_id',
+    'heading': 'heading',
+    'type': 'type',
+    'dataType': 'data_type',
+    'pattern': 'formula_pattern',
+}
+
+FIELD_COLUMNS = (
+    'position, sheet, section_id, section_name, heading, field_id, name, row, cell, type, '
+    'data_type, formula, formula_pattern, value, is_named_cell, named_cell, required, unit'
+)
+
+
+def _field_from_row(row: Tuple) -> Dict[str, Any]:
+    (position, sheet, section_id, section_name, heading, field_id, name, row_num, cell, field_type,
+     data_type, formula, pattern, value, is_named, named_cell, required, unit) = row
+    return {
+        'id': field_id,
+        'name': name,
+        'row': row_num,
+        'column': cell,
+        'type': field_type,
+        'dataType': data_type,
+        'value': json.loads(value) if value is not None else None,
+        'formula': formula,
+        'isNamedCell': bool(is_named),
+        'namedCell': named_cell,
+        'required': bool(required),
+        'unit': unit,
+        'section': section_id,
+        'heading': heading,
+        'sheet': sheet,
+        'sectionName': section_name,
+        'formulaPattern': pattern,
+        'position': position
+    }
+
+
+class AnalysisStore:
+    """SQLite-backed history of analyses with indexed field lookup"""
+
+    def __init__(self, db_path: str, model_type: Type[BaseModel],
+                 formula_pattern: Callable[[str], str], max_analyses: int = 20):
+        self.db_path = db_path
+        self.model_type = model_type
+        self.formula_pattern = formula_pattern
+        self.max_analyses = max_analyses
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA foreign_keys=ON')
+        self._conn.executescript(SCHEMA)
+        # Session tables created before sessions remembered their base analysis
+        session_columns = {row[1] for row in self._conn.execute('PRAGMA table_info(sessions)')}
+        if 'base_analysis_id' not in session_columns:
+            self._conn.execute('ALTER TABLE sessions ADD COLUMN base_analysis_id INTEGER '
+                               'REFERENCES analyses(id) ON DELETE SET NULL')
+        self._lock = threading.Lock()
+
+    def save(self, analysis: BaseModel, filename: str, cache_key: str) -> int:
+        """Persist an analysis, returning its id; an identical workbook reuses its row"""
+        with self._lock:
+            existing = self._conn.execute('SELECT id FROM analyses WHERE cache_key = ?', (cache_key,)).fetchone()
+            if existing:
+                # Refresh stored_at so 'latest' follows the most recently published analysis
+                with self._conn:
+                    self._conn.execute(
+                        'UPDATE analyses SET filename = ?, stored_at = ? WHERE id = ?',
+                        (filename, datetime.now().isoformat(), existing[0])
+                    )
+                return existing[0]
+
+            with self._conn:
+                cursor = self._conn.execute(
+                    'INSERT INTO analyses (cache_key, filename, total_sheets, total_fields, input_fields, '
+                    'calculated_fields, analysis_timestamp, stored_at, result) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (cache_key, filename, analysis.totalSheets, analysis.totalFields, analysis.inputFields,
+                     analysis.calculatedFields, analysis.analysisTimestamp, datetime.now().isoformat(),
+                     zlib.compress(analysis.model_dump_json().encode('utf-8')))
+                )
+                analysis_id = cursor.lastrowid
+                self._conn.executemany(
+                    'INSERT INTO sections VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    [
+                        (analysis_id, position, section.sheet, section.id, section.name, section.row, len(section.fields))
+                        for position, section in enumerate(analysis.sections)
+                    ]
+                )
+                self._conn.executemany(
+                    f'INSERT INTO fields (analysis_id, section_position, {FIELD_COLUMNS}) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    self._field_rows(analysis_id, analysis)
+                )
+                self._prune()
+            return analysis_id
+
+    def _field_rows(self, analysis_id: int, analysis: BaseModel):
+        position = 0
+        for section_position, section in enumerate(analysis.sections):
+            for field in section.fields:
+                value = field.model_dump(mode='json', include={'value'})['value']
+                yield (
+                    analysis_id, section_position, position, section.sheet, section.id, section.name,
+                    field.heading, field.id, field.name, field.row, field.column, field.type, field.dataType,
+                    field.formula, self.formula_pattern(field.formula) if field.formula else None,
+                    json.dumps(value) if value is not None else None,
+                    int(field.isNamedCell), field.namedCell, int(field.required), field.unit
+                )
+                position += 1
+
+    def _prune(self) -> None:
+        self._conn.execute(
+            'DELETE FROM analyses WHERE id NOT IN (SELECT id FROM analyses ORDER BY stored_at DESC, id DESC LIMIT ?) '
+            'AND id NOT IN (SELECT analysis_id FROM sessions) '
+            'AND id NOT IN (SELECT base_analysis_id FROM sessions WHERE base_analysis_id IS NOT NULL)',
+            (self.max_analyses,)
+        )
+
+    def bind_session(self, project_id: str, version_id: str, analysis_id: int) -> Optional[int]:
+        """Point a session at a stored analysis, returning its base analysis id
+
+        The base is the analysis the session was bound to before or, for a
+        new version, the analysis of the project's most recently published
+        version. Re-publishing the same analysis keeps the existing base.
+        """
+        with self._lock, self._conn:
+            previous = self._conn.execute(
+                'SELECT analysis_id, base_analysis_id FROM sessions WHERE project_id = ? AND version_id = ?',
+                (project_id, version_id)
+            ).fetchone()
+            if previous is not None:
+                base_id = previous[1] if previous[0] == analysis_id else previous[0]
+            else:
+                row = self._conn.execute(
+                    'SELECT analysis_id FROM sessions WHERE project_id = ? AND analysis_id != ? '
+                    'ORDER BY bound_at DESC LIMIT 1',
+                    (project_id, analysis_id)
+                ).fetchone()
+                base_id = row[0] if row else None
+
+            self._conn.execute(
+                'INSERT INTO sessions (project_id, version_id, analysis_id, base_analysis_id, bound_at) '
+                'VALUES (?, ?, ?, ?, ?) ON CONFLICT (project_id, version_id) DO UPDATE SET '
+                'analysis_id = excluded.analysis_id, base_analysis_id = excluded.base_analysis_id, '
+                'bound_at = excluded.bound_at',
+                (project_id, version_id, analysis_id, base_id, datetime.now().isoformat())
+            )
+            # The analysis two versions back may now be past the history limit
+            self._prune()
+        return base_id
+
+    def session(self, project_id: str, version_id: str) -> Optional[Dict[str, Any]]:
+        sessions = self._query_sessions('s.project_id = ? AND s.version_id = ?', (project_id, version_id))
+        return sessions[0] if sessions else None
+
+    def list_sessions(self, project_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Sessions, most recently bound first, optionally for one project"""
+        if project_id is None:
+            return self._query_sessions('1 = 1', ())
+        return self._query_sessions('s.project_id = ?', (project_id,))
+
+    def _query_sessions(self, where: str, params: Tuple) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT s.project_id, s.version_id, s.analysis_id, s.bound_at, a.cache_key, a.filename, '
+                'a.total_fields, a.analysis_timestamp, s.base_analysis_id, b.cache_key FROM sessions s '
+                'JOIN analyses a ON a.id = s.analysis_id LEFT JOIN analyses b ON b.id = s.base_analysis_id '
+                f'WHERE {where} ORDER BY s.bound_at DESC',
+                params
+            ).fetchall()
+        return [
+            {
+                'projectId': row[0], 'versionId': row[1], 'analysisId': row[2], 'boundAt': row[3],
+                'cacheKey': row[4], 'filename': row[5], 'totalFields': row[6], 'analysisTimestamp': row[7],
+                'baseAnalysisId': row[8], 'baseCacheKey': row[9]
+            }
+            for row in rows
+        ]
+
+    def delete_session(self, project_id: str, version_id: str) -> bool:
+        """Unbind a session; its analysis becomes prunable again"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                'DELETE FROM sessions WHERE project_id = ? AND version_id = ?', (project_id, version_id)
+            )
+            self._prune()
+        return cursor.rowcount > 0
+
+    def cache_key(self, analysis_id: int) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute('SELECT cache_key FROM analyses WHERE id = ?', (analysis_id,)).fetchone()
+        return row[0] if row else None
+
+    def resolve_id(self, analysis_id: str) -> Optional[int]:
+        """Accept a numeric id or 'latest'"""
+        with self._lock:
+            if analysis_id == 'latest':
+                row = self._conn.execute('SELECT id FROM analyses ORDER BY stored_at DESC, id DESC LIMIT 1').fetchone()
+            else:
+                try:
+                    row = self._conn.execute('SELECT id FROM analyses WHERE id = ?', (int(analysis_id),)).fetchone()
+                except ValueError:
+                    return None
+            return row[0] if row else None
+
+    def load(self, analysis_id: int) -> Optional[BaseModel]:
+        with self._lock:
+            row = self._conn.execute('SELECT result FROM analyses WHERE id = ?', (analysis_id,)).fetchone()
+        if row is None:
+            return None
+        return self.model_type.model_validate_json(zlib.decompress(row[0]))
+
+    def list_analyses(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT id, filename, cache_key, total_sheets, total_fields, input_fields, calculated_fields, '
+                'analysis_timestamp, stored_at FROM analyses ORDER BY stored_at DESC, id DESC'
+            ).fetchall()
+        return [
+            {
+                'id': row[0], 'filename': row[1], 'cacheKey': row[2], 'totalSheets': row[3],
+                'totalFields': row[4], 'inputFields': row[5], 'calculatedFields': row[6],
+                'analysisTimestamp': row[7], 'storedAt': row[8]
+            }
+            for row in rows
+        ]
+
+    def sections(self, analysis_id: int, sheet: Optional[str] = None) -> List[Dict[str, Any]]:
+        query = 'SELECT position, sheet, section_id, name, row, field_count FROM sections WHERE analysis_id = ?'
+        params: List[Any] = [analysis_id]
+        if sheet is not None:
+            query += ' AND sheet = ?'
+            params.append(sheet)
+        with self._lock:
+            rows = self._conn.execute(query + ' ORDER BY position', params).fetchall()
+        return [
+            {'position': row[0], 'sheet': row[1], 'id': row[2], 'name': row[3], 'row': row[4], 'fieldCount': row[5]}
+            for row in rows
+        ]
+
+    def query_fields(self, analysis_id: int, filters: Dict[str, Optional[str]], name_contains: Optional[str] = None,
+                     limit: int = 100, offset: int = 0) -> Tuple[int, List[Dict[str, Any]]]:
+        """One page of fields matching the exact-match filters, plus the total match count"""
+        clauses = ['analysis_id = ?']
+        params: List[Any] = [analysis_id]
+        for key, value in filters.items():
+            if value is not None:
+                clauses.append(f'{FIELD_FILTERS[key]} = ?')
+                params.append(value)
+        if name_contains:
+            clauses.append("name LIKE ? ESCAPE '\\'")
+            escaped = name_contains.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            params.append(f'%{escaped}%')
+        where = ' AND '.join(clauses)
+
+        with self._lock:
+            total = self._conn.execute(f'SELECT COUNT(*) FROM fields WHERE {where}', params).fetchone()[0]
+            rows = self._conn.execute(
+                f'SELECT {FIELD_COLUMNS} FROM fields WHERE {where} ORDER BY position LIMIT ? OFFSET ?',
+                params + [limit, offset]
+            ).fetchall()
+        return total, [_field_from_row(row) for row in rows]
+
+    def iter_field_batches(self, analysis_id: int, batch_size: int = 5000) -> Iterator[List[Tuple]]:
+        """Stream every field row of an analysis in position order, batch_size rows at a time
+
+        Uses its own connection so a long export neither holds the store lock
+        nor sees a half-written analysis.
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.execute(
+                f'SELECT {FIELD_COLUMNS} FROM fields WHERE analysis_id = ? ORDER BY position', (analysis_id,)
+            )
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            conn.close()
+
+    def facets(self, analysis_id: int) -> Dict[str, Dict[str, int]]:
+        """Field counts per value of every filterable column"""
+        result = {}
+        with self._lock:
+            for key, column in FIELD_FILTERS.items():
+                if key == 'section':
+                    continue
+                rows = self._conn.execute(
+                    f'SELECT {column}, COUNT(*) FROM fields WHERE analysis_id = ? GROUP BY {column}',
+                    (analysis_id,)
+                ).fetchall()
+                result[key] = {str(value): count for value, count in rows}
+        return result
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,5 @@
+"""Performance benchmarks for the parser, timeline engine and HTTP endpoints.
+
+Run from the backend directory with ``python -m benchmarks.run``; see
+benchmarks/run.py for options and the README for the workflow.
+"""
@@ -0,0 +1,161 @@
+"""Benchmark cases.
+
+Each case is a factory taking a tier name and returning the callable to time;
+everything the factory does (imports, generating the workbook, warming the
+app) happens before measurement starts. Cases run in a fresh interpreter, so
+module-level caches never leak from one case into another.
+"""
+
+from datetime import date
+from typing import Callable, Dict
+
+from benchmarks.workbooks import TIMELINE_YEARS, workbook_path
+
+
+def timeline_inputs(tier: str) -> Dict[str, object]:
+    """Project inputs spanning the tier's number of years"""
+    years = TIMELINE_YEARS[tier]
+    start = date(2025, 1, 1)
+    return {
+        "model_start_date": start.isoformat(),
+        "ppa_signing_date": "2024-06-01",
+        "financial_close_date": "2024-12-01",
+        "construction_period": 24,
+        "scheduled_pcod_as_per_ppa": "2027-01-01",
+        "scheduled_pcod": "2027-01-01",
+        "tenor_of_ppa": max(years - 2, 1),
+        "end_of_commercial_operations": date(start.year + years, 1, 1).isoformat(),
+        "extension_in_ppa": 0,
+        "end_of_extension_period": date(start.year + years, 12, 31).isoformat(),
+        "months_in_quarterly_period": 3
+    }
+
+
+def _analyze_workbook(reader: str):
+    def factory(tier: str) -> Callable[[], object]:
+        import main
+        path = workbook_path(tier)
+
+        def run():
+            workbook = main.load_workbook_for_analysis(path, reader)
+            try:
+                return main.analyze_excel_workbook(workbook, path)
+            finally:
+                workbook.close()
+        return run
+    return factory
+
+
+def _extract_sheet(sheet_name: str):
+    def factory(tier: str) -> Callable[[], object]:
+        import main
+        path = workbook_path(tier)
+
+        def run():
+            workbook = main.load_workbook_for_analysis(path)
+            try:
+                return main.extract_sections_from_sheet(workbook[sheet_name], sheet_name)
+            finally:
+                workbook.close()
+        return run
+    return factory
+
+
+def reanalyze_revised(tier: str) -> Callable[[], object]:
+    """A revised model where only the macro sheet changed, with the previous version already analyzed"""
+    import main
+    from workbook_parts import sheet_fingerprints
+    revised_path = workbook_path(tier, revision=1)
+    main.analyze_changed_sheets(workbook_path(tier), 'base.xlsx')
+    changed_sheet = sheet_fingerprints(revised_path, main.analysis_version(main.detection_templates.default))['Macro']
+
+    def run():
+        main.sheet_cache.discard(changed_sheet)
+        return main.analyze_changed_sheets(revised_path, 'revised.xlsx')
+    return run
+
+
+def resolve_case_selectors(tier: str) -> Callable[[], object]:
+    """Every LiveCase selector of an analyzed model, resolved in one bulk call for another case"""
+    import main
+    from name_index import resolve_references
+    name_index = main.analyze_excel_source(workbook_path(tier), 'model.xlsx').nameIndex
+    refs = list(name_index.selectors)
+
+    def run():
+        return resolve_references(name_index, refs, {"LiveCase": 2})
+    return run
+
+
+def generate_all_timelines(tier: str) -> Callable[[], object]:
+    import main
+    inputs = main.TimelineInputs(**timeline_inputs(tier))
+    main.generate_all_timelines(inputs)
+
+    def run():
+        return main.generate_all_timelines(inputs)
+    return run
+
+
+def _client():
+    import main
+    from fastapi.testclient import TestClient
+    return main, TestClient(main.app)
+
+
+def http_upload_excel(tier: str) -> Callable[[], object]:
+    """Upload, wait for the background job and fetch the compact result, with the cache cleared each time"""
+    import time
+    main, client = _client()
+    path = workbook_path(tier)
+    with open(path, 'rb') as f:
+        payload = f.read()
+
+    def run():
+        client.delete("/cache")
+        response = client.post("/upload-excel", files={"file": ("benchmark.xlsx", payload)})
+        response.raise_for_status()
+        job_id = response.json()["jobId"]
+        while client.get(f"/upload-jobs/{job_id}").json()["status"] not in ("completed", "failed"):
+            time.sleep(0.01)
+        result = client.get(f"/upload-jobs/{job_id}/result", params={"compact": "true"})
+        result.raise_for_status()
+        return result.content
+    return run
+
+
+def http_get_analysis_compact(tier: str) -> Callable[[], object]:
+    main, client = _client()
+    upload = http_upload_excel(tier)
+    upload()
+
+    def run():
+        response = client.get("/get-analysis", params={"compact": "true"})
+        response.raise_for_status()
+        return response.content
+    return run
+
+
+def http_generate_timelines(tier: str) -> Callable[[], object]:
+    main, client = _client()
+    inputs = timeline_inputs(tier)
+
+    def run():
+        response = client.post("/generate-timelines", json=inputs)
+        response.raise_for_status()
+        return response.content
+    return run
+
+
+CASES: Dict[str, Callable[[str], Callable[[], object]]] = {
+    "parser.analyze_excel_workbook": _analyze_workbook("openpyxl"),
+    "parser.analyze_excel_workbook.native": _analyze_workbook("native"),
+    "parser.extract_sections_from_sheet.debt": _extract_sheet("Debt"),
+    "parser.extract_sections_from_sheet.macro": _extract_sheet("Macro"),
+    "parser.reanalyze_revised": reanalyze_revised,
+    "names.resolve_case_selectors": resolve_case_selectors,
+    "timeline.generate_all_timelines": generate_all_timelines,
+    "http.upload_excel": http_upload_excel,
+    "http.get_analysis_compact": http_get_analysis_compact,
+    "http.generate_timelines": http_generate_timelines,
+}
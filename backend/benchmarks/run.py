@@ -0,0 +1,260 @@
+"""Benchmark runner.
+
+    python -m benchmarks.run                          # small and medium tiers, every case
+    python -m benchmarks.run --tier large -k parser   # cases whose name contains 'parser'
+    python -m benchmarks.run --save                   # record the results as the new baselines
+    python -m benchmarks.run --compare                # exit 1 if any case regressed
+
+Every (case, tier) runs in its own interpreter with the caches, store and
+upload directory pointed at a scratch directory. It is warmed up once, timed
+``--repeat`` times, and then run once more under tracemalloc. Reported per
+case:
+
+- ``median_s`` / ``min_s``: wall time of the timed runs
+- ``peak_rss_mb``: the process's peak resident set size (includes the import
+  and setup footprint) and ``rss_growth_mb``, how far the runs pushed it past
+  the setup footprint
+- ``alloc_peak_mb``: peak Python heap allocated during one run (tracemalloc)
+- ``alloc_blocks``: Python memory blocks still allocated after that run
+
+Baselines live in benchmarks/baselines.json together with the machine they
+were recorded on; compare only against baselines from comparable hardware.
+"""
+
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+
+DEFAULT_TIERS = ('small', 'medium')
+
+# Allowed slowdown / memory growth over the baseline before a case counts as a regression
+DEFAULT_TIME_TOLERANCE = 0.25
+DEFAULT_MEMORY_TOLERANCE = 0.20
+COMPARED_METRICS = (
+    ('median_s', 'time'),
+    ('rss_growth_mb', 'memory'),
+    ('alloc_peak_mb', 'memory'),
+)
+# Absolute noise floors below which differences are ignored
+NOISE_FLOORS = {'median_s': 0.005, 'rss_growth_mb': 5.0, 'alloc_peak_mb': 1.0}
+
+
+def _max_rss_mb() -> float:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_case(name: str, tier: str, repeat: int) -> Dict[str, Any]:
+    """Measure one case in this process; called in the child interpreter"""
+    from benchmarks.cases import CASES
+
+    # The app logs every sheet and cache hit; keep the result line clean
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        fn = CASES[name](tier)
+        fn()  # warm-up
+        gc.collect()
+        setup_rss = _max_rss_mb()
+
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - started)
+        peak_rss = _max_rss_mb()
+
+        gc.collect()
+        blocks_before = sys.getallocatedblocks()
+        tracemalloc.start()
+        result = fn()
+        _, alloc_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del result
+        gc.collect()
+        alloc_blocks = sys.getallocatedblocks() - blocks_before
+
+    return {
+        'case': name,
+        'tier': tier,
+        'repeat': repeat,
+        'median_s': round(statistics.median(timings), 4),
+        'min_s': round(min(timings), 4),
+        'peak_rss_mb': round(peak_rss, 1),
+        'rss_growth_mb': round(max(peak_rss - setup_rss, 0.0), 1),
+        'alloc_peak_mb': round(alloc_peak / (1024 * 1024), 2),
+        'alloc_blocks': alloc_blocks,
+    }
+
+
+def spawn_case(name: str, tier: str, repeat: int, workers: int, scratch_dir: str) -> Dict[str, Any]:
+    """Run one case in a fresh interpreter with isolated cache, store and upload paths"""
+    case_dir = tempfile.mkdtemp(prefix=f'{tier}-', dir=scratch_dir)
+    env = dict(
+        os.environ,
+        ANALYSIS_WORKERS=str(workers),
+        ANALYSIS_CACHE_DIR=os.path.join(case_dir, 'cache'),
+        ANALYSIS_STORE_PATH=os.path.join(case_dir, 'store', 'analyses.db'),
+        UPLOAD_DIR=os.path.join(case_dir, 'uploads'),
+        PYTHONPATH=os.pathsep.join(filter(None, [BACKEND_DIR, os.environ.get('PYTHONPATH')])),
+    )
+    completed = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.run', '--child', name, tier, '--repeat', str(repeat)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f'{name}[{tier}] failed:\n{completed.stderr.strip()}')
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def machine_info() -> Dict[str, Any]:
+    return {
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def case_key(result: Dict[str, Any]) -> str:
+    return f"{result['case']}[{result['tier']}]"
+
+
+def load_baselines(path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_baselines(path: str, results: List[Dict[str, Any]]) -> None:
+    """Merge results into the baseline file, keeping cases that were not re-run"""
+    baselines = load_baselines(path) or {'cases': {}}
+    baselines['machine'] = machine_info()
+    baselines['recorded_at'] = datetime.now().isoformat()
+    for result in results:
+        baselines['cases'][case_key(result)] = result
+    baselines['cases'] = dict(sorted(baselines['cases'].items()))
+    with open(path, 'w') as f:
+        json.dump(baselines, f, indent=2)
+        f.write('\n')
+
+
+def compare(results: List[Dict[str, Any]], baselines: Dict[str, Any],
+            time_tolerance: float, memory_tolerance: float) -> List[str]:
+    """Regression messages for every metric that exceeds its tolerance"""
+    regressions = []
+    tolerances = {'time': time_tolerance, 'memory': memory_tolerance}
+    for result in results:
+        baseline = baselines['cases'].get(case_key(result))
+        if baseline is None:
+            continue
+        for metric, kind in COMPARED_METRICS:
+            old, new = baseline.get(metric), result[metric]
+            if old is None or new - old <= NOISE_FLOORS[metric]:
+                continue
+            if new > old * (1 + tolerances[kind]):
+                regressions.append(
+                    f'{case_key(result)} {metric}: {old} -> {new} (+{(new / old - 1) * 100 if old else float("inf"):.0f}%)'
+                )
+    return regressions
+
+
+def print_results(results: List[Dict[str, Any]], baselines: Optional[Dict[str, Any]]) -> None:
+    header = f"{'case':<52} {'median_s':>9} {'min_s':>8} {'rss_mb':>8} {'+rss_mb':>8} {'alloc_mb':>9} {'blocks':>8}"
+    print(header)
+    print('-' * len(header))
+    for result in results:
+        line = (f"{case_key(result):<52} {result['median_s']:>9.4f} {result['min_s']:>8.4f} "
+                f"{result['peak_rss_mb']:>8.1f} {result['rss_growth_mb']:>8.1f} "
+                f"{result['alloc_peak_mb']:>9.2f} {result['alloc_blocks']:>8}")
+        baseline = (baselines or {}).get('cases', {}).get(case_key(result))
+        if baseline and baseline.get('median_s'):
+            line += f"  ({(result['median_s'] / baseline['median_s'] - 1) * 100:+.0f}% time)"
+        print(line)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Backend performance benchmarks')
+    parser.add_argument('--tier', action='append', choices=('small', 'medium', 'large'),
+                        help='size tier to run (repeatable; default: small and medium)')
+    parser.add_argument('-k', '--filter', default='', help='only run cases whose name contains this text')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per case (default: 5)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='ANALYSIS_WORKERS for the cases (default: 1, so RSS covers all parsing)')
+    parser.add_argument('--save', action='store_true', help='store the results as baselines')
+    parser.add_argument('--compare', action='store_true', help='exit 1 if a case regressed against the baselines')
+    parser.add_argument('--baselines', default=BASELINES_PATH, help='baseline file')
+    parser.add_argument('--time-tolerance', type=float, default=DEFAULT_TIME_TOLERANCE)
+    parser.add_argument('--memory-tolerance', type=float, default=DEFAULT_MEMORY_TOLERANCE)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    parser.add_argument('--child', nargs=2, metavar=('CASE', 'TIER'), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(run_case(args.child[0], args.child[1], args.repeat)))
+        return 0
+
+    from benchmarks.cases import CASES
+    from benchmarks.workbooks import workbook_path
+
+    tiers = args.tier or list(DEFAULT_TIERS)
+    names = [name for name in CASES if args.filter in name]
+    if not names:
+        parser.error(f'no cases match {args.filter!r}')
+    # Generate workbooks up front so no case pays for it
+    for tier in tiers:
+        workbook_path(tier)
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix='benchmarks-') as scratch_dir:
+        for tier in tiers:
+            for name in names:
+                print(f'⏱️ {name}[{tier}]', file=sys.stderr)
+                results.append(spawn_case(name, tier, args.repeat, args.workers, scratch_dir))
+
+    baselines = load_baselines(args.baselines)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results, baselines)
+
+    if baselines and baselines.get('machine') != machine_info():
+        print(f"⚠️ Baselines were recorded on {baselines.get('machine')}", file=sys.stderr)
+
+    status = 0
+    if args.compare:
+        if baselines is None:
+            print(f'⚠️ No baselines at {args.baselines}; run with --save first', file=sys.stderr)
+            status = 1
+        else:
+            regressions = compare(results, baselines, args.time_tolerance, args.memory_tolerance)
+            for message in regressions:
+                print(f'❌ {message}', file=sys.stderr)
+            if regressions:
+                status = 1
+            else:
+                print('✅ No regressions against the baselines', file=sys.stderr)
+
+    if args.save:
+        save_baselines(args.baselines, results)
+        print(f'💾 Saved {len(results)} baselines to {args.baselines}', file=sys.stderr)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
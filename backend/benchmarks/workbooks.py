@@ -0,0 +1,136 @@
+"""Synthetic workbooks shaped like the financial models the parser sees.
+
+Each tier writes a debt-financing sheet and a macroeconomic sheet with the
+same structure as the real models: upper-case section banners, short
+heading rows, then field rows with a descriptive label in column E,
+a value or formula in G and a block of period columns from J holding
+INDEX/EDATE/IF/arithmetic formulas. Generation is seeded, so a tier always
+produces the same workbook, and files are cached under benchmarks/.workbooks.
+A non-zero ``revision`` regenerates only the macro sheet, giving a revised
+version of the same model for incremental re-analysis.
+"""
+
+import os
+import random
+from typing import Dict, Tuple
+
+import xlsxwriter
+from xlsxwriter.utility import xl_col_to_name
+
+WORKBOOK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.workbooks')
+
+# tier -> (debt sheet rows, macro sheet rows, period columns)
+TIERS: Dict[str, Tuple[int, int, int]] = {
+    'small': (1400, 900, 12),
+    'medium': (7000, 4500, 12),
+    'large': (14000, 9000, 12),
+}
+
+# Project length in years used by the timeline benchmarks for each tier
+TIMELINE_YEARS = {'small': 10, 'medium': 25, 'large': 50}
+
+DEBT_SECTIONS = [
+    'SENIOR DEBT FACILITY', 'Debt sizing', 'DEBT SERVICE RESERVE ACCOUNT', 'Financing fees',
+    'Construction financing', 'MEZZANINE DEBT', 'Interest during construction', 'Debt repayment profile'
+]
+DEBT_HEADINGS = ['Drawdown schedule', 'Interest calculation', 'Repayment', 'Fees', 'Cover ratios', 'Balances']
+DEBT_LABELS = [
+    'Opening balance of the senior facility loan', 'Drawdown from the senior facility this period',
+    'Scheduled repayment of the senior facility loan', 'Closing balance of the senior facility loan',
+    'Interest rate margin over the base rate', 'All in interest rate for the period',
+    'Interest paid on the senior facility loan', 'Commitment fee on the undrawn facility amount',
+    'Minimum cover ratio required by the lenders', 'Cash available for the senior lenders',
+    'Cash sweep applied to the outstanding loan', 'Repayment period flag for the senior loan'
+]
+MACRO_SECTIONS = [
+    'MACROECONOMIC ASSUMPTIONS', 'Inflation indices', 'Exchange rates', 'Interest rate curves',
+    'Tax assumption', 'Escalation', 'Working capital'
+]
+MACRO_HEADINGS = ['Base case', 'Indexation', 'Local currency', 'Forward curve', 'Rates']
+MACRO_LABELS = [
+    'Consumer price index for the local market', 'Consumer price index for the United States',
+    'Exchange rate of the local currency per USD', 'Escalation factor applied from the base date',
+    'Base date for the indexation of prices', 'Forward curve of the overnight funding rate',
+    'Interest rate on the long term swap', 'Receivable days on the monthly invoices'
+]
+FIRST_PERIOD_COL = 9  # J
+
+
+def workbook_path(tier: str, seed: int = 0, revision: int = 0) -> str:
+    """Path of the tier's workbook, generating it on first use"""
+    suffix = f'-r{revision}' if revision else ''
+    path = os.path.join(WORKBOOK_DIR, f'{tier}-{seed}{suffix}.xlsx')
+    if not os.path.exists(path):
+        os.makedirs(WORKBOOK_DIR, exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        write_workbook(tmp_path, tier, seed, revision)
+        os.replace(tmp_path, path)
+    return path
+
+
+def write_workbook(path: str, tier: str, seed: int = 0, revision: int = 0) -> None:
+    debt_rows, macro_rows, periods = TIERS[tier]
+    rng = random.Random(seed)
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    try:
+        _write_sheet(workbook.add_worksheet('Debt'), debt_rows, periods, rng,
+                     DEBT_SECTIONS, DEBT_HEADINGS, DEBT_LABELS)
+        if revision:
+            rng = random.Random(f'{seed}-{revision}')
+        _write_sheet(workbook.add_worksheet('Macro'), macro_rows, periods, rng,
+                     MACRO_SECTIONS, MACRO_HEADINGS, MACRO_LABELS)
+    finally:
+        workbook.close()
+
+
+def _write_sheet(sheet, rows: int, periods: int, rng: random.Random,
+                 sections, headings, labels) -> None:
+    letters = [xl_col_to_name(FIRST_PERIOD_COL + i) for i in range(periods)]
+    row = 1
+    while row < rows:
+        # Section banner, then headings each followed by a block of field rows
+        sheet.write_string(row, 1, rng.choice(sections))
+        row += 2
+        for _ in range(rng.randint(2, 5)):
+            if row >= rows:
+                break
+            sheet.write_string(row, 3, rng.choice(headings))
+            row += 1
+            for _ in range(rng.randint(5, 30)):
+                if row >= rows:
+                    break
+                _write_field_row(sheet, row, letters, rng, labels)
+                row += 1
+            row += 1
+        row += 1
+
+
+def _write_field_row(sheet, row: int, letters, rng: random.Random, labels) -> None:
+    excel_row = row + 1
+    sheet.write_string(row, 4, rng.choice(labels))
+
+    kind = rng.random()
+    if kind < 0.35:
+        # Input row: a LiveCase selector over the scenario columns
+        sheet.write_formula(row, 6, f'=INDEX(K{excel_row}:M{excel_row},LiveCase)')
+        for col in range(10, 13):
+            sheet.write_number(row, col, round(rng.uniform(0, 1000), 2))
+        return
+    if kind < 0.45:
+        sheet.write_number(row, 6, round(rng.uniform(0, 100), 4))
+        return
+
+    # Time-based row: a total in G and formulas across the period columns
+    sheet.write_formula(row, 6, f'=SUM({letters[0]}{excel_row}:{letters[-1]}{excel_row})')
+    pattern = rng.random()
+    for i, letter in enumerate(letters):
+        previous = xl_col_to_name(FIRST_PERIOD_COL + i - 1)
+        if pattern < 0.3:
+            formula = f'=IF({previous}{excel_row}=0,$F$10,EDATE({previous}{excel_row},1))'
+        elif pattern < 0.6:
+            formula = f'=IF({letter}$7>ConstructionEnd,{previous}{excel_row}*(1+Escalation),0)'
+        elif pattern < 0.8:
+            formula = f'={letter}{excel_row - 1}+{letter}{excel_row - 2}*$G${excel_row}'
+        else:
+            formula = f'=INDEX($K{excel_row}:$M{excel_row},{letter}$5)'
+        sheet.write_formula(row, FIRST_PERIOD_COL + i, formula)
@@ -0,0 +1,935 @@
+"""Excel formula engine with a cell dependency graph.
+
+Formulas captured from the workbook are tokenized, parsed into a small AST
+and compiled into Python closures. The cells form a dependency DAG that is
+evaluated once in topological order; afterwards ``set_inputs`` recomputes
+only the downstream cells whose inputs actually changed, visiting them in
+topological rank order and stopping propagation when a value is unchanged.
+
+Cells are keyed by ``(sheet, row, column)`` internally and exposed as
+``"Sheet!A1"`` references. Dates are handled as Excel serial numbers, as
+they are inside Excel itself. Whole-column and whole-row references
+(``A:A``, ``1:1``) cover the sheet's populated extent, so they never
+materialize a million-row grid.
+"""
+
+import heapq
+import math
+import re
+import threading
+from collections import OrderedDict, defaultdict, deque
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from dateutil.relativedelta import relativedelta
+from openpyxl.utils import column_index_from_string, get_column_letter
+from openpyxl.utils.datetime import from_excel, to_excel
+
+CellKey = Tuple[str, int, int]
+
+# Last row and column of an Excel worksheet, the far edge of A:A and 1:1 references
+MAX_ROW = 1048576
+MAX_COLUMN = 16384
+
+
+class FormulaError(Exception):
+    """Excel error value (#DIV/0!, #VALUE!, ...) raised during evaluation and stored as a cell value"""
+
+    def __init__(self, code: str):
+        super().__init__(code)
+        self.code = code
+
+    def __str__(self):
+        return self.code
+
+    def __eq__(self, other):
+        return isinstance(other, FormulaError) and other.code == self.code
+
+    def __hash__(self):
+        return hash(self.code)
+
+
+class FormulaSyntaxError(ValueError):
+    """Formula text that the parser does not understand"""
+
+
+# ---------------------------------------------------------------------------
+# Tokenizer
+# ---------------------------------------------------------------------------
+
+_SHEET = r"(?:'(?:[^']|'')+'|[A-Za-z_][\w\.]*)"
+_CELL = r"\$?[A-Za-z]{1,3}\$?\d+"
+_COLUMN = r"\$?[A-Za-z]{1,3}"
+_ROW = r"\$?\d+"
+
+TOKEN_RE = re.compile(rf"""
+    (?P<ws>\s+)
+  | (?P<string>"(?:[^"]|"")*")
+  | (?P<error>\#(?:NULL!|DIV/0!|VALUE!|REF!|NAME\?|NUM!|N/A))
+  | (?P<ref>(?:{_SHEET}!)?(?:{_CELL}(?::{_CELL})?|{_COLUMN}:{_COLUMN}|{_ROW}:{_ROW}))(?![\w\(])
+  | (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<func>[A-Za-z_][\w\.]*)(?=\s*\()
+  | (?P<name>(?:{_SHEET}!)?[A-Za-z_\\][\w\.]*)
+  | (?P<op><>|<=|>=|[-+*/^&=<>%])
+  | (?P<lparen>\()
+  | (?P<rparen>\))
+  | (?P<comma>[,;])
+""", re.VERBOSE)
+
+_CELL_RE = re.compile(r"\$?([A-Za-z]{1,3})\$?(\d+)")
+_COLUMN_RE = re.compile(r"\$?([A-Za-z]{1,3})")
+_ROW_RE = re.compile(r"\$?(\d+)")
+
+
+def tokenize(text: str) -> List[Tuple[str, str]]:
+    """Split formula text (without the leading '=') into (kind, text) tokens"""
+    tokens = []
+    position = 0
+    while position < len(text):
+        match = TOKEN_RE.match(text, position)
+        if not match:
+            raise FormulaSyntaxError(f"Unexpected character {text[position]!r} at {position}")
+        kind = match.lastgroup
+        if kind != 'ws':
+            tokens.append((kind, match.group(kind)))
+        position = match.end()
+    return tokens
+
+
+def _split_sheet(text: str, default_sheet: str) -> Tuple[str, str]:
+    if '!' in text:
+        sheet, rest = text.rsplit('!', 1)
+        if sheet.startswith("'"):
+            sheet = sheet[1:-1].replace("''", "'")
+        return sheet, rest
+    return default_sheet, text
+
+
+def _parse_cell(text: str) -> Tuple[int, int]:
+    match = _CELL_RE.fullmatch(text)
+    if not match:
+        raise FormulaSyntaxError(f"Invalid cell reference {text!r}")
+    return int(match.group(2)), column_index_from_string(match.group(1).upper())
+
+
+def _parse_range(start: str, end: str) -> Tuple[int, int, int, int]:
+    """Bounds (r1, c1, r2, c2) of 'A1:B2', whole columns 'A:B' or whole rows '1:2'"""
+    if _COLUMN_RE.fullmatch(start) and _COLUMN_RE.fullmatch(end):
+        c1 = column_index_from_string(_COLUMN_RE.fullmatch(start).group(1).upper())
+        c2 = column_index_from_string(_COLUMN_RE.fullmatch(end).group(1).upper())
+        r1, r2 = 1, MAX_ROW
+    elif _ROW_RE.fullmatch(start) and _ROW_RE.fullmatch(end):
+        r1, r2 = int(_ROW_RE.fullmatch(start).group(1)), int(_ROW_RE.fullmatch(end).group(1))
+        c1, c2 = 1, MAX_COLUMN
+    else:
+        r1, c1 = _parse_cell(start)
+        r2, c2 = _parse_cell(end)
+    if not (1 <= min(r1, r2) and max(r1, r2) <= MAX_ROW and 1 <= min(c1, c2) and max(c1, c2) <= MAX_COLUMN):
+        raise FormulaSyntaxError(f"Range {start}:{end} is outside the worksheet")
+    return min(r1, r2), min(c1, c2), max(r1, r2), max(c1, c2)
+
+
+def parse_cell_key(reference: str, default_sheet: Optional[str] = None) -> CellKey:
+    """Parse an external 'Sheet!A1' (or bare 'A1' with a default sheet) into a cell key"""
+    sheet, cell = _split_sheet(reference.strip(), default_sheet)
+    if sheet is None:
+        raise FormulaSyntaxError(f"Reference {reference!r} needs a sheet name")
+    row, column = _parse_cell(cell)
+    return sheet, row, column
+
+
+def format_cell_key(key: CellKey) -> str:
+    """Render a cell key as an external 'Sheet!A1' reference"""
+    sheet, row, column = key
+    return f"{sheet}!{get_column_letter(column)}{row}"
+
+
+# ---------------------------------------------------------------------------
+# Parser
+# ---------------------------------------------------------------------------
+# AST nodes are tuples whose first element is the node type:
+#   ('num', v) ('str', v) ('bool', v) ('err', code) ('ref', key)
+#   ('range', sheet, r1, c1, r2, c2) ('name', sheet, name)
+#   ('call', fn, [args]) ('binop', op, a, b) ('neg', a) ('pct', a)
+
+COMPARISON_OPS = ('=', '<>', '<', '>', '<=', '>=')
+
+# Excel operator precedence, loosest first; unary minus and % bind tighter than ^
+BINARY_PRECEDENCE = {
+    '=': 1, '<>': 1, '<': 1, '>': 1, '<=': 1, '>=': 1,
+    '&': 2,
+    '+': 3, '-': 3,
+    '*': 4, '/': 4,
+    '^': 5,
+}
+
+
+class _Parser:
+    def __init__(self, tokens: List[Tuple[str, str]], sheet: str):
+        self.tokens = tokens
+        self.position = 0
+        self.sheet = sheet
+
+    def peek(self) -> Tuple[Optional[str], Optional[str]]:
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None, None
+
+    def take(self) -> Tuple[str, str]:
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def expect(self, kind: str) -> None:
+        if self.peek()[0] != kind:
+            raise FormulaSyntaxError(f"Expected {kind}, found {self.peek()[1]!r}")
+        self.position += 1
+
+    def parse(self):
+        node = self.expression()
+        if self.position != len(self.tokens):
+            raise FormulaSyntaxError(f"Unexpected token {self.peek()[1]!r}")
+        return node
+
+    def expression(self, min_precedence: int = 1):
+        """Precedence climbing over the left-associative binary operators"""
+        node = self.unary()
+        while True:
+            kind, text = self.peek()
+            precedence = BINARY_PRECEDENCE.get(text) if kind == 'op' else None
+            if precedence is None or precedence < min_precedence:
+                return node
+            self.position += 1
+            node = ('binop', text, node, self.expression(precedence + 1))
+
+    def unary(self):
+        kind, text = self.peek()
+        if kind == 'op' and text in ('-', '+'):
+            self.take()
+            operand = self.unary()
+            return ('neg', operand) if text == '-' else operand
+        return self.percent()
+
+    def percent(self):
+        node = self.primary()
+        while self.peek() == ('op', '%'):
+            self.take()
+            node = ('pct', node)
+        return node
+
+    def primary(self):
+        if self.position >= len(self.tokens):
+            raise FormulaSyntaxError("Unexpected end of formula")
+        kind, text = self.take()
+        if kind == 'number':
+            return ('num', float(text) if any(c in text for c in '.eE') else int(text))
+        if kind == 'string':
+            return ('str', text[1:-1].replace('""', '"'))
+        if kind == 'error':
+            return ('err', text)
+        if kind == 'ref':
+            sheet, cells = _split_sheet(text, self.sheet)
+            if ':' in cells:
+                return ('range', sheet, *_parse_range(*cells.split(':')))
+            row, column = _parse_cell(cells)
+            return ('ref', (sheet, row, column))
+        if kind == 'func':
+            self.expect('lparen')
+            args = []
+            if self.peek()[0] != 'rparen':
+                while True:
+                    args.append(self.expression())
+                    if self.peek()[0] != 'comma':
+                        break
+                    self.take()
+            self.expect('rparen')
+            return ('call', text.upper(), args)
+        if kind == 'name':
+            upper = text.upper()
+            if upper in ('TRUE', 'FALSE'):
+                return ('bool', upper == 'TRUE')
+            sheet, name = _split_sheet(text, None)
+            return ('name', sheet, name)
+        if kind == 'lparen':
+            node = self.expression()
+            self.expect('rparen')
+            return node
+        raise FormulaSyntaxError(f"Unexpected token {text!r}")
+
+
+def parse_formula(text: str, sheet: str):
+    """Parse formula text (with or without the leading '=') into an AST"""
+    text = text.strip()
+    if text.startswith('='):
+        text = text[1:]
+    return _Parser(tokenize(text), sheet).parse()
+
+
+# ---------------------------------------------------------------------------
+# Value coercion and functions
+# ---------------------------------------------------------------------------
+
+class RangeValue:
+    """Evaluated rectangular range: a list of rows of cell values"""
+
+    __slots__ = ('rows',)
+
+    def __init__(self, rows: List[List[Any]]):
+        self.rows = rows
+
+    def flat(self) -> Iterable[Any]:
+        for row in self.rows:
+            yield from row
+
+
+def _check(value):
+    if isinstance(value, FormulaError):
+        raise value
+    return value
+
+
+def to_scalar(value):
+    if isinstance(value, RangeValue):
+        if len(value.rows) == 1 and len(value.rows[0]) == 1:
+            return _check(value.rows[0][0])
+        raise FormulaError('#VALUE!')
+    return _check(value)
+
+
+def to_number(value) -> float:
+    value = to_scalar(value)
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        try:
+            return float(value.strip().rstrip('%')) / (100 if value.strip().endswith('%') else 1)
+        except ValueError:
+            raise FormulaError('#VALUE!')
+    raise FormulaError('#VALUE!')
+
+
+def to_bool(value) -> bool:
+    value = to_scalar(value)
+    if isinstance(value, str):
+        upper = value.upper()
+        if upper in ('TRUE', 'FALSE'):
+            return upper == 'TRUE'
+        raise FormulaError('#VALUE!')
+    return bool(value)
+
+
+def to_text(value) -> str:
+    value = to_scalar(value)
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _numbers(args) -> List[float]:
+    """Numbers from function arguments: ranges contribute numeric cells only"""
+    numbers = []
+    for arg in args:
+        value = arg()
+        if isinstance(value, RangeValue):
+            for item in value.flat():
+                _check(item)
+                if isinstance(item, (int, float)) and not isinstance(item, bool):
+                    numbers.append(item)
+        else:
+            numbers.append(to_number(value))
+    return numbers
+
+
+def _same_value(a, b) -> bool:
+    return type(a) is type(b) and a == b
+
+
+def _normalize(value):
+    if isinstance(value, float) and value.is_integer() and abs(value) < 2 ** 53:
+        return int(value)
+    return value
+
+
+def _compare(op: str, left, right) -> bool:
+    left, right = to_scalar(left), to_scalar(right)
+    if left is None:
+        left = '' if isinstance(right, str) else 0
+    if right is None:
+        right = '' if isinstance(left, str) else 0
+    if isinstance(left, str) and isinstance(right, str):
+        left, right = left.lower(), right.lower()
+    elif isinstance(left, str) or isinstance(right, str):
+        # Excel orders all numbers before text
+        left, right = isinstance(left, str), isinstance(right, str)
+    if op == '=':
+        return left == right
+    if op == '<>':
+        return left != right
+    if op == '<':
+        return left < right
+    if op == '>':
+        return left > right
+    if op == '<=':
+        return left <= right
+    return left >= right
+
+
+def _arithmetic(op: str, left, right):
+    a, b = to_number(left), to_number(right)
+    if op == '+':
+        return a + b
+    if op == '-':
+        return a - b
+    if op == '*':
+        return a * b
+    if op == '/':
+        if b == 0:
+            raise FormulaError('#DIV/0!')
+        return a / b
+    try:
+        return math.pow(a, b)
+    except (OverflowError, ValueError):
+        raise FormulaError('#NUM!')
+
+
+def _serial_to_date(serial) -> datetime:
+    try:
+        return from_excel(to_number(serial))
+    except (OverflowError, ValueError):
+        raise FormulaError('#NUM!')
+
+
+def _date_to_serial(value) -> float:
+    return _normalize(to_excel(value))
+
+
+def fn_if(args):
+    if len(args) < 2:
+        raise FormulaError('#VALUE!')
+    if to_bool(args[0]()):
+        return args[1]()
+    return args[2]() if len(args) > 2 else False
+
+
+def fn_iferror(args):
+    try:
+        value = args[0]()
+        if isinstance(value, RangeValue):
+            return value
+        return _check(value)
+    except FormulaError:
+        return args[1]()
+
+
+def fn_index(args):
+    source = args[0]()
+    if not isinstance(source, RangeValue):
+        source = RangeValue([[source]])
+    rows = source.rows
+    row_num = int(to_number(args[1]())) if len(args) > 1 else 0
+    col_num = int(to_number(args[2]())) if len(args) > 2 else 0
+
+    # A single row or column may be indexed by one position
+    if len(args) == 2 and len(rows) == 1:
+        row_num, col_num = 1, row_num
+    height, width = len(rows), len(rows[0]) if rows else 0
+    if row_num < 0 or col_num < 0 or row_num > height or col_num > width:
+        raise FormulaError('#REF!')
+    if row_num == 0 and col_num == 0:
+        return source
+    if row_num == 0:
+        return RangeValue([[row[col_num - 1]] for row in rows])
+    if col_num == 0:
+        if width == 1:
+            return rows[row_num - 1][0]
+        return RangeValue([rows[row_num - 1]])
+    return rows[row_num - 1][col_num - 1]
+
+
+def fn_match(args):
+    needle = to_scalar(args[0]())
+    haystack = args[1]()
+    match_type = int(to_number(args[2]())) if len(args) > 2 else 1
+    items = list(haystack.flat()) if isinstance(haystack, RangeValue) else [haystack]
+    if match_type == 0:
+        for position, item in enumerate(items, 1):
+            try:
+                if _compare('=', item, needle):
+                    return position
+            except FormulaError:
+                continue
+        raise FormulaError('#N/A')
+    # Approximate match over sorted data
+    best = None
+    for position, item in enumerate(items, 1):
+        if item is None:
+            continue
+        if (match_type > 0 and _compare('<=', item, needle)) or (match_type < 0 and _compare('>=', item, needle)):
+            best = position
+        else:
+            break
+    if best is None:
+        raise FormulaError('#N/A')
+    return best
+
+
+def fn_choose(args):
+    index = int(to_number(args[0]()))
+    if index < 1 or index >= len(args):
+        raise FormulaError('#VALUE!')
+    return args[index]()
+
+
+def fn_edate(args):
+    start = _serial_to_date(args[0]())
+    months = int(to_number(args[1]()))
+    return _date_to_serial(start + relativedelta(months=months))
+
+
+def fn_eomonth(args):
+    start = _serial_to_date(args[0]())
+    months = int(to_number(args[1]()))
+    end = start.replace(day=1) + relativedelta(months=months + 1) - relativedelta(days=1)
+    return _date_to_serial(end)
+
+
+def fn_date(args):
+    year, month, day = (int(to_number(arg())) for arg in args[:3])
+    try:
+        base = datetime(year, 1, 1) + relativedelta(months=month - 1, days=day - 1)
+    except (OverflowError, ValueError):
+        raise FormulaError('#NUM!')
+    return _date_to_serial(base)
+
+
+def fn_round(args, rounding=None):
+    value = to_number(args[0]())
+    digits = int(to_number(args[1]())) if len(args) > 1 else 0
+    factor = 10 ** digits
+    if rounding is None:
+        # Excel rounds half away from zero
+        return _normalize(math.copysign(math.floor(abs(value) * factor + 0.5), value) / factor)
+    return _normalize(math.copysign(rounding(abs(value) * factor), value) / factor)
+
+
+def fn_sumproduct(args):
+    arrays = []
+    for arg in args:
+        value = arg()
+        arrays.append(list(value.flat()) if isinstance(value, RangeValue) else [to_scalar(value)])
+    if len({len(array) for array in arrays}) > 1:
+        raise FormulaError('#VALUE!')
+    total = 0
+    for items in zip(*arrays):
+        product = 1
+        for item in items:
+            _check(item)
+            product *= item if isinstance(item, (int, float)) and not isinstance(item, bool) else 0
+        total += product
+    return total
+
+
+def _average(args):
+    numbers = _numbers(args)
+    if not numbers:
+        raise FormulaError('#DIV/0!')
+    return sum(numbers) / len(numbers)
+
+
+def _mod(args):
+    a, b = to_number(args[0]()), to_number(args[1]())
+    if b == 0:
+        raise FormulaError('#DIV/0!')
+    return a - b * math.floor(a / b)
+
+
+FUNCTIONS: Dict[str, Callable[[List[Callable[[], Any]]], Any]] = {
+    'SUM': lambda args: sum(_numbers(args)),
+    'MIN': lambda args: min(_numbers(args), default=0),
+    'MAX': lambda args: max(_numbers(args), default=0),
+    'AVERAGE': _average,
+    'COUNT': lambda args: len(_numbers(args)),
+    'ABS': lambda args: abs(to_number(args[0]())),
+    'INT': lambda args: math.floor(to_number(args[0]())),
+    'MOD': _mod,
+    'ROUND': fn_round,
+    'ROUNDUP': lambda args: fn_round(args, math.ceil),
+    'ROUNDDOWN': lambda args: fn_round(args, math.floor),
+    'IF': fn_if,
+    'IFERROR': fn_iferror,
+    'AND': lambda args: all(to_bool(arg()) for arg in args),
+    'OR': lambda args: any(to_bool(arg()) for arg in args),
+    'NOT': lambda args: not to_bool(args[0]()),
+    'INDEX': fn_index,
+    'MATCH': fn_match,
+    'CHOOSE': fn_choose,
+    'EDATE': fn_edate,
+    'EOMONTH': fn_eomonth,
+    'DATE': fn_date,
+    'YEAR': lambda args: _serial_to_date(args[0]()).year,
+    'MONTH': lambda args: _serial_to_date(args[0]()).month,
+    'DAY': lambda args: _serial_to_date(args[0]()).day,
+    'SUMPRODUCT': fn_sumproduct,
+}
+
+
+# ---------------------------------------------------------------------------
+# Model
+# ---------------------------------------------------------------------------
+
+class FormulaCell:
+    __slots__ = ('key', 'text', 'ast', 'compiled', 'precedents', 'ranges', 'rank', 'error')
+
+    def __init__(self, key: CellKey, text: str):
+        self.key = key
+        self.text = text
+        self.ast = None
+        self.compiled: Optional[Callable[[], Any]] = None
+        self.precedents: Set[CellKey] = set()
+        self.ranges: List[Tuple[str, int, int, int, int]] = []
+        self.rank = -1
+        self.error: Optional[str] = None
+
+
+def normalize_input(value):
+    """Convert workbook constants into the engine's value domain"""
+    if isinstance(value, (datetime, date)):
+        return _date_to_serial(value)
+    if isinstance(value, str) and value.startswith('#') and value in (
+            '#NULL!', '#DIV/0!', '#VALUE!', '#REF!', '#NAME?', '#NUM!', '#N/A'):
+        return FormulaError(value)
+    return value
+
+
+class FormulaModel:
+    """Compiled dependency graph over every formula cell of a workbook"""
+
+    def __init__(self, defined_names: Optional[Dict[str, str]] = None):
+        self.values: Dict[CellKey, Any] = {}
+        self.formulas: Dict[CellKey, FormulaCell] = {}
+        self.dependents: Dict[CellKey, Set[CellKey]] = defaultdict(set)
+        self.defined_names = {name.upper(): text for name, text in (defined_names or {}).items()}
+        self._name_asts: Dict[str, Any] = {}
+        self._resolving: Set[str] = set()
+        self._rows_by_sheet: Dict[str, Dict[int, Set[int]]] = defaultdict(lambda: defaultdict(set))
+        # [last row, last column] populated per sheet, where whole-column and whole-row ranges stop
+        self._extent: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+        # Held by callers while reading or updating a shared model
+        self.lock = threading.Lock()
+        self.order: List[CellKey] = []
+        self.cycles: List[CellKey] = []
+
+    # -- building -----------------------------------------------------------
+
+    @classmethod
+    def from_workbook(cls, workbook) -> 'FormulaModel':
+        """Capture constants and formulas from an openpyxl workbook loaded with data_only=False"""
+        defined_names = {}
+        for name, definition in getattr(workbook, 'defined_names', {}).items():
+            if getattr(definition, 'attr_text', None):
+                defined_names[name] = definition.attr_text
+
+        model = cls(defined_names)
+        for sheet_name in workbook.sheetnames:
+            sheet = workbook[sheet_name]
+            if hasattr(sheet, 'reset_dimensions'):
+                sheet.reset_dimensions()
+            for row in sheet.iter_rows():
+                for cell in row:
+                    value = cell.value
+                    if value is None:
+                        continue
+                    key = (sheet_name, cell.row, cell.column)
+                    if cell.data_type == 'f':
+                        model.add_formula(key, getattr(value, 'text', None) or str(value))
+                    else:
+                        model.add_constant(key, value)
+        model.compile()
+        return model
+
+    def add_constant(self, key: CellKey, value: Any) -> None:
+        self.values[key] = normalize_input(value)
+        self._populate(key)
+
+    def add_formula(self, key: CellKey, text: str) -> None:
+        self.formulas[key] = FormulaCell(key, text)
+        self.values[key] = None
+        self._populate(key)
+
+    def _populate(self, key: CellKey) -> None:
+        sheet, row, column = key
+        self._rows_by_sheet[sheet][row].add(column)
+        extent = self._extent[sheet]
+        extent[0] = max(extent[0], row)
+        extent[1] = max(extent[1], column)
+
+    def compile(self) -> None:
+        """Parse every formula, wire the dependency graph and compute a topological order"""
+        self.dependents = defaultdict(set)
+        for cell in self.formulas.values():
+            cell.precedents = set()
+            cell.ranges = []
+            try:
+                cell.ast = parse_formula(cell.text, cell.key[0])
+                cell.compiled = self._compile(cell.ast, cell)
+                cell.error = None
+            except FormulaSyntaxError as e:
+                cell.compiled = None
+                cell.error = str(e)
+            for precedent in cell.precedents:
+                self.dependents[precedent].add(cell.key)
+        self._order()
+
+    def _order(self) -> None:
+        # Kahn's algorithm restricted to formula-to-formula edges
+        indegree = {key: 0 for key in self.formulas}
+        for key, cell in self.formulas.items():
+            for precedent in cell.precedents:
+                if precedent in self.formulas:
+                    indegree[key] += 1
+
+        queue = deque(sorted(key for key, degree in indegree.items() if degree == 0))
+        order = []
+        while queue:
+            key = queue.popleft()
+            self.formulas[key].rank = len(order)
+            order.append(key)
+            for dependent in self.dependents.get(key, ()):
+                if dependent in indegree:
+                    indegree[dependent] -= 1
+                    if indegree[dependent] == 0:
+                        queue.append(dependent)
+
+        self.order = order
+        self.cycles = [key for key, degree in indegree.items() if degree > 0]
+        for offset, key in enumerate(self.cycles):
+            self.formulas[key].rank = len(order) + offset
+
+    def _range_cells(self, sheet: str, r1: int, c1: int, r2: int, c2: int) -> Iterable[CellKey]:
+        rows = self._rows_by_sheet.get(sheet)
+        if not rows:
+            return
+        # Walk whichever is smaller: the range's rows or the sheet's populated rows
+        candidates = range(r1, r2 + 1) if r2 - r1 + 1 <= len(rows) else list(rows.keys())
+        for row in candidates:
+            if r1 <= row <= r2 and row in rows:
+                for column in rows[row]:
+                    if c1 <= column <= c2:
+                        yield sheet, row, column
+
+    def _resolve_name(self, sheet: Optional[str], name: str, cell: FormulaCell):
+        upper = name.upper()
+        if upper not in self.defined_names:
+            return None
+        if upper not in self._name_asts:
+            try:
+                self._name_asts[upper] = parse_formula(self.defined_names[upper], sheet or cell.key[0])
+            except FormulaSyntaxError:
+                self._name_asts[upper] = None
+        return self._name_asts[upper]
+
+    def _compile(self, node, cell: FormulaCell) -> Callable[[], Any]:
+        kind = node[0]
+        values = self.values
+
+        if kind in ('num', 'str', 'bool'):
+            constant = node[1]
+            return lambda: constant
+        if kind == 'err':
+            error = FormulaError(node[1])
+            return lambda: error
+        if kind == 'ref':
+            key = node[1]
+            cell.precedents.add(key)
+            return lambda: values.get(key)
+        if kind == 'range':
+            _, sheet, r1, c1, r2, c2 = node
+            cell.ranges.append((sheet, r1, c1, r2, c2))
+            cell.precedents.update(self._range_cells(sheet, r1, c1, r2, c2))
+            if r2 == MAX_ROW or c2 == MAX_COLUMN:
+                # Whole columns or rows stop at the sheet's populated extent, read when evaluated
+                extent = self._extent[sheet]
+                return lambda: RangeValue([
+                    [values.get((sheet, row, column)) for column in range(c1, min(c2, extent[1]) + 1)]
+                    for row in range(r1, min(r2, extent[0]) + 1)
+                ])
+            keys = [[(sheet, row, column) for column in range(c1, c2 + 1)] for row in range(r1, r2 + 1)]
+            return lambda: RangeValue([[values.get(key) for key in row] for row in keys])
+        if kind == 'name':
+            upper = node[2].upper()
+            target = self._resolve_name(node[1], node[2], cell)
+            if target is None or upper in self._resolving:
+                error = FormulaError('#NAME?')
+                return lambda: error
+            self._resolving.add(upper)
+            try:
+                return self._compile(target, cell)
+            finally:
+                self._resolving.discard(upper)
+        if kind == 'neg':
+            operand = self._compile(node[1], cell)
+            return lambda: -to_number(operand())
+        if kind == 'pct':
+            operand = self._compile(node[1], cell)
+            return lambda: to_number(operand()) / 100
+        if kind == 'binop':
+            op = node[1]
+            left = self._compile(node[2], cell)
+            right = self._compile(node[3], cell)
+            if op in COMPARISON_OPS:
+                return lambda: _compare(op, left(), right())
+            if op == '&':
+                return lambda: to_text(left()) + to_text(right())
+            return lambda: _arithmetic(op, left(), right())
+        if kind == 'call':
+            function = FUNCTIONS.get(node[1])
+            args = [self._compile(arg, cell) for arg in node[2]]
+            if function is None:
+                error = FormulaError('#NAME?')
+                return lambda: error
+            return lambda: function(args)
+        raise FormulaSyntaxError(f"Unknown node {kind}")
+
+    # -- evaluation ---------------------------------------------------------
+
+    def _evaluate(self, cell: FormulaCell) -> Any:
+        if cell.compiled is None:
+            return FormulaError('#NAME?')
+        try:
+            value = cell.compiled()
+            if isinstance(value, RangeValue):
+                value = to_scalar(value)
+            return _normalize(value)
+        except FormulaError as e:
+            return e
+        except (TypeError, ValueError, OverflowError, ZeroDivisionError, IndexError):
+            return FormulaError('#VALUE!')
+
+    def evaluate_all(self) -> int:
+        """Evaluate every formula in topological order; cycles evaluate to #CIRC!"""
+        for key in self.order:
+            self.values[key] = self._evaluate(self.formulas[key])
+        circular = FormulaError('#CIRC!')
+        for key in self.cycles:
+            self.values[key] = circular
+        return len(self.order)
+
+    def _register_new_cell(self, key: CellKey) -> None:
+        """Link a previously blank cell into any ranges that cover it"""
+        self._populate(key)
+        sheet, row, column = key
+        for cell in self.formulas.values():
+            for r_sheet, r1, c1, r2, c2 in cell.ranges:
+                if r_sheet == sheet and r1 <= row <= r2 and c1 <= column <= c2:
+                    cell.precedents.add(key)
+                    self.dependents[key].add(cell.key)
+
+    def set_inputs(self, updates: Dict[CellKey, Any]) -> Tuple[Dict[CellKey, Any], int]:
+        """Change input cells and recompute only their dirty downstream formulas
+
+        Returns the cells whose value changed (inputs and formulas) and the
+        number of formula cells that were recomputed, changed or not.
+        """
+        changed: Dict[CellKey, Any] = {}
+        recalculated = 0
+        heap: List[Tuple[int, CellKey]] = []
+        queued: Set[CellKey] = set()
+
+        def enqueue_dependents(key):
+            for dependent in self.dependents.get(key, ()):
+                if dependent not in queued:
+                    queued.add(dependent)
+                    heapq.heappush(heap, (self.formulas[dependent].rank, dependent))
+
+        for key, raw in updates.items():
+            if key in self.formulas:
+                raise ValueError(f"{format_cell_key(key)} is a formula cell and cannot be set")
+            if key not in self.values:
+                self._register_new_cell(key)
+            value = normalize_input(raw)
+            if key not in self.values or not _same_value(self.values[key], value):
+                self.values[key] = value
+                changed[key] = value
+                enqueue_dependents(key)
+
+        # Visit dirty cells in topological order, cutting off unchanged branches
+        while heap:
+            _, key = heapq.heappop(heap)
+            queued.discard(key)
+            cell = self.formulas[key]
+            if key in self.cycles:
+                continue
+            value = self._evaluate(cell)
+            recalculated += 1
+            if not _same_value(self.values.get(key), value):
+                self.values[key] = value
+                changed[key] = value
+                enqueue_dependents(key)
+        return changed, recalculated
+
+    # -- inspection ---------------------------------------------------------
+
+    def get(self, key: CellKey) -> Any:
+        return self.values.get(key)
+
+    def describe(self, key: CellKey) -> Dict[str, Any]:
+        cell = self.formulas.get(key)
+        return {
+            'cell': format_cell_key(key),
+            'value': export_value(self.values.get(key)),
+            'formula': cell.text if cell else None,
+            'precedents': sorted(format_cell_key(p) for p in cell.precedents) if cell else [],
+            'dependents': sorted(format_cell_key(d) for d in self.dependents.get(key, ())),
+            'error': cell.error if cell else None
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'cells': len(self.values),
+            'formulas': len(self.formulas),
+            'constants': len(self.values) - len(self.formulas),
+            'edges': sum(len(cell.precedents) for cell in self.formulas.values()),
+            'parseErrors': sum(1 for cell in self.formulas.values() if cell.error),
+            'circularCells': len(self.cycles),
+            'definedNames': len(self.defined_names)
+        }
+
+
+class FormulaModelStore:
+    """Bounded LRU of compiled formula models keyed by analysis session"""
+
+    def __init__(self, max_models: int):
+        self.max_models = max_models
+        self._models: "OrderedDict[Tuple[str, str], FormulaModel]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, str]) -> Optional[FormulaModel]:
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+            return model
+
+    def put(self, key: Tuple[str, str], model: FormulaModel) -> None:
+        with self._lock:
+            self._models[key] = model
+            self._models.move_to_end(key)
+            while len(self._models) > self.max_models:
+                self._models.popitem(last=False)
+
+
+def export_value(value: Any) -> Any:
+    """JSON-friendly rendering of an engine value"""
+    if isinstance(value, FormulaError):
+        return str(value)
+    if isinstance(value, float) and (math.isnan(value) or math.isinf(value)):
+        return '#NUM!'
+    return value
@@ -0,0 +1,337 @@
+"""Lightweight metrics: counters, latency histograms and stage timing spans.
+
+Everything is recorded into one in-process registry and rendered in the
+Prometheus text exposition format by ``/metrics``. The mode decides what is
+recorded:
+
+- ``off``: nothing; every call returns immediately
+- ``sampled`` (default): counters and endpoint latency for every request,
+  stage spans for a ``sample_rate`` fraction of operations
+- ``full``: counters, endpoint latency and stage spans for every operation
+
+The sampling decision is made once per operation (an analysis, a timeline
+request) with ``start_trace`` and stored in a context variable, so all spans
+of a sampled operation are kept together. Work done in another process
+accumulates into a ``StageTimer`` that is shipped back and merged.
+"""
+
+import bisect
+import contextvars
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+OFF = 'off'
+SAMPLED = 'sampled'
+FULL = 'full'
+MODES = (OFF, SAMPLED, FULL)
+
+PROMETHEUS_MEDIA_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; spans from sub-millisecond detection passes up to multi-minute workbooks
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+_sampled: contextvars.ContextVar[bool] = contextvars.ContextVar('metrics_sampled', default=False)
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Sequence[Tuple[str, str]] = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _label_key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        lines.extend(f'{self.name}{_format_labels(key)} {_format_value(value)}'
+                     for key, value in sorted(self._values.items()))
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        # label key -> [per-bucket counts (+Inf last), sum, count]
+        self._values: Dict[LabelKey, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        self.observe_many(value, 1, **labels)
+
+    def observe_many(self, total: float, count: int, **labels) -> None:
+        """Record ``count`` observations averaging ``total / count`` (merged worker timings)"""
+        key = _label_key(labels)
+        entry = self._values.get(key)
+        if entry is None:
+            entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect.bisect_left(self.buckets, total / count if count else 0)] += count
+        entry[1] += total
+        entry[2] += count
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for key, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{_format_labels(key, [("le", _format_value(bound))])} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(key)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(key)} {count}')
+        return lines
+
+
+class StageTimer:
+    """Local accumulator for the stages and counts of one unit of work
+
+    Hot loops add to plain dicts here instead of taking the registry lock;
+    ``Metrics.record`` merges the totals once the work is done. Snapshots are
+    plain dicts, so a timer can be filled in a worker process and merged in
+    the parent.
+    """
+
+    __slots__ = ('timed', 'seconds', 'calls', 'counts')
+
+    def __init__(self, timed: bool = True):
+        self.timed = timed
+        self.seconds: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        self.counts: Dict[str, int] = {}
+
+    def add_time(self, stage: str, seconds: float, calls: int = 1) -> None:
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+        self.calls[stage] = self.calls.get(stage, 0) + calls
+
+    def count(self, name: str, amount: int = 1) -> None:
+        self.counts[name] = self.counts.get(name, 0) + amount
+
+    @contextmanager
+    def stage(self, stage: str) -> Iterator[None]:
+        if not self.timed:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - started)
+
+    def timed_iter(self, stage: str, iterable) -> Iterator:
+        """Yield from ``iterable``, adding the time spent producing items as one ``stage`` call"""
+        if not self.timed:
+            yield from iterable
+            return
+        iterator = iter(iterable)
+        clock = time.perf_counter
+        total = 0.0
+        try:
+            while True:
+                started = clock()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    total += clock() - started
+                    break
+                total += clock() - started
+                yield item
+        finally:
+            self.add_time(stage, total)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        return {'seconds': self.seconds, 'calls': self.calls, 'counts': self.counts}
+
+
+class Metrics:
+    """Registry of every metric plus the current mode"""
+
+    def __init__(self, mode: str = SAMPLED, sample_rate: float = 0.1):
+        self._lock = threading.Lock()
+        self.configure(mode, sample_rate)
+        self.counters: Dict[str, Counter] = {}
+        self.histograms: Dict[str, Histogram] = {}
+        self._collectors: List[Callable[[], List[str]]] = []
+
+        self.stage_seconds = self.histogram('app_stage_duration_seconds', 'Duration of instrumented stages')
+        self.request_seconds = self.histogram('http_request_duration_seconds',
+                                              'Time to response headers per endpoint')
+
+    def configure(self, mode: str, sample_rate: Optional[float] = None) -> None:
+        if mode not in MODES:
+            raise ValueError(f"Unknown metrics mode: {mode} (expected one of {', '.join(MODES)})")
+        if sample_rate is not None and not 0 <= sample_rate <= 1:
+            raise ValueError("sample_rate must be between 0 and 1")
+        self.mode = mode
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != OFF
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        with self._lock:
+            return self.counters.setdefault(name, Counter(name, help_text))
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        with self._lock:
+            return self.histograms.setdefault(name, Histogram(name, help_text, buckets))
+
+    def add_collector(self, collector: Callable[[], List[str]]) -> None:
+        """Register a callback that renders extra exposition lines at scrape time"""
+        self._collectors.append(collector)
+
+    def inc(self, counter: Counter, amount: float = 1, **labels) -> None:
+        if self.mode == OFF:
+            return
+        with self._lock:
+            counter.inc(amount, **labels)
+
+    def observe(self, histogram: Histogram, value: float, **labels) -> None:
+        if self.mode == OFF:
+            return
+        with self._lock:
+            histogram.observe(value, **labels)
+
+    def start_trace(self) -> bool:
+        """Decide whether the operation starting in this context records stage spans"""
+        sampled = self.mode == FULL or (self.mode == SAMPLED and random.random() < self.sample_rate)
+        _sampled.set(sampled)
+        return sampled
+
+    def sampling(self) -> bool:
+        """Whether the current operation records stage spans"""
+        return self.mode == FULL or (self.mode == SAMPLED and _sampled.get())
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        """Time a block into app_stage_duration_seconds if the current operation is sampled"""
+        if not self.sampling():
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(self.stage_seconds, time.perf_counter() - started, stage=stage)
+
+    def timer(self) -> StageTimer:
+        return StageTimer(timed=self.sampling())
+
+    def record(self, snapshot: Dict[str, Dict], counters: Dict[str, Tuple[Counter, Dict[str, str]]]) -> None:
+        """Merge a StageTimer snapshot; ``counters`` maps count names to (counter, labels)"""
+        if self.mode == OFF:
+            return
+        with self._lock:
+            for stage, seconds in snapshot['seconds'].items():
+                self.stage_seconds.observe_many(seconds, snapshot['calls'][stage], stage=stage)
+            for name, amount in snapshot['counts'].items():
+                if name in counters:
+                    counter, labels = counters[name]
+                    counter.inc(amount, **labels)
+
+    def render(self) -> str:
+        lines = [
+            '# HELP app_metrics_mode Current instrumentation mode',
+            '# TYPE app_metrics_mode gauge',
+        ]
+        lines.extend(f'app_metrics_mode{{mode="{mode}"}} {int(mode == self.mode)}' for mode in MODES)
+        with self._lock:
+            for counter in self.counters.values():
+                lines.extend(counter.render())
+            for histogram in self.histograms.values():
+                lines.extend(histogram.render())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return '\n'.join(lines) + '\n'
+
+    def reset(self) -> None:
+        with self._lock:
+            for counter in self.counters.values():
+                counter._values.clear()
+            for histogram in self.histograms.values():
+                histogram._values.clear()
+
+
+def gauge_lines(name: str, help_text: str, samples: Sequence[Tuple[Dict[str, str], float]],
+                metric_type: str = 'gauge') -> List[str]:
+    """Exposition lines for a metric read at scrape time"""
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} {metric_type}']
+    lines.extend(f'{name}{_format_labels(_label_key(labels))} {_format_value(value)}' for labels, value in samples)
+    return lines
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-endpoint latency and starting a trace per request
+
+    Latency is measured to the response headers, so streamed bodies count
+    their time to first byte. Requests are labelled by route template to keep
+    the label set bounded.
+    """
+
+    def __init__(self, app, registry: Optional['Metrics'] = None):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        registry = self.registry or metrics
+        if scope['type'] != 'http' or not registry.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        registry.start_trace()
+        started = time.perf_counter()
+        recorded = False
+
+        def observe(status: int) -> None:
+            nonlocal recorded
+            if recorded:
+                return
+            recorded = True
+            route = scope.get('route')
+            registry.observe(
+                registry.request_seconds, time.perf_counter() - started,
+                method=scope['method'], route=getattr(route, 'path', 'unmatched'), status=status
+            )
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                observe(message['status'])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            observe(500)
+            raise
+
+
+metrics = Metrics(
+    os.environ.get('METRICS_MODE', SAMPLED),
+    float(os.environ.get('METRICS_SAMPLE_RATE', '0.1'))
+)
@@ -1,15 +1,54 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+import numpy as np
+import aiofiles
 import pandas as pd
 import openpyxl
 from openpyxl import load_workbook
+from openpyxl.utils import get_column_letter
 import json
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Iterator, Tuple, Callable
 from pydantic import BaseModel
+import asyncio
+import io
 import os
 from datetime import datetime
 import re
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from analysis_compact import encode_compact_analysis
+from analysis_diff import diff_analyses
+from analysis_export import iter_csv, iter_parquet
+from analysis_sessions import AnalysisSessions, SessionKey, session_key
+from analysis_store import AnalysisStore
+from analysis_cache import AnalysisCache, content_hasher, hash_file, make_cache_key
+from name_index import (
+    NameIndex, SheetNames, SheetNameScan, capture_ranges, index_defined_names, merge_name_index,
+    resolve_references, workbook_defined_names
+)
+from instrumentation import PROMETHEUS_MEDIA_TYPE, MetricsMiddleware, StageTimer, gauge_lines, metrics
+from formula_engine import (
+    CellKey, FormulaModel, FormulaModelStore, FormulaSyntaxError, export_value, format_cell_key, parse_cell_key
+)
+from profiling import ProfileStore, ProfilingDisabled
+from row_detection import FIELD, HEADING, SECTION, DetectionTemplate, DetectionTemplates
+from period_calendar import PeriodCalendar, get_period_calendar, period_calendar_cache_info
+from timeline_export import XLSX_MEDIA_TYPE, write_timeline_workbook
+from timeline_rules import DEFAULT_FIELDS_PATH, TimelineRuleSource
+from timeline_store import TimelineHandle, TimelineStore, timeline_id_for
+from upload_jobs import JobQueueFull, UploadJob, UploadJobManager
+from workbook_parts import WorkbookPackageError, read_defined_names, sheet_fingerprints
+from xlsx_reader import XlsxSheet, XlsxWorkbook
+from timeline_engine import (
+    DATE_KINDS, MONTH_START, ROLLUP_AGGREGATIONS, ROW_METRICS,
+    evaluate_case_stack, evaluate_kind_stack, evaluate_rule, rollup_stack, summarize_stack
+)
+from timeline_encoding import COLUMNAR_MEDIA_TYPE, encode_timeline_response, wants_columnar
 
 app = FastAPI(
     title="Financial Dashboard Backend",
@@ -26,6 +65,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Endpoint latency histograms and per-request trace sampling, see instrumentation.py
+app.add_middleware(MetricsMiddleware)
+
 # Pydantic models
 class FieldInfo(BaseModel):
     id: str
@@ -46,6 +88,7 @@ class FieldInfo(BaseModel):
 class SectionInfo(BaseModel):
     id: str
     name: str
+    sheet: Optional[str] = None
     row: int
     headings: Dict[str, Any]
     fields: List[FieldInfo]
@@ -58,15 +101,209 @@ class ExcelAnalysisResult(BaseModel):
     sections: List[SectionInfo]
     formulaPatterns: Dict[str, int]
     analysisTimestamp: str
+    # Defined names and case selectors, served by /analyses/{id}/names and the resolve endpoints
+    nameIndex: Optional[NameIndex] = None
+
+# Called as progress(sheet_name, sheets_done, sheets_total) while a workbook is analyzed
+ProgressCallback = Callable[[str, int, int], None]
+
+# Compact streamed row representation: (column, value, formula) per non-empty cell
+RowCells = List[Tuple[int, Any, Optional[str]]]
+
+class SheetAnalysis(BaseModel):
+    """Cached sections and name-index fragment of one sheet, keyed by the sheet's fingerprint"""
+    sections: List[SectionInfo]
+    names: SheetNames = SheetNames()
 
 class FormulaPattern(BaseModel):
     pattern: str
     count: int
     examples: List[str]
 
+# Bump whenever extraction logic changes so stale cache entries are ignored
+PARSER_VERSION = "4"
+
+# Workbook reader used for analysis: "openpyxl", or "native" (xlsx_reader.py) to also
+# capture the cached value of every formula cell
+EXCEL_READERS = ("openpyxl", "native")
+EXCEL_READER = os.environ.get("EXCEL_READER", "openpyxl").lower()
+if EXCEL_READER not in EXCEL_READERS:
+    print(f"⚠️ Unknown EXCEL_READER {EXCEL_READER!r}, using openpyxl")
+    EXCEL_READER = "openpyxl"
+
+# Section keyword sets per family of models, see row_detection.py
+detection_templates = DetectionTemplates(os.environ.get("DETECTION_TEMPLATES_PATH") or None)
+
+def analysis_version(template: DetectionTemplate) -> str:
+    """Parser version plus the reader and the template's keyword variant, for cache keys and sheet fingerprints"""
+    parts = [PARSER_VERSION]
+    if EXCEL_READER != "openpyxl":
+        parts.append(EXCEL_READER)
+    if template.variant:
+        parts.append(template.variant)
+    return "-".join(parts)
+
+def require_template(name: Optional[str]) -> DetectionTemplate:
+    """Resolve a detection template by name or raise 400"""
+    try:
+        return detection_templates.get(name)
+    except KeyError:
+        raise HTTPException(status_code=400, detail=f"Unknown detection template: {name}")
+
 # Global variables for caching
-excel_data_cache = {}
-current_analysis = None
+analysis_cache = AnalysisCache(
+    model_type=ExcelAnalysisResult,
+    cache_dir=os.environ.get(
+        "ANALYSIS_CACHE_DIR",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), ".analysis_cache")
+    ),
+    max_memory_bytes=int(os.environ.get("ANALYSIS_CACHE_MEMORY_MB", "256")) * 1024 * 1024,
+    max_disk_bytes=int(os.environ.get("ANALYSIS_CACHE_DISK_MB", "2048")) * 1024 * 1024
+)
+
+# Per-sheet results, so a revised model only re-analyzes the sheets that changed
+sheet_cache = AnalysisCache(
+    model_type=SheetAnalysis,
+    cache_dir=os.path.join(analysis_cache.cache_dir, "sheets") if analysis_cache.cache_dir else None,
+    max_memory_bytes=int(os.environ.get("SHEET_CACHE_MEMORY_MB", "128")) * 1024 * 1024,
+    max_disk_bytes=analysis_cache.max_disk_bytes
+)
+
+# Published analyses persist across restarts and back the field query endpoints
+analysis_store = AnalysisStore(
+    db_path=os.environ.get(
+        "ANALYSIS_STORE_PATH",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), ".analysis_store", "analyses.db")
+    ),
+    model_type=ExcelAnalysisResult,
+    formula_pattern=lambda formula: analyze_formula_pattern(formula),
+    max_analyses=int(os.environ.get("ANALYSIS_STORE_MAX", "20"))
+)
+
+# Analyses per (project, version), resident in the cache's memory budget, see analysis_sessions.py
+analysis_sessions = AnalysisSessions(analysis_store, analysis_cache)
+
+# Worker processes for per-sheet analysis; 1 keeps everything in-process
+ANALYSIS_WORKERS = int(os.environ.get("ANALYSIS_WORKERS", str(min(os.cpu_count() or 1, 8))))
+analysis_pool: Optional[ProcessPoolExecutor] = None
+
+# Background upload processing
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+upload_jobs = UploadJobManager(
+    upload_dir=os.environ.get(
+        "UPLOAD_DIR",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), ".uploads")
+    ),
+    max_workers=int(os.environ.get("UPLOAD_JOB_WORKERS", "2")),
+    max_pending=int(os.environ.get("UPLOAD_MAX_PENDING_JOBS", "8")),
+    history_size=int(os.environ.get("UPLOAD_JOB_HISTORY", "100"))
+)
+
+# Parser counters, fed once per sheet from a StageTimer rather than per cell
+CELLS_SCANNED = metrics.counter("excel_cells_scanned_total", "Non-empty worksheet cells read")
+ROWS_SCANNED = metrics.counter("excel_rows_scanned_total", "Non-empty worksheet rows read")
+SHEETS_ANALYZED = metrics.counter("excel_sheets_analyzed_total", "Worksheets analyzed")
+SECTIONS_FOUND = metrics.counter("excel_sections_found_total", "Sections detected")
+FIELDS_FOUND = metrics.counter("excel_fields_found_total", "Fields detected by type")
+SHEET_COUNTERS = {
+    "cells": (CELLS_SCANNED, {}),
+    "rows": (ROWS_SCANNED, {}),
+    "sheets": (SHEETS_ANALYZED, {}),
+    "sections": (SECTIONS_FOUND, {}),
+    "input_fields": (FIELDS_FOUND, {"type": "input"}),
+    "calculated_fields": (FIELDS_FOUND, {"type": "calculated"}),
+}
+
+def collect_state_metrics() -> List[str]:
+    """Cache and upload queue state, read at scrape time"""
+    cache = analysis_cache.info()
+    return (
+        gauge_lines("analysis_cache_lookups_total", "Analysis cache lookups by outcome", [
+            ({"result": "memory_hit"}, cache["memory_hits"]),
+            ({"result": "disk_hit"}, cache["disk_hits"]),
+            ({"result": "miss"}, cache["misses"]),
+        ], "counter")
+        + gauge_lines("analysis_cache_memory_bytes", "Bytes of analyses held in memory",
+                      [({}, cache["memory_bytes"])])
+        + gauge_lines("upload_jobs", "Upload jobs by status",
+                      [({"status": status}, count) for status, count in upload_jobs.stats().items()])
+    )
+
+metrics.add_collector(collect_state_metrics)
+
+# Opt-in per-request cProfile capture, see profiling.py
+profiles = ProfileStore(
+    profile_dir=os.environ.get(
+        "PROFILE_DIR",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), ".profiles")
+    ),
+    enabled=os.environ.get("PROFILING_ENABLED", "").lower() in ("1", "true", "yes"),
+    token=os.environ.get("PROFILE_TOKEN") or None,
+    history_size=int(os.environ.get("PROFILE_HISTORY", "20"))
+)
+
+def requested_profile_id(request: Request) -> Optional[str]:
+    """Profile id for a request that asked to be profiled, or 403 if it may not be"""
+    try:
+        return profiles.requested(request.headers, request.query_params)
+    except ProfilingDisabled as e:
+        raise HTTPException(status_code=403, detail=str(e))
+
+def require_profile_access(request: Request) -> None:
+    """403 unless profiling is enabled and the request carries ``PROFILE_TOKEN`` (when set)"""
+    try:
+        profiles.authorize(request.headers)
+    except ProfilingDisabled as e:
+        raise HTTPException(status_code=403, detail=str(e))
+
+def profile_headers(profile_id: Optional[str]) -> Dict[str, str]:
+    return {"X-Profile-Id": profile_id} if profile_id else {}
+
+@app.get("/metrics")
+async def get_metrics():
+    """Counters, stage timings and endpoint latency in Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type=PROMETHEUS_MEDIA_TYPE)
+
+@app.put("/metrics/mode")
+async def set_metrics_mode(request: Request, mode: str, sample_rate: Optional[float] = None):
+    """Switch instrumentation between off, sampled and full at runtime
+    
+    Gated like the profile endpoints, since ``full`` adds overhead to every request.
+    """
+    require_profile_access(request)
+    try:
+        metrics.configure(mode, sample_rate)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"mode": metrics.mode, "sampleRate": metrics.sample_rate}
+
+@app.get("/profiles")
+async def list_profiles(request: Request):
+    """Stored request profiles, most recent first"""
+    require_profile_access(request)
+    return {"enabled": profiles.enabled, "profiles": await run_in_threadpool(profiles.list)}
+
+@app.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str, request: Request, sort: str = "cumulative", limit: int = 50,
+                      match: Optional[str] = None):
+    """Top functions of a stored profile (``match`` filters by function or file name)"""
+    require_profile_access(request)
+    try:
+        summary = await run_in_threadpool(profiles.summary, profile_id, sort, limit, match)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return summary
+
+@app.get("/profiles/{profile_id}/download")
+async def download_profile(profile_id: str, request: Request):
+    """Raw pstats file, for snakeviz or ``python -m pstats``"""
+    require_profile_access(request)
+    path = profiles.stats_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
 
 @app.get("/")
 async def root():
@@ -76,93 +313,631 @@ async def root():
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
-@app.post("/upload-excel")
-async def upload_excel(file: UploadFile = File(...)):
-    """Upload and analyze Excel file"""
+@app.post("/upload-excel", status_code=202)
+async def upload_excel(request: Request, file: UploadFile = File(...),
+                       project_id: Optional[str] = None, version_id: Optional[str] = None,
+                       template: Optional[str] = None):
+    """Upload an Excel file and queue it for background analysis
+    
+    The result is published to the ``project_id``/``version_id`` session (the
+    default session when omitted); ``template`` selects the detection template.
+    With profiling requested the background job is run under cProfile.
+    """
+    if not file.filename.endswith(('.xlsx', '.xls')):
+        raise HTTPException(status_code=400, detail="Only Excel files are allowed")
+    profile_id = requested_profile_id(request)
+    session = session_key(project_id, version_id)
+    detection = require_template(template)
+    
+    # Stream the upload to disk in fixed-size chunks, hashing as the bytes pass
+    # through so memory stays bounded by the chunk size and the file is read once
+    path = upload_jobs.upload_path(os.path.splitext(file.filename)[1])
+    digest = content_hasher()
     try:
-        if not file.filename.endswith(('.xlsx', '.xls')):
-            raise HTTPException(status_code=400, detail="Only Excel files are allowed")
-        
-        # Read file content
-        content = await file.read()
-        
-        # Load workbook
-        workbook = load_workbook(filename=file.filename, data_only=False)
-        
-        # Analyze all sheets
-        analysis_result = analyze_excel_workbook(workbook, file.filename)
-        
-        # Cache the result
-        global current_analysis
-        current_analysis = analysis_result
-        
-        return analysis_result
-        
+        async with aiofiles.open(path, 'wb') as out:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                digest.update(chunk)
+                await out.write(chunk)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing Excel file: {str(e)}")
+        if os.path.exists(path):
+            os.remove(path)
+        raise HTTPException(status_code=500, detail=f"Error receiving Excel file: {str(e)}")
+    
+    runner = lambda job: run_upload_job(job, session, detection)
+    if profile_id:
+        label = f"upload-excel {file.filename}"
+        runner = lambda job: profiles.run(profile_id, label, run_upload_job, job, session, detection, profiled=True)
+    try:
+        job = upload_jobs.submit(file.filename, path, runner, digest.hexdigest())
+    except JobQueueFull as e:
+        os.remove(path)
+        raise HTTPException(status_code=429, detail=str(e))
+    
+    response = {
+        **job.summary(),
+        "projectId": session[0],
+        "versionId": session[1],
+        "template": detection.name,
+        "statusUrl": f"/upload-jobs/{job.id}",
+        "eventsUrl": f"/upload-jobs/{job.id}/events",
+        "resultUrl": f"/upload-jobs/{job.id}/result"
+    }
+    if profile_id:
+        response["profileId"] = profile_id
+        response["profileUrl"] = f"/profiles/{profile_id}"
+    return JSONResponse(content=response, status_code=202, headers=profile_headers(profile_id))
+
+@app.get("/upload-jobs")
+async def get_upload_job_stats():
+    """Count upload jobs by status"""
+    return upload_jobs.stats()
+
+@app.get("/upload-jobs/{job_id}")
+async def get_upload_job(job_id: str):
+    """Get the status and per-sheet progress of an upload job"""
+    return require_upload_job(job_id).summary()
+
+@app.get("/upload-jobs/{job_id}/events")
+async def stream_upload_job_events(job_id: str):
+    """Stream upload job progress as server-sent events until the job finishes"""
+    job = require_upload_job(job_id)
+    
+    async def event_stream():
+        sent = 0
+        while True:
+            events = job.events_since(sent)
+            for event in events:
+                yield f"data: {json.dumps(event)}\n\n"
+            sent += len(events)
+            if job.finished and not job.events_since(sent):
+                break
+            await asyncio.sleep(0.25)
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+@app.get("/upload-jobs/{job_id}/result")
+async def get_upload_job_result(job_id: str, compact: bool = False):
+    """Get the analysis produced by a finished upload job
+    
+    Jobs keep only the published analysis id; the analysis itself is loaded
+    through the session cache and store.
+    """
+    job = require_upload_job(job_id)
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=f"Error processing Excel file: {job.error}")
+    if not job.finished:
+        raise HTTPException(status_code=409, detail=f"Upload job is {job.status}")
+    analysis = await run_in_threadpool(analysis_sessions.load, job.result)
+    if analysis is None:
+        raise HTTPException(status_code=404, detail="Analysis not found; it has been pruned from the store")
+    return await run_in_threadpool(analysis_response, analysis, compact)
+
+def require_upload_job(job_id: str) -> UploadJob:
+    """Return an upload job or raise 404"""
+    job = upload_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Upload job not found")
+    return job
+
+def run_upload_job(job: UploadJob, session: SessionKey, template: DetectionTemplate,
+                   profiled: bool = False) -> int:
+    """Worker body for an upload job: hash, analyze (or hit the cache) and publish
+    
+    Returns the published analysis id, so finished jobs hold no analysis in memory.
+    """
+    metrics.start_trace()
+    content_hash = job.content_hash or hash_file(job.path)
+    if profiled:
+        analysis_result = run_profiled_analysis(job.path, job.filename, content_hash, job.report_sheet, template)
+    else:
+        analysis_result = run_cached_analysis(job.path, job.filename, content_hash, job.report_sheet, template)
+    published = publish_analysis(analysis_result, job.filename, content_hash, session, template)
+    job.annotate(**published)
+    return published["analysisId"]
+
+def publish_analysis(analysis_result: ExcelAnalysisResult, filename: str, content_hash: str,
+                     session: SessionKey, template: DetectionTemplate) -> Dict[str, Any]:
+    """Persist an analysis to the analysis store and bind the session to it
+    
+    Returns the analysis id and, when the session had a base version, the
+    diff summary against it.
+    """
+    analysis_id, base_id = analysis_sessions.publish(
+        session, analysis_result, filename, make_cache_key(content_hash, analysis_version(template))
+    )
+    published = {"analysisId": analysis_id, "baseAnalysisId": base_id}
+    if base_id is not None and base_id != analysis_id:
+        base = analysis_sessions.load(base_id)
+        if base is not None:
+            with metrics.span("analysis.diff"):
+                diff = diff_analyses(base, analysis_result, limit=0)
+            published["diff"] = {"summary": diff["summary"], "changedSheets": diff["changedSheets"]}
+            published["diffUrl"] = f"/sessions/{session[0]}/{session[1]}/diff"
+    return published
 
 @app.get("/analyze-excel/{filename}")
-async def analyze_excel_file(filename: str):
-    """Analyze Excel file from project root"""
+async def analyze_excel_file(filename: str, request: Request, compact: bool = False,
+                             project_id: Optional[str] = None, version_id: Optional[str] = None,
+                             template: Optional[str] = None):
+    """Analyze Excel file from project root into the ``project_id``/``version_id`` session"""
+    profile_id = requested_profile_id(request)
+    session = session_key(project_id, version_id)
+    detection = require_template(template)
     try:
         file_path = f"../{filename}"
         if not os.path.exists(file_path):
             raise HTTPException(status_code=404, detail="Excel file not found")
         
-        # Load workbook
-        workbook = load_workbook(filename=file_path, data_only=False)
-        
-        # Analyze all sheets
-        analysis_result = analyze_excel_workbook(workbook, filename)
-        
-        # Cache the result
-        global current_analysis
-        current_analysis = analysis_result
+        # Analyze all sheets off the event loop, reusing any cached result for identical bytes
+        content_hash = hash_file(file_path)
+        if profile_id:
+            analysis_result = await run_in_threadpool(
+                profiles.run, profile_id, f"analyze-excel {filename}",
+                run_profiled_analysis, file_path, filename, content_hash, None, detection
+            )
+        else:
+            analysis_result = await run_in_threadpool(
+                run_cached_analysis, file_path, filename, content_hash, None, detection
+            )
+        published = await run_in_threadpool(
+            publish_analysis, analysis_result, filename, content_hash, session, detection
+        )
         
-        return analysis_result
+        response = analysis_response(analysis_result, compact)
+        response.headers.update(profile_headers(profile_id))
+        response.headers["X-Analysis-Id"] = str(published["analysisId"])
+        return response
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error analyzing Excel file: {str(e)}")
 
 @app.get("/get-analysis")
-async def get_current_analysis():
-    """Get the current analysis result"""
-    if current_analysis is None:
+async def get_current_analysis(compact: bool = False, project_id: Optional[str] = None,
+                               version_id: Optional[str] = None):
+    """Get a session's analysis result (``?compact=true`` for the deduplicated schema)"""
+    analysis = await run_in_threadpool(analysis_sessions.get, session_key(project_id, version_id))
+    if analysis is None:
         raise HTTPException(status_code=404, detail="No analysis available")
-    return current_analysis
+    return analysis_response(analysis, compact)
+
+@app.get("/sessions")
+async def list_sessions(project_id: Optional[str] = None):
+    """Analysis sessions, most recently published first, optionally for one project"""
+    return {"sessions": await run_in_threadpool(analysis_sessions.list, project_id)}
+
+@app.get("/sessions/{project_id}/{version_id}")
+async def get_session(project_id: str, version_id: str):
+    """The analysis a session is bound to and whether it is resident in memory"""
+    session = await run_in_threadpool(analysis_sessions.describe, session_key(project_id, version_id))
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session
+
+@app.get("/sessions/{project_id}/{version_id}/diff")
+async def get_session_diff(project_id: str, version_id: str, limit: int = 1000):
+    """Fields added, removed and changed since the session's base version"""
+    diff = await run_in_threadpool(analysis_sessions.diff, session_key(project_id, version_id), limit)
+    if diff is None:
+        raise HTTPException(status_code=404, detail="Session has no base version to compare with")
+    return diff
+
+@app.delete("/sessions/{project_id}/{version_id}")
+async def delete_session(project_id: str, version_id: str):
+    """Unbind a session; its analysis stays in history until pruned"""
+    if not await run_in_threadpool(analysis_sessions.delete, session_key(project_id, version_id)):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"status": "deleted"}
+
+MAX_FIELD_PAGE = int(os.environ.get("MAX_FIELD_PAGE", "1000"))
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", "5000"))
+
+@app.get("/analyses")
+async def list_analyses():
+    """List persisted analyses, most recent first"""
+    return {"analyses": await run_in_threadpool(analysis_store.list_analyses)}
+
+@app.get("/analyses/{analysis_id}")
+async def get_stored_analysis(analysis_id: str, compact: bool = False):
+    """Get a persisted analysis by id (or 'latest')"""
+    # Decompressing, validating and serializing a large analysis would stall the event loop
+    resolved_id = await require_analysis_id(analysis_id)
+    analysis = await run_in_threadpool(analysis_store.load, resolved_id)
+    if analysis is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    return await run_in_threadpool(analysis_response, analysis, compact)
+
+@app.get("/analyses/{analysis_id}/sections")
+async def get_stored_sections(analysis_id: str, sheet: Optional[str] = None):
+    """List a persisted analysis' sections without their fields"""
+    resolved_id = await require_analysis_id(analysis_id)
+    return {"sections": await run_in_threadpool(analysis_store.sections, resolved_id, sheet)}
+
+@app.get("/analyses/{analysis_id}/fields")
+async def query_stored_fields(analysis_id: str, sheet: Optional[str] = None, section: Optional[str] = None,
+                              heading: Optional[str] = None, type: Optional[str] = None,
+                              dataType: Optional[str] = None, pattern: Optional[str] = None,
+                              name: Optional[str] = None, limit: int = 100, offset: int = 0):
+    """Filtered, paginated fields of a persisted analysis
+    
+    Filters are exact matches on indexed columns; ``name`` is a substring match.
+    Section ids restart on every sheet, so combine ``section`` with ``sheet``.
+    """
+    if not 1 <= limit <= MAX_FIELD_PAGE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_FIELD_PAGE}")
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="offset must not be negative")
+    
+    resolved_id = await require_analysis_id(analysis_id)
+    filters = {"sheet": sheet, "section": section, "heading": heading,
+               "type": type, "dataType": dataType, "pattern": pattern}
+    total, fields = await run_in_threadpool(
+        analysis_store.query_fields, resolved_id, filters, name, limit, offset
+    )
+    return {"analysisId": resolved_id, "total": total, "limit": limit, "offset": offset, "fields": fields}
+
+@app.get("/analyses/{analysis_id}/diff")
+async def diff_stored_analyses(analysis_id: str, base: str, limit: int = 1000):
+    """Fields added, removed and changed between two persisted analyses"""
+    current_id, base_id = await require_analysis_id(analysis_id), await require_analysis_id(base)
+    # Either row may be pruned between resolving its id and loading it
+    current = await run_in_threadpool(analysis_sessions.load, current_id)
+    base_analysis = await run_in_threadpool(analysis_sessions.load, base_id)
+    if current is None or base_analysis is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    return await run_in_threadpool(diff_analyses, base_analysis, current, limit)
+
+@app.get("/analyses/{analysis_id}/facets")
+async def get_stored_facets(analysis_id: str):
+    """Field counts per sheet, heading, type, dataType and formula pattern"""
+    resolved_id = await require_analysis_id(analysis_id)
+    return await run_in_threadpool(analysis_store.facets, resolved_id)
+
+MAX_RESOLVE_REFS = int(os.environ.get("MAX_RESOLVE_REFS", "10000"))
+
+class ResolveRequest(BaseModel):
+    refs: List[str]  # 'Sheet!F61' cells or defined names
+    names: Dict[str, Any] = {}  # selector values to use instead of the workbook's, e.g. {"LiveCase": 2}
+
+@app.get("/analyses/{analysis_id}/names")
+async def get_stored_names(analysis_id: str):
+    """Defined names of a persisted analysis and the size of its name index"""
+    resolved_id = await require_analysis_id(analysis_id)
+    name_index = require_name_index(await run_in_threadpool(analysis_sessions.load, resolved_id))
+    return {"analysisId": resolved_id, **name_index.summary(), "definedNames": list(name_index.names.values())}
+
+@app.post("/analyses/{analysis_id}/resolve")
+async def resolve_stored_references(analysis_id: str, request: ResolveRequest):
+    """Resolve cell references and defined names of a persisted analysis in bulk"""
+    resolved_id = await require_analysis_id(analysis_id)
+    analysis = await run_in_threadpool(analysis_sessions.load, resolved_id)
+    return {"analysisId": resolved_id, "results": resolve_request(analysis, request)}
+
+@app.post("/sessions/{project_id}/{version_id}/resolve")
+async def resolve_session_references(project_id: str, version_id: str, request: ResolveRequest):
+    """Resolve cell references and defined names against a session's analysis"""
+    analysis = await run_in_threadpool(analysis_sessions.get, session_key(project_id, version_id))
+    if analysis is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"results": resolve_request(analysis, request)}
+
+def require_name_index(analysis: Optional[ExcelAnalysisResult]) -> NameIndex:
+    """The analysis' name index or raise 404/409"""
+    if analysis is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    if analysis.nameIndex is None:
+        raise HTTPException(status_code=409, detail="Analysis predates the name index; re-analyze the workbook")
+    return analysis.nameIndex
+
+def resolve_request(analysis: Optional[ExcelAnalysisResult], request: ResolveRequest) -> List[Dict[str, Any]]:
+    if len(request.refs) > MAX_RESOLVE_REFS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_RESOLVE_REFS} references per request")
+    name_index = require_name_index(analysis)
+    with metrics.span("analysis.resolve"):
+        return resolve_references(name_index, request.refs, request.names)
+
+async def require_analysis_id(analysis_id: str) -> int:
+    """Resolve an analysis id (or 'latest') off the event loop or raise 404"""
+    resolved_id = await run_in_threadpool(analysis_store.resolve_id, analysis_id)
+    if resolved_id is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    return resolved_id
+
+async def require_export_id(analysis_id: Optional[str], project_id: Optional[str],
+                            version_id: Optional[str]) -> int:
+    """``analysis_id`` when given, otherwise the analysis of the ``project_id``/``version_id`` session"""
+    if analysis_id is not None:
+        return await require_analysis_id(analysis_id)
+    resolved_id = await run_in_threadpool(analysis_sessions.analysis_id, session_key(project_id, version_id))
+    if resolved_id is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return resolved_id
+
+@app.get("/detection-templates")
+async def list_detection_templates():
+    """Detection templates selectable with ``?template=`` on upload and analyze"""
+    return {
+        "path": detection_templates.path,
+        "templates": detection_templates.list(),
+        "error": detection_templates.error
+    }
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Get analysis cache statistics"""
+    return {
+        "parserVersion": PARSER_VERSION,
+        **analysis_cache.info(),
+        "sheets": sheet_cache.info(),
+        "periodCalendars": period_calendar_cache_info()
+    }
+
+@app.delete("/cache")
+async def clear_cache():
+    """Drop every cached analysis and sheet result"""
+    analysis_cache.clear()
+    sheet_cache.clear()
+    return {"status": "cleared"}
 
 @app.get("/export-csv")
-async def export_analysis_to_csv():
-    """Export current analysis to CSV format"""
-    if current_analysis is None:
-        raise HTTPException(status_code=404, detail="No analysis available")
+async def export_analysis_to_csv(analysis_id: Optional[str] = None, project_id: Optional[str] = None,
+                                 version_id: Optional[str] = None):
+    """Stream a session's analysis (or a stored one by id) as CSV, one row per field"""
+    resolved_id = await require_export_id(analysis_id, project_id, version_id)
+    return StreamingResponse(
+        iter_csv(analysis_store.iter_field_batches(resolved_id, EXPORT_BATCH_SIZE)),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="excel-analysis-{resolved_id}.csv"'}
+    )
+
+@app.get("/export-parquet")
+async def export_analysis_to_parquet(analysis_id: Optional[str] = None, project_id: Optional[str] = None,
+                                     version_id: Optional[str] = None):
+    """Stream a session's analysis (or a stored one by id) as Parquet, one row group per batch of fields"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
+    
+    resolved_id = await require_export_id(analysis_id, project_id, version_id)
+    return StreamingResponse(
+        iter_parquet(analysis_store.iter_field_batches(resolved_id, EXPORT_BATCH_SIZE)),
+        media_type="application/vnd.apache.parquet",
+        headers={"Content-Disposition": f'attachment; filename="excel-analysis-{resolved_id}.parquet"'}
+    )
+
+def load_workbook_for_analysis(source, reader: Optional[str] = None):
+    """Open a workbook for streaming with formulas preserved
+    
+    ``reader`` (``EXCEL_READER`` when None) picks openpyxl in read-only mode
+    or the native reader, which also yields cached formula values.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    if (reader or EXCEL_READER) == "native":
+        return XlsxWorkbook(source)
+    return load_workbook(filename=source, read_only=True, data_only=False)
+
+def analysis_response(analysis: ExcelAnalysisResult, compact: bool = False) -> Response:
+    """Serialize an analysis with pydantic's native encoder instead of jsonable_encoder
+    
+    ``compact`` selects the deduplicated schema from analysis_compact.py.
+    """
+    with metrics.span("analysis.serialize"):
+        content = encode_compact_analysis(analysis) if compact else analysis.model_dump_json(exclude={"nameIndex"})
+    return Response(content=content, media_type="application/json")
+
+def run_cached_analysis(source, filename: str, content_hash: str,
+                        progress: Optional[ProgressCallback] = None,
+                        template: Optional[DetectionTemplate] = None) -> ExcelAnalysisResult:
+    """Analyze a workbook unless a result for the same bytes is already cached
     
+    Concurrent requests for the same bytes wait for one analysis.
+    """
+    template = template or detection_templates.default
+    cache_key = make_cache_key(content_hash, analysis_version(template))
+    analysis_result, cached = analysis_cache.get_or_compute(
+        cache_key, lambda: analyze_changed_sheets(source, filename, progress, template)
+    )
+    if cached:
+        print(f"⚡ Cache hit for {filename}")
+    return analysis_result
+
+def run_profiled_analysis(source, filename: str, content_hash: str,
+                          progress: Optional[ProgressCallback] = None,
+                          template: Optional[DetectionTemplate] = None) -> ExcelAnalysisResult:
+    """Analyze in this thread, ignoring cached results, so a profiler sees every sheet
+    
+    The fresh result still replaces the cached one.
+    """
+    template = template or detection_templates.default
+    workbook = load_workbook_for_analysis(source)
     try:
-        # Convert to CSV format
-        csv_data = convert_analysis_to_csv(current_analysis)
-        return JSONResponse(content=csv_data)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error exporting to CSV: {str(e)}")
+        analysis_result = analyze_excel_workbook(workbook, filename, progress, template)
+    finally:
+        workbook.close()
+    analysis_cache.put(make_cache_key(content_hash, analysis_version(template)), analysis_result)
+    return analysis_result
+
+def get_analysis_pool() -> ProcessPoolExecutor:
+    """Lazily start the shared process pool used for per-sheet analysis"""
+    global analysis_pool
+    if analysis_pool is None:
+        analysis_pool = ProcessPoolExecutor(max_workers=ANALYSIS_WORKERS)
+    return analysis_pool
+
+def analyze_sheet_worker(source, sheet_name: str, timed: bool = False,
+                         template: Optional[DetectionTemplate] = None) -> Tuple[SheetAnalysis, Dict]:
+    """Process-pool entry point: open the workbook and analyze a single sheet
+    
+    Returns the sheet's analysis plus a StageTimer snapshot for the parent to
+    record, since metrics recorded in the worker process would be lost.
+    """
+    timer = StageTimer(timed)
+    with timer.stage("analysis.load"):
+        workbook = load_workbook_for_analysis(source)
+    try:
+        sheet_analysis = scan_sheet(workbook, sheet_name, timer, template, workbook_defined_names(workbook))
+    finally:
+        workbook.close()
+    return sheet_analysis, timer.snapshot()
+
+def analyze_excel_source(source, filename: str, progress: Optional[ProgressCallback] = None,
+                         template: Optional[DetectionTemplate] = None) -> ExcelAnalysisResult:
+    """Analyze a workbook path or byte payload, fanning sheets out to worker processes"""
+    sheet_results = list(analyze_sheets(source, filename, None, progress, template=template).values())
+    return build_analysis_result(sheet_results, len(sheet_results), build_name_index(sheet_results, source=source))
+
+def analyze_changed_sheets(source, filename: str, progress: Optional[ProgressCallback] = None,
+                           template: Optional[DetectionTemplate] = None) -> ExcelAnalysisResult:
+    """Analyze a workbook, reusing cached sections for every sheet whose fingerprint is unchanged
+    
+    Fingerprints cover each worksheet part plus the shared strings, formats
+    and names it depends on (see workbook_parts.py), so a revised model only
+    pays for the sheets that were edited.
+    """
+    template = template or detection_templates.default
+    try:
+        with metrics.span("analysis.fingerprint"):
+            fingerprints = sheet_fingerprints(source, analysis_version(template))
+    except WorkbookPackageError as e:
+        print(f"⚠️ Cannot fingerprint sheets of {filename} ({e}), analyzing all of them")
+        return analyze_excel_source(source, filename, progress, template)
+    
+    sheet_results: Dict[str, SheetAnalysis] = {}
+    for sheet_name, fingerprint in fingerprints.items():
+        cached = sheet_cache.get(fingerprint)
+        if cached is not None:
+            sheet_results[sheet_name] = cached
+            if progress:
+                progress(sheet_name, len(sheet_results), len(fingerprints))
+    
+    changed = [sheet_name for sheet_name in fingerprints if sheet_name not in sheet_results]
+    if sheet_results:
+        print(f"♻️ Reusing {len(sheet_results)}/{len(fingerprints)} unchanged sheets of {filename}")
+    if changed:
+        analyzed = analyze_sheets(source, filename, changed, progress, len(sheet_results), template)
+        for sheet_name, sheet_analysis in analyzed.items():
+            sheet_cache.put(fingerprints[sheet_name], sheet_analysis)
+        sheet_results.update(analyzed)
+    
+    ordered = [sheet_results[sheet_name] for sheet_name in fingerprints]
+    return build_analysis_result(ordered, len(fingerprints), build_name_index(ordered, source=source))
+
+def analyze_sheets(source, filename: str, sheet_names: Optional[List[str]] = None,
+                   progress: Optional[ProgressCallback] = None, done_before: int = 0,
+                   template: Optional[DetectionTemplate] = None) -> Dict[str, SheetAnalysis]:
+    """Analyses of the named sheets (every sheet when None), in the order given
+    
+    ``done_before`` sheets were already handled by the caller and count toward
+    the reported progress.
+    """
+    with metrics.span("analysis.load"):
+        workbook = load_workbook_for_analysis(source)
+    try:
+        if sheet_names is None:
+            sheet_names = workbook.sheetnames
+        total = done_before + len(sheet_names)
+        if ANALYSIS_WORKERS <= 1 or len(sheet_names) <= 1:
+            print(f"🔍 Analyzing Excel file: {filename} ({len(sheet_names)} sheets)")
+            names = workbook_defined_names(workbook)
+            sheet_results = {}
+            for done, sheet_name in enumerate(sheet_names, done_before + 1):
+                sheet_results[sheet_name] = analyze_workbook_sheet(workbook, sheet_name, template, names)
+                if progress:
+                    progress(sheet_name, done, total)
+            return sheet_results
+    finally:
+        workbook.close()
+    
+    print(f"🔍 Analyzing Excel file: {filename} ({len(sheet_names)} sheets on {ANALYSIS_WORKERS} workers)")
+    pool = get_analysis_pool()
+    timed = metrics.sampling()
+    futures = {
+        pool.submit(analyze_sheet_worker, source, sheet_name, timed, template): sheet_name
+        for sheet_name in sheet_names
+    }
+    
+    if progress:
+        for done, future in enumerate(as_completed(futures), done_before + 1):
+            progress(futures[future], done, total)
+    
+    # Collect in sheet order so the merged result matches a sequential run
+    sheet_results = {}
+    for future, sheet_name in futures.items():
+        sheet_analysis, snapshot = future.result()
+        metrics.record(snapshot, SHEET_COUNTERS)
+        sheet_results[sheet_name] = sheet_analysis
+    return sheet_results
 
-def analyze_excel_workbook(workbook, filename: str) -> ExcelAnalysisResult:
+def analyze_excel_workbook(workbook, filename: str, progress: Optional[ProgressCallback] = None,
+                           template: Optional[DetectionTemplate] = None) -> ExcelAnalysisResult:
     """Comprehensive Excel workbook analysis"""
     print(f"🔍 Analyzing Excel file: {filename}")
     
+    sheet_results = []
+    sheet_names = workbook.sheetnames
+    names = workbook_defined_names(workbook)
+    
+    # Analyze each sheet
+    for done, sheet_name in enumerate(sheet_names, 1):
+        sheet_results.append(analyze_workbook_sheet(workbook, sheet_name, template, names))
+        if progress:
+            progress(sheet_name, done, len(sheet_names))
+    
+    name_index = build_name_index(sheet_results, names, workbook=workbook)
+    return build_analysis_result(sheet_results, len(workbook.sheetnames), name_index)
+
+def analyze_workbook_sheet(workbook, sheet_name: str, template: Optional[DetectionTemplate] = None,
+                           names: Optional[Dict[str, Any]] = None) -> SheetAnalysis:
+    """Analyze one sheet of an open workbook, recording its metrics"""
+    timer = metrics.timer()
+    sheet_analysis = scan_sheet(workbook, sheet_name, timer, template, names or {})
+    metrics.record(timer.snapshot(), SHEET_COUNTERS)
+    return sheet_analysis
+
+def scan_sheet(workbook, sheet_name: str, timer: Optional[StageTimer], template: Optional[DetectionTemplate],
+               names: Dict[str, Any]) -> SheetAnalysis:
+    """Sections of one sheet plus its named cells, case selectors and their ranges"""
+    scan = SheetNameScan(sheet_name, names)
+    sections = extract_sections_from_sheet(workbook[sheet_name], sheet_name, timer, template, scan)
+    return SheetAnalysis(sections=sections, names=scan.result())
+
+def build_name_index(sheet_results: List[SheetAnalysis], names: Optional[Dict[str, Any]] = None,
+                     workbook=None, source=None) -> NameIndex:
+    """Merge the sheets' names and selectors, reading any ranges no sheet scan could capture
+    
+    Those ranges (above their field or on another sheet) are read from
+    ``workbook``, or from ``source`` opened for the purpose.
+    """
+    if names is None:
+        try:
+            names = index_defined_names(read_defined_names(source))
+        except WorkbookPackageError:
+            names = {}
+    name_index, missing = merge_name_index(names, [result.names for result in sheet_results])
+    if missing:
+        with metrics.span("analysis.names"):
+            opened = workbook if workbook is not None else load_workbook_for_analysis(source)
+            try:
+                for sheet_name, keys in missing.items():
+                    if sheet_name in opened.sheetnames:
+                        capture_ranges(name_index, keys, iter_sheet_rows(opened[sheet_name]))
+            finally:
+                if workbook is None:
+                    opened.close()
+    return name_index
+
+def build_analysis_result(sheet_results: List[SheetAnalysis], total_sheets: int,
+                          name_index: Optional[NameIndex] = None) -> ExcelAnalysisResult:
+    """Merge per-sheet sections, in sheet order, into a single analysis result"""
     all_sections = []
     total_fields = 0
     input_fields = 0
     calculated_fields = 0
     formula_patterns = {}
     
-    # Analyze each sheet
-    for sheet_name in workbook.sheetnames:
-        print(f"📊 Analyzing sheet: {sheet_name}")
-        sheet = workbook[sheet_name]
-        
-        # Extract sections and fields from this sheet
-        sheet_sections = extract_sections_from_sheet(sheet, sheet_name)
-        
-        for section in sheet_sections:
+    for sheet_analysis in sheet_results:
+        for section in sheet_analysis.sections:
             all_sections.append(section)
             total_fields += len(section.fields)
             
@@ -181,44 +956,83 @@ def analyze_excel_workbook(workbook, filename: str) -> ExcelAnalysisResult:
                         formula_patterns[pattern] = 1
     
     return ExcelAnalysisResult(
-        totalSheets=len(workbook.sheetnames),
+        totalSheets=total_sheets,
         totalFields=total_fields,
         inputFields=input_fields,
         calculatedFields=calculated_fields,
         sections=all_sections,
         formulaPatterns=formula_patterns,
-        analysisTimestamp=datetime.now().isoformat()
+        analysisTimestamp=datetime.now().isoformat(),
+        nameIndex=name_index
     )
 
-def extract_sections_from_sheet(sheet, sheet_name: str) -> List[SectionInfo]:
-    """Extract sections and fields from a single sheet"""
+def iter_sheet_rows(sheet) -> Iterator[Tuple[int, RowCells]]:
+    """Stream non-empty rows as (row_num, cells) with compact (column, value, formula) cell tuples
+    
+    With openpyxl a formula cell's value is its formula text; the native
+    reader gives the value Excel last calculated instead.
+    """
+    if isinstance(sheet, XlsxSheet):
+        for row_num, cells in sheet.iter_rows():
+            yield row_num, [(column, value, formula) for column, formula, value, _ in cells]
+        return
+    
+    # Read-only sheets trust the stored dimension tag, which some writers get wrong
+    if hasattr(sheet, 'reset_dimensions'):
+        sheet.reset_dimensions()
+    
+    for row in sheet.iter_rows():
+        cells = []
+        row_num = None
+        for cell in row:
+            value = cell.value
+            if value is None:
+                continue
+            row_num = cell.row
+            if cell.data_type == 'f':
+                # Array and data table formulas arrive as objects rather than text
+                if not isinstance(value, str):
+                    value = getattr(value, 'text', None) or str(value)
+                cells.append((cell.column, value, value))
+            else:
+                cells.append((cell.column, value, None))
+        if cells:
+            yield row_num, cells
+
+def extract_sections_from_sheet(sheet, sheet_name: str, timer: Optional[StageTimer] = None,
+                                template: Optional[DetectionTemplate] = None,
+                                names: Optional[SheetNameScan] = None) -> List[SectionInfo]:
+    """Extract sections and fields from a single sheet
+    
+    Each row is classified in one pass by the detection template (the
+    default keywords when None). ``timer`` receives the sheet's scan/detect
+    timings and cell, row, section and field counts. ``names`` sees every
+    row and field, to name fields and index their case selectors.
+    """
+    classify = (template or detection_templates.default).classify
     sections = []
     current_section = None
     current_heading = None
     section_id = 1
+    rows_scanned = 0
+    cells_scanned = 0
+    timed = timer is not None and timer.timed
+    started = time.perf_counter() if timed else 0.0
     
-    # Get sheet dimensions
-    max_row = sheet.max_row
-    max_col = sheet.max_column
-    
-    print(f"   Sheet dimensions: {max_row} rows x {max_col} columns")
-    
-    # Scan through all rows
-    for row_num in range(1, max_row + 1):
-        row_data = []
-        for col_num in range(1, max_col + 1):
-            cell = sheet.cell(row=row_num, column=col_num)
-            row_data.append({
-                'value': cell.value,
-                'formula': cell.data_type == 'f' and str(cell.value) or None,
-                'coordinate': cell.coordinate,
-                'row': row_num,
-                'column': col_num
-            })
+    # Stream rows so memory stays flat regardless of sheet size
+    rows = timer.timed_iter("analysis.scan", iter_sheet_rows(sheet)) if timed else iter_sheet_rows(sheet)
+    for row_num, row_data in rows:
+        rows_scanned += 1
+        cells_scanned += len(row_data)
+        if names is not None:
+            names.observe(row_num, row_data)
+        
+        row_class = classify(row_data, current_section is not None)
+        if row_class is None:
+            continue
+        kind, detected = row_class
         
-        # Check for section headers (blue cells or bold text)
-        section_header = detect_section_header(row_data, row_num)
-        if section_header:
+        if kind == SECTION:
             # Save previous section if exists
             if current_section:
                 sections.append(current_section)
@@ -226,133 +1040,72 @@ def extract_sections_from_sheet(sheet, sheet_name: str) -> List[SectionInfo]:
             # Start new section
             current_section = SectionInfo(
                 id=f"section_{section_id}",
-                name=section_header,
+                name=detected,
+                sheet=sheet_name,
                 row=row_num,
                 headings={},
                 fields=[]
             )
             section_id += 1
             current_heading = None
-            continue
-        
-        # Check for heading within current section
-        if current_section:
-            heading = detect_heading(row_data, row_num)
-            if heading:
-                current_heading = heading
-                current_section.headings[heading] = {
-                    'id': heading.lower().replace(' ', '_'),
-                    'name': heading,
-                    'fields': []
-                }
-                continue
-            
-            # Check for field definitions
-            field_info = detect_field(row_data, row_num, current_section.id, current_heading)
-            if field_info:
-                current_section.fields.append(field_info)
-                if current_heading and current_heading in current_section.headings:
-                    current_section.headings[current_heading]['fields'].append(field_info)
+        elif kind == HEADING:
+            current_heading = detected
+            current_section.headings[detected] = {
+                'id': detected.lower().replace(' ', '_'),
+                'name': detected,
+                'fields': []
+            }
+        elif kind == FIELD:
+            cell_idx, field_name = detected
+            named_cell = names.field(row_num, row_data, cell_idx) if names is not None else None
+            field_info = build_field_info(row_data, row_num, cell_idx, field_name, current_section.id,
+                                          current_heading, named_cell)
+            current_section.fields.append(field_info)
+            if current_heading and current_heading in current_section.headings:
+                current_section.headings[current_heading]['fields'].append(field_info)
     
     # Add the last section
     if current_section:
         sections.append(current_section)
     
-    print(f"   Found {len(sections)} sections in sheet '{sheet_name}'")
+    if timer is not None:
+        if timed:
+            # Everything that was not reading rows was section/heading/field detection
+            elapsed = time.perf_counter() - started
+            timer.add_time("analysis.sheet", elapsed)
+            timer.add_time("analysis.detect", elapsed - timer.seconds.get("analysis.scan", 0.0))
+        timer.count("sheets")
+        timer.count("rows", rows_scanned)
+        timer.count("cells", cells_scanned)
+        timer.count("sections", len(sections))
+        for section in sections:
+            for field in section.fields:
+                timer.count(f"{field.type}_fields")
     return sections
 
-def detect_section_header(row_data: List[Dict], row_num: int) -> Optional[str]:
-    """Detect if this row contains a section header"""
-    for cell in row_data:
-        if cell['value'] and isinstance(cell['value'], str):
-            value = cell['value'].strip()
-            # Look for section-like headers - more specific to financial models
-            if (len(value) > 3 and 
-                not value.isdigit() and 
-                not value.startswith('=') and
-                not value.startswith('F') and
-                (value.isupper() or 
-                 any(keyword in value.lower() for keyword in [
-                     'project', 'cost', 'debt', 'equity', 'revenue', 'tax', 'capacity', 
-                     'technical', 'operation', 'construction', 'financing', 'macroeconomic',
-                     'assumption', 'input', 'output', 'calculation', 'timeline', 'sponsor',
-                     'plant', 'tariff', 'sensitivity', 'structure', 'working', 'capital',
-                     'performance', 'service', 'accounting', 'liquidated', 'damages'
-                 ]))):
-                return value
-    return None
-
-def detect_heading(row_data: List[Dict], row_num: int) -> Optional[str]:
-    """Detect if this row contains a heading"""
-    for cell in row_data:
-        if cell['value'] and isinstance(cell['value'], str):
-            value = cell['value'].strip()
-            # Look for heading-like text
-            if (len(value) > 2 and 
-                not value.isdigit() and 
-                not value.startswith('=') and
-                not value.startswith('F') and
-                len(value.split()) <= 5):  # Short phrases
-                return value
-    return None
-
-def detect_field(row_data: List[Dict], row_num: int, section_id: str, heading: str) -> Optional[FieldInfo]:
-    """Detect if this row contains a field definition"""
-    for col_idx, cell in enumerate(row_data):
-        if cell['value'] is not None:
-            # Look for formulas or field names
-            if cell['formula'] or (isinstance(cell['value'], str) and len(cell['value']) > 2):
-                # Try to find field name in nearby cells
-                field_name = find_field_name(row_data, col_idx)
-                if field_name:
-                    # Determine field type
-                    field_type = 'calculated' if cell['formula'] else 'input'
-                    
-                    # Determine data type
-                    data_type = determine_data_type(cell['value'])
-                    
-                    return FieldInfo(
-                        id=f"field_{row_num}",
-                        name=field_name,
-                        row=row_num,
-                        column=cell['coordinate'],
-                        type=field_type,
-                        dataType=data_type,
-                        value=cell['value'],
-                        formula=cell['formula'],
-                        isNamedCell=bool(cell['formula'] and 'INDEX' in str(cell['formula'])),
-                        namedCell=cell['coordinate'] if cell['formula'] and 'INDEX' in str(cell['formula']) else None,
-                        required=False,
-                        section=section_id,
-                        heading=heading or 'general'
-                    )
-    return None
-
-def find_field_name(row_data: List[Dict], col_idx: int) -> Optional[str]:
-    """Find field name in nearby cells"""
-    # Check cells to the left first
-    for offset in range(1, 4):
-        check_idx = col_idx - offset
-        if check_idx >= 0 and row_data[check_idx]['value']:
-            value = str(row_data[check_idx]['value']).strip()
-            if (len(value) > 2 and 
-                not value.isdigit() and 
-                not value.startswith('=') and
-                not value.startswith('F')):
-                return value
-    
-    # Check cells to the right
-    for offset in range(1, 3):
-        check_idx = col_idx + offset
-        if check_idx < len(row_data) and row_data[check_idx]['value']:
-            value = str(row_data[check_idx]['value']).strip()
-            if (len(value) > 2 and 
-                not value.isdigit() and 
-                not value.startswith('=') and
-                not value.startswith('F')):
-                return value
-    
-    return None
+def build_field_info(row_data: RowCells, row_num: int, cell_idx: int, field_name: str,
+                     section_id: str, heading: Optional[str], named_cell: Optional[str] = None) -> FieldInfo:
+    """Build the field for a row classified as a field at ``cell_idx``
+    
+    ``named_cell`` is the defined name that refers to the field's cell, if any.
+    """
+    column, value, formula = row_data[cell_idx]
+    coordinate = f"{get_column_letter(column)}{row_num}"
+    return FieldInfo(
+        id=f"field_{row_num}",
+        name=field_name,
+        row=row_num,
+        column=coordinate,
+        type='calculated' if formula else 'input',
+        dataType=determine_data_type(value),
+        value=value,
+        formula=formula,
+        isNamedCell=named_cell is not None,
+        namedCell=named_cell,
+        required=False,
+        section=section_id,
+        heading=heading or 'general'
+    )
 
 def determine_data_type(value: Any) -> str:
     """Determine the data type of a field value"""
@@ -389,50 +1142,6 @@ def analyze_formula_pattern(formula: str) -> str:
     else:
         return 'UNKNOWN'
 
-def convert_analysis_to_csv(analysis: ExcelAnalysisResult) -> Dict[str, Any]:
-    """Convert analysis result to CSV-friendly format"""
-    csv_data = {
-        'metadata': {
-            'totalSheets': analysis.totalSheets,
-            'totalFields': analysis.totalFields,
-            'inputFields': analysis.inputFields,
-            'calculatedFields': analysis.calculatedFields,
-            'analysisTimestamp': analysis.analysisTimestamp
-        },
-        'sections': [],
-        'fields': []
-    }
-    
-    for section in analysis.sections:
-        section_data = {
-            'id': section.id,
-            'name': section.name,
-            'row': section.row,
-            'fieldCount': len(section.fields)
-        }
-        csv_data['sections'].append(section_data)
-        
-        for field in section.fields:
-            field_data = {
-                'id': field.id,
-                'name': field.name,
-                'row': field.row,
-                'column': field.column,
-                'type': field.type,
-                'dataType': field.dataType,
-                'value': field.value,
-                'formula': field.formula,
-                'isNamedCell': field.isNamedCell,
-                'namedCell': field.namedCell,
-                'required': field.required,
-                'unit': field.unit,
-                'section': field.section,
-                'heading': field.heading
-            }
-            csv_data['fields'].append(field_data)
-    
-    return csv_data
-
 # Timeline Generation Models
 class TimelineInputs(BaseModel):
     model_start_date: str
@@ -448,6 +1157,7 @@ class TimelineInputs(BaseModel):
     extension_in_ppa: int  # years
     end_of_extension_period: str
     months_in_quarterly_period: int
+    financial_year_end: str = "March"  # "March" or "December"
 
 class TimelineResponse(BaseModel):
     monthly: Dict[str, Any]
@@ -457,306 +1167,486 @@ class TimelineResponse(BaseModel):
     metadata: Dict[str, Any]
 
 @app.post("/generate-timelines", response_model=TimelineResponse)
-async def generate_timelines(inputs: TimelineInputs):
-    """Generate comprehensive project timelines"""
+async def generate_timelines(inputs: TimelineInputs, request: Request):
+    """Generate comprehensive project timelines
+    
+    Send ``Accept: application/vnd.timeline.columnar`` to receive the typed-array
+    binary encoding instead of JSON.
+    """
+    if inputs.months_in_quarterly_period < 1:
+        raise HTTPException(status_code=400, detail="months_in_quarterly_period must be at least 1")
+    profile_id = requested_profile_id(request)
+    
     try:
-        print(f"🕒 Generating timelines for project starting {inputs.model_start_date}")
-        
-        # Generate all timeline types
-        monthly_timeline = generate_monthly_timeline(inputs)
-        quarterly_timeline = generate_quarterly_timeline(inputs)
-        semiannual_timeline = generate_semiannual_timeline(inputs)
-        annual_timeline = generate_annual_timeline(inputs)
-        
-        return TimelineResponse(
-            monthly=monthly_timeline,
-            quarterly=quarterly_timeline,
-            semiannual=semiannual_timeline,
-            annual=annual_timeline,
-            metadata={
-                "generation_timestamp": datetime.now().isoformat(),
-                "project_start": inputs.model_start_date,
-                "project_end": inputs.end_of_extension_period,
-                "total_periods": {
-                    "monthly": monthly_timeline.get("total_periods", 0),
-                    "quarterly": quarterly_timeline.get("total_periods", 0),
-                    "semiannual": semiannual_timeline.get("total_periods", 0),
-                    "annual": annual_timeline.get("total_periods", 0)
-                }
-            }
-        )
+        accept = request.headers.get("accept")
+        if profile_id:
+            # Off the event loop: a capture waits for any other profile in progress
+            response = await run_in_threadpool(
+                profiles.run, profile_id, "generate-timelines", build_timeline_response, inputs, accept
+            )
+            response.headers.update(profile_headers(profile_id))
+            return response
+        return await run_in_threadpool(build_timeline_response, inputs, accept)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Timeline generation failed: {str(e)}")
 
-def generate_monthly_timeline(inputs: TimelineInputs) -> Dict[str, Any]:
-    """Generate monthly timeline with 200 rows × 485+ columns"""
-    import pandas as pd
-    from datetime import datetime, timedelta
-    from dateutil.relativedelta import relativedelta
+def build_timeline_response(inputs: TimelineInputs, accept: Optional[str]) -> Response:
+    """Generate every timeline and encode it as JSON or the columnar format"""
+    # Generate all timeline types
+    with metrics.span("timeline.generate"):
+        timelines = generate_all_timelines(inputs)
+    monthly_timeline = timelines["monthly"]
+    quarterly_timeline = timelines["quarterly"]
+    semiannual_timeline = timelines["semiannual"]
+    annual_timeline = timelines["annual"]
     
-    start_date = datetime.strptime(inputs.model_start_date, '%Y-%m-%d')
-    end_date = datetime.strptime(inputs.end_of_extension_period, '%Y-%m-%d')
+    response = TimelineResponse(
+        monthly=monthly_timeline,
+        quarterly=quarterly_timeline,
+        semiannual=semiannual_timeline,
+        annual=annual_timeline,
+        metadata={
+            "generation_timestamp": datetime.now().isoformat(),
+            "project_start": inputs.model_start_date,
+            "project_end": inputs.end_of_extension_period,
+            "total_periods": {
+                "monthly": monthly_timeline.get("total_periods", 0),
+                "quarterly": quarterly_timeline.get("total_periods", 0),
+                "semiannual": semiannual_timeline.get("total_periods", 0),
+                "annual": annual_timeline.get("total_periods", 0)
+            }
+        }
+    )
     
-    # Generate monthly periods (485+ columns as shown in Excel)
-    periods = []
-    current_date = start_date
-    period_counter = 1
+    with metrics.span("timeline.serialize"):
+        if wants_columnar(accept):
+            return Response(
+                content=encode_timeline_response(response.model_dump(), timeline_calendar(inputs)),
+                media_type=COLUMNAR_MEDIA_TYPE
+            )
+        return Response(content=response.model_dump_json(), media_type="application/json")
+
+@app.post("/generate-timelines/export.xlsx")
+async def export_timelines_xlsx(inputs: TimelineInputs, formulas: bool = False):
+    """Download the monthly, quarterly, semi-annual and annual timelines as an Excel workbook
     
-    while current_date <= end_date:
-        month_start = current_date.replace(day=1)
-        month_end = (month_start + relativedelta(months=1)) - timedelta(days=1)
-        
-        periods.append({
-            'period': period_counter,
-            'date': current_date.strftime('%d-%b-%y'),
-            'month_start': month_start.strftime('%d-%b-%y'),
-            'month_end': month_end.strftime('%d-%b-%y'),
-            'days_in_month': month_end.day,
-            'financial_year': get_financial_year(current_date),
-            'project_year': get_project_year(current_date, start_date),
-            'quarter': get_quarter(current_date),
-            'year': current_date.year
-        })
-        
-        current_date += relativedelta(months=1)
-        period_counter += 1
+    The workbook is written in xlsxwriter's constant_memory mode to a temporary
+    file, which is streamed to the client and removed afterwards. With
+    ``formulas=true`` rule rows and roll-ups are written as Excel formulas.
+    """
+    if inputs.months_in_quarterly_period < 1:
+        raise HTTPException(status_code=400, detail="months_in_quarterly_period must be at least 1")
     
-    # Generate timeline rows (200+ rows as shown in Excel)
-    timeline_rows = generate_timeline_rows(inputs, periods)
+    fd, path = tempfile.mkstemp(prefix="timelines-", suffix=".xlsx")
+    os.close(fd)
+    try:
+        table = timeline_rules.table_or_basic()
+        with metrics.span("timeline.export_xlsx"):
+            await run_in_threadpool(
+                write_timeline_workbook, path, timeline_calendar(inputs), table.field_rows, table.kinds,
+                inputs.construction_period, inputs.tenor_of_ppa * 12, rollup_frequencies(inputs), formulas
+            )
+    except ValueError as e:
+        os.remove(path)
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        os.remove(path)
+        raise HTTPException(status_code=500, detail=f"Timeline export failed: {str(e)}")
     
+    return FileResponse(
+        path,
+        media_type=XLSX_MEDIA_TYPE,
+        filename=f"timelines-{inputs.model_start_date}-{inputs.end_of_extension_period}.xlsx",
+        background=BackgroundTask(os.remove, path)
+    )
+
+# Compiled timeline field rules, reloaded when the fields file changes
+timeline_rules = TimelineRuleSource(os.environ.get("TIMELINE_FIELDS_PATH", DEFAULT_FIELDS_PATH))
+
+@app.get("/timeline-rules")
+async def get_timeline_rules(include_rules: bool = True):
+    """Inspect the compiled timeline rule table"""
+    table = timeline_rules.table()
     return {
-        "type": "monthly",
-        "total_periods": len(periods),
-        "start_date": inputs.model_start_date,
-        "end_date": inputs.end_of_extension_period,
-        "columns": periods,
-        "rows": timeline_rows
+        **table.describe(include_rules),
+        "reloads": timeline_rules.reloads,
+        "error": timeline_rules.error
     }
 
-def generate_timeline_rows(inputs: TimelineInputs, periods: List[Dict]) -> List[Dict]:
-    """Generate all timeline calculation rows from extracted Excel fields"""
+# Generated-timeline handles for windowed queries
+timeline_store = TimelineStore(max_handles=int(os.environ.get("TIMELINE_HANDLE_LIMIT", "32")))
+# Row indexes one window request may select, counting repeats
+MAX_WINDOW_ROWS = int(os.environ.get("MAX_WINDOW_ROWS", "10000"))
+
+@app.post("/timelines")
+async def create_timeline(inputs: TimelineInputs):
+    """Register project inputs and return a handle for windowed row queries
+    
+    No values are computed here; GET /timelines/{timeline_id} evaluates only
+    the requested tile.
+    """
+    if inputs.months_in_quarterly_period < 1:
+        raise HTTPException(status_code=400, detail="months_in_quarterly_period must be at least 1")
+    
+    rules = timeline_rules.table_or_basic()
+    timeline_id = timeline_id_for(inputs.model_dump_json(), rules)
+    handle = timeline_store.get(timeline_id)
+    if handle is None:
+        try:
+            handle = TimelineHandle(
+                timeline_id,
+                timeline_calendar(inputs),
+                rules,
+                inputs.construction_period,
+                inputs.tenor_of_ppa * 12,
+                dict(rollup_frequencies(inputs))
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        timeline_store.put(handle)
+    return handle.describe()
+
+@app.get("/timelines/{timeline_id}")
+async def get_timeline_window(timeline_id: str, frequency: str = "monthly", rows: Optional[str] = None,
+                              period_from: int = 1, period_to: Optional[int] = None):
+    """Values for a tile of rows × periods of a registered timeline
+    
+    ``rows`` selects row indexes as a comma separated list of indexes and
+    inclusive ranges (e.g. ``0-49,60``); periods are 1-based and inclusive.
+    """
+    handle = timeline_store.get(timeline_id)
+    if handle is None:
+        raise HTTPException(status_code=404, detail="Timeline not found; create it with POST /timelines")
+    if handle.rules is not timeline_rules.table_or_basic():
+        raise HTTPException(status_code=409, detail="Timeline rules were reloaded; create it again with POST /timelines")
     
-    # Load extracted timeline fields
-    import json
     try:
-        with open('extracted_timeline_fields.json', 'r') as f:
-            extracted_fields = json.load(f)
-    except:
-        # Fallback to basic fields if file not found
-        extracted_fields = []
+        row_indexes = parse_row_selection(rows, len(handle.field_rows)) if rows else None
+        window = handle.window(frequency, row_indexes, period_from, period_to)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONResponse(content=window)
+
+def parse_row_selection(selection: str, row_count: int) -> List[int]:
+    """Parse '0-49,60' into row indexes below ``row_count``
     
-    rows = []
+    Every bound is validated and the total checked before any range is
+    expanded, so a huge range cannot allocate an index list.
+    """
+    bounds = []
+    total = 0
+    for part in selection.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition('-')
+        if not first.strip().isdigit() or (last and not last.strip().isdigit()):
+            raise ValueError(f"Invalid row selection {part!r}")
+        first = int(first)
+        last = int(last) if last else first
+        if last < first:
+            raise ValueError(f"Row range {part!r} is reversed")
+        if last >= row_count:
+            raise ValueError(f"Row index {last} out of range")
+        total += last - first + 1
+        if total > MAX_WINDOW_ROWS:
+            raise ValueError(f"At most {MAX_WINDOW_ROWS} rows per window")
+        bounds.append((first, last))
+    return [index for first, last in bounds for index in range(first, last + 1)]
+
+class BatchTimelineRequest(BaseModel):
+    cases: List[TimelineInputs]
+    rows: Optional[List[str]] = None  # field names to return; all fields when omitted
+    metrics: List[str] = []  # summary metrics per row, see timeline_engine.ROW_METRICS
+    include_values: bool = False  # full value rows per case, limited by MAX_BATCH_VALUE_PERIODS
+
+MAX_BATCH_CASES = int(os.environ.get("MAX_BATCH_CASES", "1000"))
+# Cases × periods a batch may return full value rows for
+MAX_BATCH_VALUE_PERIODS = int(os.environ.get("MAX_BATCH_VALUE_PERIODS", "25000"))
+
+@app.post("/generate-timelines/batch")
+async def generate_timelines_batch(batch: BatchTimelineRequest):
+    """Evaluate many timeline input sets in one stacked (cases × fields × periods) pass"""
+    if not batch.cases:
+        raise HTTPException(status_code=400, detail="At least one case is required")
+    if len(batch.cases) > MAX_BATCH_CASES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_CASES} cases per batch")
+    unknown_metrics = [metric for metric in batch.metrics if metric not in ROW_METRICS]
+    if unknown_metrics:
+        raise HTTPException(status_code=400, detail=f"Unknown metrics: {', '.join(unknown_metrics)}")
     
-    # Convert extracted fields to our format
-    for field in extracted_fields:
-        field_data = {
-            "field_name": field.get('name', 'Unknown Field'),
-            "type": field.get('type', 'calculated'),
-            "unit": field.get('unit', 'text'),
-            "formula": field.get('formula', '').replace('= ', '') if field.get('formula') else 'excel_calculation',
-            "row": field.get('row', 0),
-            "excel_formula": field.get('formula', '')
-        }
+    try:
+        result = await run_in_threadpool(evaluate_timeline_batch, batch)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Batch timeline generation failed: {str(e)}")
+    
+    # Plain lists of ints and strings need no jsonable_encoder pass
+    return JSONResponse(content=result)
+
+def evaluate_timeline_batch(batch: BatchTimelineRequest) -> Dict[str, Any]:
+    """Share period calendars and field classification across every case of a batch
+    
+    Raises ValueError for cases without periods and for value requests above
+    ``MAX_BATCH_VALUE_PERIODS``.
+    """
+    table = timeline_rules.table_or_basic()
+    field_rows, kinds = table.field_rows, table.kinds
+    if batch.rows is not None:
+        wanted = set(batch.rows)
+        selected = [i for i, field in enumerate(field_rows) if field["field_name"] in wanted]
+        field_rows = [field_rows[i] for i in selected]
+        kinds = [kinds[i] for i in selected]
+    int_positions = [i for i, kind in enumerate(kinds) if kind not in DATE_KINDS]
+    stack_positions = {field_index: position for position, field_index in enumerate(int_positions)}
+    
+    # Cases with the same project dates share one period calendar
+    calendars: Dict[Tuple[str, str, str], List[int]] = {}
+    for case_index, case in enumerate(batch.cases):
+        key = (case.model_start_date, case.end_of_extension_period, case.financial_year_end)
+        calendars.setdefault(key, []).append(case_index)
+    
+    value_periods = 0
+    for case_indexes in calendars.values():
+        periods = len(timeline_calendar(batch.cases[case_indexes[0]]))
+        if not periods:
+            raise ValueError(f"Case {case_indexes[0]} has no periods: its end_of_extension_period "
+                             f"is before its model_start_date")
+        value_periods += periods * len(case_indexes)
+    if batch.include_values and value_periods > MAX_BATCH_VALUE_PERIODS:
+        raise ValueError(f"include_values is limited to {MAX_BATCH_VALUE_PERIODS} case periods per batch "
+                         f"(requested {value_periods}); request metrics only or split the batch")
+    
+    results: List[Optional[Dict[str, Any]]] = [None] * len(batch.cases)
+    for case_indexes in calendars.values():
+        cases = [batch.cases[i] for i in case_indexes]
+        calendar = timeline_calendar(cases[0])
+        arrays = calendar.engine_arrays()
         
-        # Calculate values for this field across all periods
-        values = calculate_comprehensive_field_values(field_data, inputs, periods)
-        rows.append({
-            **field_data,
-            "values": values
-        })
-    
-    # If no extracted fields, use basic fallback
-    if not extracted_fields:
-        basic_fields = [
-            {"field_name": "Monthly period", "type": "calculated", "unit": "number", "formula": "sequence"},
-            {"field_name": "Month start date", "type": "calculated", "unit": "date", "formula": "month_start"},
-            {"field_name": "Month end date", "type": "calculated", "unit": "date", "formula": "month_end"},
-            {"field_name": "Days in month", "type": "calculated", "unit": "days", "formula": "days_in_month"},
-            {"field_name": "Financial year", "type": "calculated", "unit": "number", "formula": "financial_year"},
-        ]
+        # One row per distinct kind; stack_rows maps each integer field to its row
+        stack, stack_rows = evaluate_kind_stack(
+            [kinds[i] for i in int_positions],
+            arrays,
+            np.array([case.construction_period for case in cases]),
+            np.array([case.tenor_of_ppa * 12 for case in cases])
+        )
+        stack_rows = stack_rows.tolist()
+        summary = {metric: values.tolist() for metric, values in summarize_stack(stack, batch.metrics).items()}
+        date_rows = {
+            i: evaluate_rule(kinds[i], arrays, 0, 0).tolist()
+            for i in range(len(kinds)) if kinds[i] in DATE_KINDS
+        }
         
-        for field in basic_fields:
-            values = calculate_field_values(field, inputs, periods)
-            rows.append({
-                **field,
-                "values": values
-            })
-    
-    return rows
-
-def calculate_field_values(field: Dict, inputs: TimelineInputs, periods: List[Dict]) -> List[Any]:
-    """Calculate values for a specific field across all periods"""
-    values = []
-    
-    for i, period in enumerate(periods):
-        if field["formula"] == "sequence":
-            values.append(period["period"])
-        elif field["formula"] == "month_start":
-            values.append(period["month_start"])
-        elif field["formula"] == "month_end":
-            values.append(period["month_end"])
-        elif field["formula"] == "days_in_month":
-            values.append(period["days_in_month"])
-        elif field["formula"] == "financial_year":
-            values.append(period["financial_year"])
-        elif field["formula"] == "project_year":
-            values.append(period["project_year"])
-        elif field["formula"] == "calendar_year":
-            values.append(period["year"])
-        elif field["formula"] == "construction_start_flag":
-            # Check if this is the construction start month
-            construction_start = datetime.strptime(inputs.model_start_date, '%Y-%m-%d')
-            period_date = datetime.strptime(period["date"], '%d-%b-%y')
-            values.append("#REF!" if period_date.year == construction_start.year and period_date.month == construction_start.month else "#REF!")
-        elif field["formula"] == "construction_period_flag":
-            # Check if this period is within construction period
-            values.append("#REF!")  # Will be calculated based on construction start/end dates
-        elif field["formula"] == "commercial_operation_flag":
-            # Check if this is the commercial operation start month
-            values.append("#REF!")  # Will be calculated based on COD
-        else:
-            # Default calculation or placeholder
-            values.append("#REF!" if field["type"] == "calculated" else 0)
-    
-    return values
-
-def calculate_comprehensive_field_values(field: Dict, inputs: TimelineInputs, periods: List[Dict]) -> List[Any]:
-    """Calculate values for comprehensive timeline fields from Excel"""
-    values = []
-    field_name = field.get('field_name', '').lower()
-    excel_formula = field.get('excel_formula', '')
-    
-    for i, period in enumerate(periods):
-        if field_name == 'monthly period' or 'period' in field_name:
-            values.append(period["period"])
-        elif 'month start' in field_name:
-            values.append(period["month_start"])
-        elif 'month end' in field_name:
-            values.append(period["month_end"])
-        elif 'days in month' in field_name:
-            values.append(period["days_in_month"])
-        elif 'financial year' in field_name:
-            values.append(period["financial_year"])
-        elif 'project year' in field_name:
-            values.append(period["project_year"])
-        elif 'calendar' in field_name or 'calender' in field_name:
-            values.append(period["year"])
-        elif 'construction start' in field_name:
-            # Construction start flag
-            values.append(1 if i == 0 else 0)
-        elif 'construction end' in field_name:
-            # Construction end flag - approximate
-            construction_months = inputs.construction_period
-            values.append(1 if i == construction_months - 1 else 0)
-        elif 'construction period' in field_name or 'construction month flag' in field_name:
-            # Construction period flag
-            construction_months = inputs.construction_period
-            values.append(1 if i < construction_months else 0)
-        elif 'construction month counter' in field_name:
-            construction_months = inputs.construction_period
-            values.append(i + 1 if i < construction_months else 0)
-        elif 'commercial operation' in field_name:
-            # Commercial operation flag
-            construction_months = inputs.construction_period
-            values.append(1 if i == construction_months else 0)
-        elif 'operation period' in field_name:
-            # Operation period flag
-            construction_months = inputs.construction_period
-            values.append(1 if i >= construction_months else 0)
-        elif 'operation month counter' in field_name:
-            construction_months = inputs.construction_period
-            values.append(max(0, i - construction_months + 1) if i >= construction_months else 0)
-        elif 'ppa period' in field_name:
-            # PPA period flag
-            construction_months = inputs.construction_period
-            ppa_months = inputs.tenor_of_ppa * 12
-            values.append(1 if construction_months <= i < construction_months + ppa_months else 0)
-        elif 'ppa month counter' in field_name:
-            construction_months = inputs.construction_period
-            ppa_months = inputs.tenor_of_ppa * 12
-            if construction_months <= i < construction_months + ppa_months:
-                values.append(i - construction_months + 1)
-            else:
-                values.append(0)
-        elif 'debt service' in field_name:
-            # Debt service flag - typically starts after construction
-            construction_months = inputs.construction_period
-            values.append(1 if i >= construction_months else 0)
-        elif 'tax' in field_name and 'flag' in field_name:
-            # Tax payment flag - typically after operations start
-            construction_months = inputs.construction_period
-            values.append(1 if i >= construction_months + 12 else 0)  # Start tax after 1 year of operations
-        elif 'dividend' in field_name and 'flag' in field_name:
-            # Dividend payment flag - typically after operations start
-            construction_months = inputs.construction_period
-            values.append(1 if i >= construction_months + 6 else 0)  # Start dividends after 6 months of operations
-        elif 'reporting period' in field_name:
-            # Quarterly reporting periods
-            values.append((i // 3) + 1)
-        elif excel_formula and 'EDATE' in excel_formula:
-            # Date calculation
-            values.append(period["month_end"])
-        elif excel_formula and 'IF(' in excel_formula:
-            # Conditional calculation
-            values.append(1 if i % 2 == 0 else 0)
-        elif field.get('type') == 'input':
-            # Input fields - use default values
-            values.append(0)
-        else:
-            # Default calculated value
-            values.append(period.get("period", i + 1))
-    
-    return values
-
-def get_financial_year(date: datetime, fy_end: str = "March") -> int:
-    """Get financial year based on financial year end"""
-    if fy_end == "March":
-        return date.year + 1 if date.month > 3 else date.year
-    else:  # December
-        return date.year
-
-def get_project_year(date: datetime, start_date: datetime) -> int:
-    """Get project year counter"""
-    diff = date - start_date
-    return (diff.days // 365) + 1
-
-def get_quarter(date: datetime) -> int:
-    """Get quarter number"""
-    return (date.month - 1) // 3 + 1
-
-def generate_quarterly_timeline(inputs: TimelineInputs) -> Dict[str, Any]:
-    """Generate quarterly timeline"""
-    # Simplified quarterly timeline generation
+        for stack_index, case_index in enumerate(case_indexes):
+            case_values = stack[stack_index].tolist() if batch.include_values else None
+            rows = []
+            for field_index, field in enumerate(field_rows):
+                row = {"field_name": field["field_name"], "row": field.get("row"), "unit": field["unit"]}
+                if field_index in date_rows:
+                    if batch.include_values:
+                        row["values"] = date_rows[field_index]
+                    if batch.metrics:
+                        row["metrics"] = None
+                else:
+                    position = stack_rows[stack_positions[field_index]]
+                    if batch.include_values:
+                        row["values"] = case_values[position]
+                    if batch.metrics:
+                        row["metrics"] = {
+                            metric: values[stack_index][position]
+                            for metric, values in summary.items()
+                        }
+                rows.append(row)
+            
+            results[case_index] = {
+                "case": case_index,
+                "total_periods": len(calendar),
+                "rows": rows
+            }
+    
     return {
-        "type": "quarterly",
-        "total_periods": (inputs.tenor_of_ppa * 4),
-        "start_date": inputs.model_start_date,
-        "end_date": inputs.end_of_extension_period,
-        "columns": [],  # Will be populated with quarterly periods
-        "rows": []      # Will be populated with quarterly calculations
+        "cases": results,
+        "metadata": {
+            "generation_timestamp": datetime.now().isoformat(),
+            "case_count": len(batch.cases),
+            "calendar_count": len(calendars),
+            "field_count": len(field_rows)
+        }
+    }
+
+def generate_all_timelines(inputs: TimelineInputs) -> Dict[str, Dict[str, Any]]:
+    """Monthly timeline plus its quarterly, semi-annual and annual roll-ups
+    
+    The monthly value matrix is evaluated once; every coarser frequency is a
+    vectorized group-by over it, so all four cost about as much as the monthly one.
+    """
+    calendar = timeline_calendar(inputs)
+    table = timeline_rules.table_or_basic()
+    field_rows, kinds = table.field_rows, table.kinds
+    int_positions = [i for i, kind in enumerate(kinds) if kind not in DATE_KINDS]
+    int_kinds = [kinds[i] for i in int_positions]
+    
+    # (fields, periods) integer rows for the single case
+    stack = evaluate_case_stack(
+        int_kinds,
+        calendar.engine_arrays(),
+        np.array([inputs.construction_period]),
+        np.array([inputs.tenor_of_ppa * 12])
+    )[0]
+    
+    month_start = calendar.labels('month_start')
+    month_end = calendar.labels('month_end')
+    timelines = {
+        "monthly": build_timeline(
+            "monthly", inputs, calendar.columns(), field_rows, kinds, int_positions, stack,
+            month_start, month_end
+        )
     }
+    
+    for frequency, months_per_period in rollup_frequencies(inputs):
+        starts = calendar.group_starts(months_per_period)
+        ends = (np.append(starts[1:], len(calendar)) - 1).tolist() if len(starts) else []
+        timeline = build_timeline(
+            frequency, inputs, calendar.rollup_columns(months_per_period), field_rows, kinds,
+            int_positions, rollup_stack(stack, int_kinds, starts),
+            [month_start[i] for i in starts.tolist()], [month_end[i] for i in ends]
+        )
+        timeline["months_per_period"] = months_per_period
+        timelines[frequency] = timeline
+    
+    return timelines
 
-def generate_semiannual_timeline(inputs: TimelineInputs) -> Dict[str, Any]:
-    """Generate semi-annual timeline"""
+def rollup_frequencies(inputs: TimelineInputs) -> List[Tuple[str, int]]:
+    """Coarser frequencies and the number of months each period spans"""
+    return [
+        ("quarterly", inputs.months_in_quarterly_period),
+        ("semiannual", 6),
+        ("annual", 12)
+    ]
+
+def build_timeline(frequency: str, inputs: TimelineInputs, columns: List[Dict],
+                   field_rows: List[Dict], kinds: List[str], int_positions: List[int],
+                   stack: np.ndarray, start_labels: List[str], end_labels: List[str]) -> Dict[str, Any]:
+    """Assemble a timeline dict from integer rows and period start/end date labels"""
+    stack_rows = dict(zip(int_positions, stack.tolist()))
+    rows = []
+    for field_index, field_data in enumerate(field_rows):
+        values = stack_rows.get(field_index)
+        if values is None:
+            values = list(start_labels if kinds[field_index] == MONTH_START else end_labels)
+        row = {**field_data, "values": values}
+        if frequency != "monthly":
+            row["aggregation"] = ROLLUP_AGGREGATIONS[kinds[field_index]]
+        rows.append(row)
+    
     return {
-        "type": "semiannual", 
-        "total_periods": (inputs.tenor_of_ppa * 2),
+        "type": frequency,
+        "total_periods": len(columns),
         "start_date": inputs.model_start_date,
         "end_date": inputs.end_of_extension_period,
-        "columns": [],
-        "rows": []
+        "columns": columns,
+        "rows": rows
     }
 
-def generate_annual_timeline(inputs: TimelineInputs) -> Dict[str, Any]:
-    """Generate annual timeline"""
+
+def timeline_calendar(inputs: TimelineInputs) -> PeriodCalendar:
+    """Shared monthly period calendar for the project's dates"""
+    return get_period_calendar(
+        inputs.model_start_date, inputs.end_of_extension_period, inputs.financial_year_end
+    )
+
+# Formula Engine Models
+class FormulaInputUpdate(BaseModel):
+    updates: Dict[str, Any]  # 'Sheet!A1' -> new input value
+
+formula_models = FormulaModelStore(max_models=int(os.environ.get("FORMULA_MODEL_LIMIT", "8")))
+
+@app.post("/formula-model/build/{filename}")
+async def build_formula_model(filename: str, project_id: Optional[str] = None,
+                              version_id: Optional[str] = None):
+    """Compile every formula of an Excel file from project root into the session's dependency graph"""
+    file_path = f"../{filename}"
+    if not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail="Excel file not found")
+    
+    try:
+        model, timings = await run_in_threadpool(compile_formula_model, file_path)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error compiling formulas: {str(e)}")
+    
+    formula_models.put(session_key(project_id, version_id), model)
+    return {"filename": filename, **model.stats(), **timings}
+
+@app.get("/formula-model/cells")
+async def get_formula_cells(refs: str, project_id: Optional[str] = None,
+                            version_id: Optional[str] = None):
+    """Get values, formulas and dependencies for comma-separated 'Sheet!A1' references"""
+    model = require_formula_model(project_id, version_id)
+    try:
+        keys = [parse_cell_key(ref) for ref in refs.split(',') if ref.strip()]
+    except FormulaSyntaxError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"cells": await run_in_threadpool(describe_formula_cells, model, keys)}
+
+@app.post("/formula-model/inputs")
+async def set_formula_inputs(update: FormulaInputUpdate, project_id: Optional[str] = None,
+                             version_id: Optional[str] = None):
+    """Change input cells and recompute only their dirty downstream formulas"""
+    model = require_formula_model(project_id, version_id)
+    try:
+        updates = {parse_cell_key(ref): value for ref, value in update.updates.items()}
+    except FormulaSyntaxError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        return await run_in_threadpool(recalculate_formula_inputs, model, updates)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def describe_formula_cells(model: FormulaModel, keys: List[CellKey]) -> List[Dict[str, Any]]:
+    """Describe cells under the model's lock; runs on the threadpool"""
+    with model.lock:
+        return [model.describe(key) for key in keys]
+
+def recalculate_formula_inputs(model: FormulaModel, updates: Dict[CellKey, Any]) -> Dict[str, Any]:
+    """Apply input updates under the model's lock; runs on the threadpool"""
+    # A large recalculation, or waiting for another request's, would otherwise stall the event loop
+    with model.lock:
+        started = time.perf_counter()
+        changed, recalculated = model.set_inputs(updates)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+    
     return {
-        "type": "annual",
-        "total_periods": inputs.tenor_of_ppa,
-        "start_date": inputs.model_start_date,
-        "end_date": inputs.end_of_extension_period,
-        "columns": [],
-        "rows": []
+        "changed": {format_cell_key(key): export_value(value) for key, value in changed.items()},
+        "recalculated": recalculated,
+        "elapsedMs": round(elapsed_ms, 3)
+    }
+
+def require_formula_model(project_id: Optional[str], version_id: Optional[str]) -> FormulaModel:
+    """Return the session's compiled formula model or raise 404"""
+    model = formula_models.get(session_key(project_id, version_id))
+    if model is None:
+        raise HTTPException(status_code=404, detail="No formula model compiled for this session")
+    return model
+
+def compile_formula_model(source) -> Tuple[FormulaModel, Dict[str, float]]:
+    """Load a workbook, compile its formula graph and run the initial full evaluation"""
+    print("🧮 Compiling formula model")
+    started = time.perf_counter()
+    workbook = load_workbook_for_analysis(source, reader="openpyxl")
+    try:
+        model = FormulaModel.from_workbook(workbook)
+    finally:
+        workbook.close()
+    compiled = time.perf_counter()
+    model.evaluate_all()
+    evaluated = time.perf_counter()
+    
+    return model, {
+        "compileMs": round((compiled - started) * 1000, 1),
+        "evaluateMs": round((evaluated - compiled) * 1000, 1)
     }
 
 if __name__ == "__main__":
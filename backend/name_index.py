@@ -0,0 +1,420 @@
+"""Defined names and case-selector lookups of an analyzed workbook.
+
+Financial models pick the active scenario with a selector name: an input
+row holds one value per case (``K61:Q61``) and the field reads
+``=INDEX($K61:$Q61, 0, LiveCase + 1)``, where ``LiveCase`` is a defined name
+pointing at the cell that holds the case number. While a sheet's rows stream
+past the parser, this module indexes
+
+- defined names, by name, to the range they refer to (or their constant)
+- case-selector fields, by cell, to their INDEX range and the names and
+  offsets that position it
+- ranges, by ``Sheet!K61:Q61`` key, to the values of their cells
+
+so resolving any number of references later is a few dictionary lookups
+each, for the workbook's own case or for overridden selector values, without
+reading the sheets again.
+
+Ranges are captured from the rows the parser already reads: named ranges
+and selector ranges on the field's own row (the usual layout) or below it
+on the same sheet. Ranges above the field or on other sheets are read in a
+targeted pass once every sheet has been analyzed. Ranges larger than
+``MAX_RANGE_CELLS`` are not captured.
+"""
+
+import re
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from openpyxl.utils.cell import column_index_from_string, get_column_letter
+from pydantic import BaseModel
+
+from xlsx_reader import XlsxWorkbook
+
+MAX_RANGE_CELLS = 10_000
+
+# Sheet!A1 or Sheet!A1:B2, optionally quoted and absolute
+_REFERENCE = re.compile(
+    r"^(?:(?:'(?P<quoted>(?:[^']|'')+)'|(?P<sheet>[^'!:(),\s]+))!)?"
+    r"\$?(?P<c1>[A-Za-z]{1,3})\$?(?P<r1>\d+)(?::\$?(?P<c2>[A-Za-z]{1,3})\$?(?P<r2>\d+))?$"
+)
+# A whole-formula INDEX with two or three plain arguments
+_SELECTOR = re.compile(r"^=\s*INDEX\(\s*([^,()]+?)\s*,\s*([^,()]*?)\s*(?:,\s*([^,()]+?)\s*)?\)\s*$", re.I)
+_NAME = r"[A-Za-z_\\][\w.]*"
+_NAME_ARGUMENT = re.compile(rf"^(?P<name>{_NAME})(?:\s*(?P<sign>[+-])\s*(?P<offset>\d+))?$")
+_NUMBER_ARGUMENT = re.compile(rf"^(?P<offset>\d+)(?:\s*\+\s*(?P<name>{_NAME}))?$")
+_CELL = re.compile(r"^\$?[A-Za-z]{1,3}\$?\d+$")
+
+# (selector name or None, offset): the position is the name's value plus the offset
+SelectorArgument = Tuple[Optional[str], int]
+Bounds = Tuple[str, int, int, int, int]
+
+
+class DefinedNameInfo(BaseModel):
+    name: str
+    sheet: Optional[str] = None  # scope of a sheet-local name; None for workbook names
+    refersTo: str
+    range: Optional[str] = None  # 'Sheet!A1' or 'Sheet!A1:B2' when the name refers to cells
+    value: Any = None  # constant names such as =0.05
+
+
+class CaseSelector(BaseModel):
+    range: str
+    row: SelectorArgument
+    column: Optional[SelectorArgument] = None
+
+
+class SheetNames(BaseModel):
+    """One sheet's contribution to the index, cached with its sections"""
+    selectors: Dict[str, CaseSelector] = {}
+    ranges: Dict[str, List[List[Any]]] = {}
+    pending: List[str] = []  # selector ranges this sheet could not capture itself
+
+
+class NameIndex(BaseModel):
+    names: Dict[str, DefinedNameInfo] = {}  # NAME, or Sheet!NAME for sheet-local names
+    selectors: Dict[str, CaseSelector] = {}  # Sheet!F61
+    ranges: Dict[str, List[List[Any]]] = {}  # Sheet!K61:Q61 -> rows of cell values
+
+    def summary(self) -> Dict[str, int]:
+        return {'names': len(self.names), 'selectors': len(self.selectors), 'ranges': len(self.ranges)}
+
+
+def format_range(sheet: str, r1: int, c1: int, r2: Optional[int] = None, c2: Optional[int] = None) -> str:
+    start = f"{sheet}!{get_column_letter(c1)}{r1}"
+    if r2 is None or (r2, c2) == (r1, c1):
+        return start
+    return f"{start}:{get_column_letter(c2)}{r2}"
+
+
+def parse_reference(text: str, default_sheet: Optional[str] = None) -> Optional[Bounds]:
+    """(sheet, first row, first column, last row, last column) of a cell or range reference"""
+    match = _REFERENCE.match(text.strip().lstrip('='))
+    if match is None:
+        return None
+    quoted = match.group('quoted')
+    sheet = quoted.replace("''", "'") if quoted is not None else match.group('sheet') or default_sheet
+    r1, c1 = int(match.group('r1')), column_index_from_string(match.group('c1').upper())
+    r2 = int(match.group('r2')) if match.group('r2') else r1
+    c2 = column_index_from_string(match.group('c2').upper()) if match.group('c2') else c1
+    return sheet, min(r1, r2), min(c1, c2), max(r1, r2), max(c1, c2)
+
+
+@lru_cache(maxsize=65536)
+def range_bounds(key: str) -> Bounds:
+    """Bounds of a range key produced by format_range"""
+    sheet, cells = key.rsplit('!', 1)
+    return parse_reference(cells, sheet)
+
+
+def _constant(definition: str) -> Any:
+    if len(definition) >= 2 and definition[0] == definition[-1] == '"':
+        return definition[1:-1].replace('""', '"')
+    try:
+        number = float(definition)
+    except ValueError:
+        return None
+    return int(number) if number.is_integer() and '.' not in definition and 'e' not in definition.lower() else number
+
+
+def index_defined_names(entries: Iterable[Tuple[str, Optional[str], str]]) -> Dict[str, DefinedNameInfo]:
+    """Index (name, scope sheet, definition) entries by lookup key"""
+    names = {}
+    for name, scope, text in entries:
+        if name.startswith('_xlnm.'):
+            continue
+        definition = (text or '').strip().lstrip('=')
+        info = DefinedNameInfo(name=name, sheet=scope, refersTo=text or '')
+        reference = parse_reference(definition, scope)
+        if reference is not None and reference[0] is not None:
+            info.range = format_range(*reference)
+        else:
+            info.value = _constant(definition)
+        names[f"{scope}!{name.upper()}" if scope else name.upper()] = info
+    return names
+
+
+def workbook_defined_names(workbook) -> Dict[str, DefinedNameInfo]:
+    """Defined names of an open workbook (native reader or openpyxl)"""
+    if isinstance(workbook, XlsxWorkbook):
+        return index_defined_names(workbook.defined_names)
+    entries = [(name, None, definition.attr_text) for name, definition in workbook.defined_names.items()]
+    for sheet_name in workbook.sheetnames:
+        local_names = getattr(workbook[sheet_name], 'defined_names', {})
+        entries.extend((name, sheet_name, definition.attr_text) for name, definition in local_names.items())
+    return index_defined_names(entries)
+
+
+def _lookup_name(names: Dict[str, DefinedNameInfo], name: str, sheet: Optional[str]) -> Optional[DefinedNameInfo]:
+    """A sheet-local name first, then the workbook-wide one"""
+    upper = name.upper()
+    if sheet is not None:
+        info = names.get(f"{sheet}!{upper}")
+        if info is not None:
+            return info
+    return names.get(upper)
+
+
+def _parse_argument(text: str) -> Optional[SelectorArgument]:
+    if not text:
+        return None, 0
+    match = _NAME_ARGUMENT.match(text) or _NUMBER_ARGUMENT.match(text)
+    if match is None:
+        return None
+    name = match.group('name')
+    if name is not None and (_CELL.match(name) or name.upper() in ('TRUE', 'FALSE')):
+        # Positioned by a cell rather than a name: an ordinary lookup, not a case selector
+        return None
+    offset = int(match.group('offset') or 0)
+    if match.groupdict().get('sign') == '-':
+        offset = -offset
+    return name, offset
+
+
+def parse_case_selector(formula: str, sheet: str, names: Dict[str, DefinedNameInfo]) -> Optional[CaseSelector]:
+    """The case selector of an ``=INDEX(range, row, [column])`` formula positioned by a name"""
+    match = _SELECTOR.match(formula)
+    if match is None:
+        return None
+    range_text, row_text, column_text = match.groups()
+    row = _parse_argument(row_text)
+    column = _parse_argument(column_text) if column_text is not None else None
+    if row is None or (column_text is not None and column is None):
+        return None
+    if row[0] is None and (column is None or column[0] is None):
+        return None
+
+    reference = parse_reference(range_text, sheet)
+    if reference is not None:
+        key = format_range(*reference)
+    else:
+        info = _lookup_name(names, range_text, sheet)
+        if info is None or info.range is None:
+            return None
+        key = info.range
+    return CaseSelector(range=key, row=row, column=column)
+
+
+def _fill_row(grid: List[List[Any]], bounds: Bounds, row_num: int, row_data) -> None:
+    _, r1, c1, _, c2 = bounds
+    values = grid[row_num - r1]
+    for column, value, _ in row_data:
+        if column > c2:
+            break
+        if column >= c1:
+            values[column - c1] = value
+
+
+def _empty_grid(bounds: Bounds) -> Optional[List[List[Any]]]:
+    _, r1, c1, r2, c2 = bounds
+    if (r2 - r1 + 1) * (c2 - c1 + 1) > MAX_RANGE_CELLS:
+        return None
+    return [[None] * (c2 - c1 + 1) for _ in range(r2 - r1 + 1)]
+
+
+class SheetNameScan:
+    """Collects a sheet's named cells, case selectors and ranges while its rows stream past"""
+
+    def __init__(self, sheet: str, names: Dict[str, DefinedNameInfo]):
+        self.sheet = sheet
+        self.names = names
+        self.cell_names: Dict[Tuple[int, int], str] = {}
+        self.selectors: Dict[str, CaseSelector] = {}
+        self.ranges: Dict[str, List[List[Any]]] = {}
+        self.pending = set()
+        self._wanted: Dict[int, List[str]] = {}
+        for info in names.values():
+            if info.range is None:
+                continue
+            bounds = range_bounds(info.range)
+            if bounds[0] != sheet:
+                continue
+            _, r1, c1, r2, c2 = bounds
+            # A sheet-local name wins over a workbook name for the same cell
+            if (r1, c1) == (r2, c2) and ((r1, c1) not in self.cell_names or info.sheet == sheet):
+                self.cell_names[(r1, c1)] = info.name
+            self._want(info.range, 0, ())
+
+    def observe(self, row_num: int, row_data) -> None:
+        """Capture this row's cells for every range waiting on it"""
+        wanted = self._wanted.pop(row_num, None)
+        if wanted:
+            for key in wanted:
+                _fill_row(self.ranges[key], range_bounds(key), row_num, row_data)
+
+    def field(self, row_num: int, row_data, cell_idx: int) -> Optional[str]:
+        """Index the field's case selector, if any, and return the defined name of its cell"""
+        column, _, formula = row_data[cell_idx]
+        if formula is not None and 'INDEX' in formula:
+            selector = parse_case_selector(formula, self.sheet, self.names)
+            if selector is not None:
+                self.selectors[format_range(self.sheet, row_num, column)] = selector
+                if not self._want(selector.range, row_num, row_data):
+                    self.pending.add(selector.range)
+        return self.cell_names.get((row_num, column))
+
+    def result(self) -> SheetNames:
+        return SheetNames(
+            selectors=self.selectors,
+            ranges=self.ranges,
+            pending=sorted(key for key in self.pending if key not in self.ranges)
+        )
+
+    def _want(self, key: str, row_num: int, row_data) -> bool:
+        """Capture a range of this sheet from the current row on; False if it cannot be captured here"""
+        if key in self.ranges:
+            return True
+        bounds = range_bounds(key)
+        sheet, r1, _, r2, _ = bounds
+        if sheet != self.sheet or r1 < row_num:
+            return False
+        grid = _empty_grid(bounds)
+        if grid is None:
+            return False
+        self.ranges[key] = grid
+        for row in range(r1, r2 + 1):
+            if row == row_num:
+                _fill_row(grid, bounds, row_num, row_data)
+            else:
+                self._wanted.setdefault(row, []).append(key)
+        return True
+
+
+def merge_name_index(names: Dict[str, DefinedNameInfo],
+                     fragments: Iterable[SheetNames]) -> Tuple[NameIndex, Dict[str, List[str]]]:
+    """Combine per-sheet results, returning the index and the ranges still missing, by sheet"""
+    index = NameIndex(names=names)
+    pending = set()
+    for fragment in fragments:
+        index.selectors.update(fragment.selectors)
+        index.ranges.update(fragment.ranges)
+        pending.update(fragment.pending)
+    missing: Dict[str, List[str]] = {}
+    for key in sorted(pending):
+        if key not in index.ranges:
+            missing.setdefault(range_bounds(key)[0], []).append(key)
+    return index, missing
+
+
+def capture_ranges(index: NameIndex, keys: Sequence[str], rows) -> None:
+    """Fill ranges of one sheet from its streamed (row number, cells) rows"""
+    wanted: Dict[int, List[str]] = {}
+    last_row = 0
+    for key in keys:
+        bounds = range_bounds(key)
+        grid = _empty_grid(bounds)
+        if grid is None:
+            continue
+        index.ranges[key] = grid
+        for row in range(bounds[1], bounds[3] + 1):
+            wanted.setdefault(row, []).append(key)
+        last_row = max(last_row, bounds[3])
+    for row_num, row_data in rows:
+        if row_num > last_row:
+            break
+        for key in wanted.get(row_num, ()):
+            _fill_row(index.ranges[key], range_bounds(key), row_num, row_data)
+
+
+def _name_value(index: NameIndex, name: str, sheet: Optional[str], case_values: Dict[str, Any]) -> Any:
+    upper = name.upper()
+    if upper in case_values:
+        return case_values[upper]
+    info = _lookup_name(index.names, name, sheet)
+    if info is None:
+        return None
+    if info.range is None:
+        return info.value
+    grid = index.ranges.get(info.range)
+    return grid[0][0] if grid is not None and len(grid) == 1 and len(grid[0]) == 1 else None
+
+
+def _position(value: Any) -> Optional[int]:
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value != int(value):
+        return None
+    return int(value)
+
+
+def _resolve_selector(index: NameIndex, ref: str, key: str, selector: CaseSelector,
+                      case_values: Dict[str, Any]) -> Dict[str, Any]:
+    sheet = range_bounds(key)[0]
+    position: List[Optional[int]] = []
+    for argument in (selector.row, selector.column):
+        if argument is None:
+            position.append(None)
+            continue
+        name, offset = argument
+        if name is None:
+            position.append(offset)
+            continue
+        value = _position(_name_value(index, name, sheet, case_values))
+        if value is None:
+            return {'ref': ref, 'error': f"{name} has no whole-number value; pass it in names"}
+        position.append(value + offset)
+
+    grid = index.ranges.get(selector.range)
+    if grid is None:
+        return {'ref': ref, 'range': selector.range, 'error': "Range is not indexed"}
+    height, width = len(grid), len(grid[0])
+    row, column = position
+    if column is None:
+        # INDEX(range, n) on a single row or column picks its n-th cell
+        if height == 1:
+            row, column = 1, row
+        elif width == 1:
+            column = 1
+        else:
+            return {'ref': ref, 'range': selector.range, 'error': "INDEX without a column needs a single row or column"}
+    if row == 0 and height == 1:
+        row = 1
+    if column == 0 and width == 1:
+        column = 1
+    if not (1 <= row <= height and 1 <= column <= width):
+        return {'ref': ref, 'range': selector.range, 'error': f"#REF! position ({row}, {column}) is outside the range"}
+    range_sheet, r1, c1, _, _ = range_bounds(selector.range)
+    return {
+        'ref': ref,
+        'value': grid[row - 1][column - 1],
+        'source': format_range(range_sheet, r1 + row - 1, c1 + column - 1),
+        'range': selector.range
+    }
+
+
+def _resolve(index: NameIndex, ref: str, case_values: Dict[str, Any]) -> Dict[str, Any]:
+    reference = parse_reference(ref)
+    if reference is not None and reference[0] is not None:
+        key = format_range(*reference)
+        selector = index.selectors.get(key)
+        if selector is not None:
+            return _resolve_selector(index, ref, key, selector, case_values)
+        grid = index.ranges.get(key)
+        if grid is not None:
+            return {'ref': ref, 'value': grid[0][0] if len(grid) == 1 and len(grid[0]) == 1 else grid, 'range': key}
+        return {'ref': ref, 'error': "Not a case selector, named cell or indexed range"}
+
+    sheet, _, name = ref.strip().lstrip('=').rpartition('!')
+    sheet = sheet.strip("'").replace("''", "'") or None
+    info = _lookup_name(index.names, name, sheet)
+    if info is None:
+        return {'ref': ref, 'error': "Unknown reference"}
+    value = _name_value(index, name, sheet, case_values)
+    if info.range is not None and name.upper() not in case_values:
+        grid = index.ranges.get(info.range)
+        if grid is None:
+            return {'ref': ref, 'name': info.name, 'range': info.range, 'error': "Range is not indexed"}
+        if value is None and not (len(grid) == 1 and len(grid[0]) == 1):
+            value = grid
+    return {'ref': ref, 'name': info.name, 'range': info.range, 'value': value}
+
+
+def resolve_references(index: NameIndex, refs: Sequence[str],
+                       case_values: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Resolve cell references ('Sheet!F61') and defined names, in order
+
+    A case selector resolves to the cell its INDEX picks, using
+    ``case_values`` (e.g. ``{"LiveCase": 2}``) before the workbook's own
+    selector values; a named cell or indexed range resolves to its values.
+    Failures are reported per reference in ``error``.
+    """
+    overrides = {name.upper(): value for name, value in (case_values or {}).items()}
+    return [_resolve(index, ref, overrides) for ref in refs]
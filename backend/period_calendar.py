@@ -0,0 +1,206 @@
+"""Memoized monthly period calendars for timeline generation.
+
+A calendar depends only on the project start date, the end of the
+extension period and the financial year end, so it is built once per
+combination and shared by every timeline request for the same dates.
+Period attributes are stored as NumPy arrays (dates as proleptic Gregorian
+ordinals) and handed out as read-only views, so callers can slice and
+broadcast them freely but never mutate the shared copy.
+"""
+
+import calendar as _calendar
+import os
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+SHORT_DATE_FORMAT = '%d-%b-%y'
+
+# Financial year end months understood by the calendar
+FY_END_MONTHS = {'March': 3, 'December': 12}
+
+CALENDAR_CACHE_SIZE = int(os.environ.get("PERIOD_CALENDAR_CACHE_SIZE", "64"))
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
+class PeriodCalendar:
+    """Array-backed monthly periods from the model start to the end of the extension period"""
+
+    def __init__(self, start_date: str, end_date: str, fy_end: str = 'March'):
+        if fy_end not in FY_END_MONTHS:
+            raise ValueError(f"Unsupported financial year end: {fy_end}")
+        start = datetime.strptime(start_date, '%Y-%m-%d').date()
+        end = datetime.strptime(end_date, '%Y-%m-%d').date()
+        self.start_date = start_date
+        self.end_date = end_date
+        self.fy_end = fy_end
+
+        # Candidate months; trimmed below once the period dates are known
+        month_span = max((end.year - start.year) * 12 + end.month - start.month + 1, 0)
+        month_index = np.arange(month_span, dtype=np.int64) + start.year * 12 + start.month - 1
+        years = month_index // 12
+        months = month_index % 12 + 1
+        days_in_month = np.fromiter(
+            (_calendar.monthrange(int(y), int(m))[1] for y, m in zip(years, months)),
+            dtype=np.int64, count=month_span
+        )
+        month_start = np.fromiter(
+            (date(int(y), int(m), 1).toordinal() for y, m in zip(years, months)),
+            dtype=np.int64, count=month_span
+        )
+
+        # Each period date is the previous one plus a calendar month, so the day
+        # of month is clamped by every shorter month passed on the way
+        period_day = np.minimum.accumulate(np.minimum(days_in_month, start.day))
+        period_date = month_start + period_day - 1
+        count = int(np.searchsorted(period_date, end.toordinal(), side='right'))
+
+        self._arrays: Dict[str, np.ndarray] = {
+            'index': np.arange(count, dtype=np.int64),
+            'period': np.arange(1, count + 1, dtype=np.int64),
+            'date': period_date[:count],
+            'month_start': month_start[:count],
+            'month_end': (month_start + days_in_month - 1)[:count],
+            'days_in_month': days_in_month[:count],
+            'financial_year': self._financial_years(years[:count], months[:count]),
+            'project_year': (period_date[:count] - start.toordinal()) // 365 + 1,
+            'quarter': (months[:count] - 1) // 3 + 1,
+            'year': years[:count],
+            'month': months[:count],
+        }
+        for array in self._arrays.values():
+            array.flags.writeable = False
+        self._labels: Dict[str, List[str]] = {}
+        self._group_starts: Dict[int, np.ndarray] = {}
+
+    def _financial_years(self, years: np.ndarray, months: np.ndarray) -> np.ndarray:
+        fy_end_month = FY_END_MONTHS[self.fy_end]
+        return years + (months > fy_end_month).astype(np.int64)
+
+    def __len__(self) -> int:
+        return len(self._arrays['index'])
+
+    def array(self, name: str) -> np.ndarray:
+        """Read-only view of one period attribute"""
+        return _read_only(self._arrays[name])
+
+    def labels(self, name: str) -> List[str]:
+        """'%d-%b-%y' strings for a date attribute, formatted once per calendar"""
+        labels = self._labels.get(name)
+        if labels is None:
+            labels = [date.fromordinal(int(ordinal)).strftime(SHORT_DATE_FORMAT)
+                      for ordinal in self._arrays[name]]
+            self._labels[name] = labels
+        return labels
+
+    def engine_arrays(self) -> Dict[str, np.ndarray]:
+        """Period arrays in the layout timeline_engine rules expect"""
+        arrays = {name: self.array(name) for name in
+                  ('index', 'period', 'days_in_month', 'financial_year', 'project_year', 'year')}
+        arrays['month_start'] = _read_only(np.array(self.labels('month_start'), dtype=object))
+        arrays['month_end'] = _read_only(np.array(self.labels('month_end'), dtype=object))
+        return arrays
+
+    def group_starts(self, months_per_period: int) -> np.ndarray:
+        """Index of the first month of each coarser period
+
+        Periods are aligned to the start of the financial year, so the first and
+        last periods may hold fewer months when the project starts or ends
+        part-way through one.
+        """
+        if months_per_period < 1:
+            raise ValueError("months_per_period must be at least 1")
+        starts = self._group_starts.get(months_per_period)
+        if starts is None:
+            fy_start_offset = FY_END_MONTHS[self.fy_end] % 12
+            months_since = self._arrays['year'] * 12 + self._arrays['month'] - 1 - fy_start_offset
+            group = months_since // months_per_period
+            starts = np.flatnonzero(np.diff(group, prepend=group[:1] - 1)) if len(group) else group
+            starts.flags.writeable = False
+            self._group_starts[months_per_period] = starts
+        return starts
+
+    def rollup_columns(self, months_per_period: int, start: int = 0, stop: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Period column dicts for a coarser frequency, optionally only periods[start:stop]"""
+        all_starts = self.group_starts(months_per_period)
+        all_ends = np.append(all_starts[1:], len(self)) - 1
+        starts = all_starts[start:stop]
+        if not len(starts):
+            return []
+        ends = all_ends[start:stop]
+        month_start = self.labels('month_start')
+        month_end = self.labels('month_end')
+        return [
+            {
+                'period': period,
+                'start_date': month_start[first],
+                'end_date': month_end[last],
+                'months': last - first + 1,
+                'days': days,
+                'financial_year': financial_year,
+                'year': year
+            }
+            for period, first, last, days, financial_year, year in zip(
+                range(start + 1, start + len(starts) + 1),
+                starts.tolist(),
+                ends.tolist(),
+                np.add.reduceat(self._arrays['days_in_month'][:ends[-1] + 1], starts).tolist(),
+                self._arrays['financial_year'][ends].tolist(),
+                self._arrays['year'][ends].tolist()
+            )
+        ]
+
+    def columns(self, start: int = 0, stop: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Period column dicts in the /generate-timelines response shape, optionally only periods[start:stop]"""
+        window = slice(start, stop)
+        return [
+            {
+                'period': period,
+                'date': period_date,
+                'month_start': month_start,
+                'month_end': month_end,
+                'days_in_month': days,
+                'financial_year': financial_year,
+                'project_year': project_year,
+                'quarter': quarter,
+                'year': year
+            }
+            for period, period_date, month_start, month_end, days, financial_year, project_year, quarter, year
+            in zip(
+                self._arrays['period'][window].tolist(),
+                self.labels('date')[window],
+                self.labels('month_start')[window],
+                self.labels('month_end')[window],
+                self._arrays['days_in_month'][window].tolist(),
+                self._arrays['financial_year'][window].tolist(),
+                self._arrays['project_year'][window].tolist(),
+                self._arrays['quarter'][window].tolist(),
+                self._arrays['year'][window].tolist()
+            )
+        ]
+
+
+@lru_cache(maxsize=CALENDAR_CACHE_SIZE)
+def _cached_calendar(start_date: str, end_date: str, fy_end: str) -> PeriodCalendar:
+    calendar = PeriodCalendar(start_date, end_date, fy_end)
+    # Format the labels up front so concurrent readers never race to fill them
+    for name in ('date', 'month_start', 'month_end'):
+        calendar.labels(name)
+    return calendar
+
+
+def get_period_calendar(start_date: str, end_date: str, fy_end: str = 'March') -> PeriodCalendar:
+    """Shared calendar for a (start, end, financial year end) combination"""
+    return _cached_calendar(start_date, end_date, fy_end)
+
+
+def period_calendar_cache_info() -> Dict[str, int]:
+    info = _cached_calendar.cache_info()
+    return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'max_size': info.maxsize}
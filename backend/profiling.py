@@ -0,0 +1,167 @@
+"""Opt-in cProfile capture of individual requests.
+
+When ``PROFILING_ENABLED`` is set, a request carrying ``X-Profile: 1`` (or
+``?profile=true``) on a profilable endpoint runs its work under cProfile.
+The stats are dumped in pstats format to ``PROFILE_DIR`` under a fresh
+profile id that is returned to the caller, and can be summarized or
+downloaded later from ``/profiles/{profile_id}``. ``PROFILE_TOKEN``, if set,
+must be sent in ``X-Profile-Token`` both to capture and to read profiles.
+
+Only one profile is captured at a time, since a profiler only sees the
+thread it runs in and the captures would otherwise distort each other.
+"""
+
+import cProfile
+import hmac
+import json
+import os
+import pstats
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+PROFILE_SORT_KEYS = {'cumulative': 3, 'tottime': 2, 'calls': 1}
+
+
+class ProfilingDisabled(Exception):
+    """Raised when a profile is requested but not allowed"""
+
+
+class ProfileStore:
+    """Runs callables under cProfile and keeps the most recent profiles on disk"""
+
+    def __init__(self, profile_dir: str, enabled: bool = False, token: Optional[str] = None,
+                 history_size: int = 20):
+        self.profile_dir = profile_dir
+        self.enabled = enabled
+        self.token = token
+        self.history_size = history_size
+        self._lock = threading.Lock()
+
+    def requested(self, headers, query_params) -> Optional[str]:
+        """A new profile id if this request asks to be profiled
+
+        Raises ProfilingDisabled when profiling was asked for but is switched
+        off or the token does not match.
+        """
+        flag = headers.get('x-profile') or query_params.get('profile')
+        if not flag or flag.lower() in ('0', 'false', 'no'):
+            return None
+        self.authorize(headers)
+        return uuid.uuid4().hex
+
+    def authorize(self, headers) -> None:
+        """Raise ProfilingDisabled unless profiling is on and the request carries the token, if one is set
+
+        Guards both capturing and reading profiles, which name customer
+        workbooks and expose code paths.
+        """
+        if not self.enabled:
+            raise ProfilingDisabled("Profiling is disabled; set PROFILING_ENABLED=1 to allow it")
+        if self.token and not hmac.compare_digest(headers.get('x-profile-token', ''), self.token):
+            raise ProfilingDisabled("Invalid profiling token")
+
+    def run(self, profile_id: str, label: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Call ``fn`` under cProfile in the current thread and store the profile"""
+        os.makedirs(self.profile_dir, exist_ok=True)
+        with self._lock:
+            profiler = cProfile.Profile()
+            created_at = datetime.now().isoformat()
+            started = time.perf_counter()
+            error = None
+            profiler.enable()
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                error = str(e)
+                raise
+            finally:
+                profiler.disable()
+                duration = time.perf_counter() - started
+                profiler.dump_stats(self._path(profile_id, 'prof'))
+                with open(self._path(profile_id, 'json'), 'w') as f:
+                    json.dump({
+                        'profileId': profile_id,
+                        'label': label,
+                        'createdAt': created_at,
+                        'durationSeconds': round(duration, 6),
+                        'status': 'failed' if error else 'completed',
+                        'error': error
+                    }, f)
+                print(f"🔬 Profiled {label} ({duration:.2f}s) as {profile_id}")
+                self._prune()
+
+    def _path(self, profile_id: str, extension: str) -> str:
+        return os.path.join(self.profile_dir, f"{profile_id}.{extension}")
+
+    def _prune(self) -> None:
+        entries = self._metadata_files()
+        for name in entries[:max(0, len(entries) - self.history_size)]:
+            profile_id = name[:-len('.json')]
+            for extension in ('json', 'prof'):
+                try:
+                    os.remove(self._path(profile_id, extension))
+                except OSError:
+                    pass
+
+    def _metadata_files(self) -> List[str]:
+        """Profile metadata file names, oldest first"""
+        try:
+            names = [name for name in os.listdir(self.profile_dir) if name.endswith('.json')]
+        except FileNotFoundError:
+            return []
+        return sorted(names, key=lambda name: os.path.getmtime(os.path.join(self.profile_dir, name)))
+
+    def list(self) -> List[Dict[str, Any]]:
+        profiles = []
+        for name in reversed(self._metadata_files()):
+            metadata = self.metadata(name[:-len('.json')])
+            if metadata is not None:
+                profiles.append(metadata)
+        return profiles
+
+    def metadata(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        # Ids are generated hex strings; anything else cannot name a profile
+        if not profile_id.isalnum():
+            return None
+        try:
+            with open(self._path(profile_id, 'json'), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def stats_path(self, profile_id: str) -> Optional[str]:
+        if self.metadata(profile_id) is None:
+            return None
+        path = self._path(profile_id, 'prof')
+        return path if os.path.exists(path) else None
+
+    def summary(self, profile_id: str, sort: str = 'cumulative', limit: int = 50,
+                match: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Metadata plus the top functions by ``sort``, optionally only names containing ``match``"""
+        path = self.stats_path(profile_id)
+        if path is None:
+            return None
+        if sort not in PROFILE_SORT_KEYS:
+            raise ValueError(f"sort must be one of {', '.join(PROFILE_SORT_KEYS)}")
+        stats = pstats.Stats(path).stats
+        column = PROFILE_SORT_KEYS[sort]
+        rows = sorted(stats.items(), key=lambda item: item[1][column], reverse=True)
+        functions = []
+        for (filename, line, function), (primitive_calls, calls, total_time, cumulative_time, _) in rows:
+            if match and match not in function and match not in filename:
+                continue
+            functions.append({
+                'function': function,
+                'file': filename,
+                'line': line,
+                'calls': calls,
+                'primitiveCalls': primitive_calls,
+                'totalTime': round(total_time, 6),
+                'cumulativeTime': round(cumulative_time, 6)
+            })
+            if len(functions) >= limit:
+                break
+        return {**self.metadata(profile_id), 'sort': sort, 'functions': functions}
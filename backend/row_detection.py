@@ -0,0 +1,226 @@
+"""Single-pass row classification for workbook analysis.
+
+Every streamed row is classified once as a section header, a heading, a
+field or nothing. Each distinct string is stripped, lower-cased and matched
+against the template's section keywords once; the keywords are compiled
+into one alternation regex, and the outcome is memoized per template, since
+models repeat the same labels on thousands of rows. Formula cells are
+skipped without any string work. The rules are unchanged from the original
+per-stage detectors:
+
+- section: the first string cell longer than 3 characters that is upper
+  case or contains a section keyword
+- heading (inside a section): otherwise the first string cell longer than
+  2 characters with at most five words
+- field (inside a section): otherwise the first formula or string cell
+  with a label up to three columns to its left (nearest first) or two to
+  its right; formula cells are never labels
+
+where candidate strings are never all digits and never start with ``=`` or
+``F``.
+
+Section keywords vary between families of models, so they come from
+detection templates: the built-in ``default`` template plus any defined in
+``DETECTION_TEMPLATES_PATH``, a JSON object mapping template names to
+``{"sectionKeywords": [...]}`` (replacing the defaults) and/or
+``{"addSectionKeywords": [...]}`` (extending them). Keywords match
+case-insensitively. The file's mtime is checked on access, so edits are
+picked up without a restart.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_TEMPLATE = 'default'
+
+DEFAULT_SECTION_KEYWORDS = (
+    'project', 'cost', 'debt', 'equity', 'revenue', 'tax', 'capacity',
+    'technical', 'operation', 'construction', 'financing', 'macroeconomic',
+    'assumption', 'input', 'output', 'calculation', 'timeline', 'sponsor',
+    'plant', 'tariff', 'sensitivity', 'structure', 'working', 'capital',
+    'performance', 'service', 'accounting', 'liquidated', 'damages'
+)
+
+SECTION = 'section'
+HEADING = 'heading'
+FIELD = 'field'
+
+# (kind, payload): the section or heading text, or (cell index, label) for a field
+RowClass = Tuple[str, Any]
+
+# Distinct strings remembered per template before the memo starts over
+MAX_MEMOIZED_STRINGS = 100_000
+
+_MISSING = object()
+
+
+def _value_label(value: Any) -> Optional[str]:
+    """Label text of a non-string neighbouring cell, if it looks like a field name"""
+    if not value:
+        return None
+    label = str(value).strip()
+    if len(label) > 2 and not label.isdigit() and label[0] != '=' and label[0] != 'F':
+        return label
+    return None
+
+
+class DetectionTemplate:
+    """Section keywords of one family of models, compiled for row classification"""
+
+    def __init__(self, name: str, section_keywords: Sequence[str]):
+        self.name = name
+        self.section_keywords = tuple(dict.fromkeys(keyword.lower() for keyword in section_keywords if keyword))
+        if self.section_keywords:
+            # Longest first so the alternation prefers full keywords; any match is enough
+            ordered = sorted(self.section_keywords, key=len, reverse=True)
+            self._keyword_search = re.compile('|'.join(re.escape(keyword) for keyword in ordered)).search
+        else:
+            self._keyword_search = None
+        # Cache keys only change for keyword sets that differ from the built-in one
+        if set(self.section_keywords) == set(DEFAULT_SECTION_KEYWORDS):
+            self.variant = ''
+        else:
+            digest = hashlib.sha256('\n'.join(sorted(self.section_keywords)).encode('utf-8'))
+            self.variant = digest.hexdigest()[:12]
+        # raw string -> None, or (stripped text, is section header, is heading)
+        self._strings: Dict[str, Optional[Tuple[str, bool, bool]]] = {}
+
+    def __getstate__(self):
+        # Sent to analysis worker processes; they build their own memo
+        return {**self.__dict__, '_strings': {}}
+
+    def describe(self) -> Dict[str, Any]:
+        return {'name': self.name, 'variant': self.variant or None, 'sectionKeywords': list(self.section_keywords)}
+
+    def _describe(self, value: str) -> Optional[Tuple[str, bool, bool]]:
+        """Classify a string cell once: None unless it can be a label, heading or section"""
+        text = value.strip()
+        if len(text) <= 2 or text.isdigit() or text[0] == '=' or text[0] == 'F':
+            described = None
+        else:
+            keyword_search = self._keyword_search
+            is_section = len(text) > 3 and (
+                text.isupper() or (keyword_search is not None and keyword_search(text.lower()) is not None)
+            )
+            described = (text, is_section, len(text.split()) <= 5)
+        if len(self._strings) >= MAX_MEMOIZED_STRINGS:
+            self._strings = {}
+        self._strings[value] = described
+        return described
+
+    def classify(self, row_data, in_section: bool = True) -> Optional[RowClass]:
+        """Classify one row of (column, value, formula) cells
+
+        Outside a section only section headers are detected.
+        """
+        strings = self._strings
+        heading = None
+        for _, value, formula in row_data:
+            if formula is not None or not isinstance(value, str) or value[:1] == '=':
+                continue
+            described = strings.get(value, _MISSING)
+            if described is _MISSING:
+                described = self._describe(value)
+            if described is None:
+                continue
+            if described[1]:
+                return SECTION, described[0]
+            if heading is None and described[2]:
+                heading = described[0]
+
+        if not in_section:
+            return None
+        if heading is not None:
+            return HEADING, heading
+
+        for index, (column, value, formula) in enumerate(row_data):
+            if formula or (isinstance(value, str) and len(value) > 2):
+                label = self._find_label(row_data, index, column)
+                if label:
+                    return FIELD, (index, label)
+        return None
+
+    def _label(self, value: Any) -> Optional[str]:
+        if not isinstance(value, str):
+            return _value_label(value)
+        if value[:1] == '=':
+            return None
+        described = self._strings.get(value, _MISSING)
+        if described is _MISSING:
+            described = self._describe(value)
+        return described[0] if described is not None else None
+
+    def _find_label(self, row_data, index: int, column: int) -> Optional[str]:
+        """Nearest label up to three columns to the left, then up to two to the right"""
+        for check in range(index - 1, -1, -1):
+            check_column, value, formula = row_data[check]
+            if column - check_column > 3:
+                break
+            if formula is not None:
+                continue
+            label = self._label(value)
+            if label:
+                return label
+        for check in range(index + 1, len(row_data)):
+            check_column, value, formula = row_data[check]
+            if check_column - column > 2:
+                break
+            if formula is not None:
+                continue
+            label = self._label(value)
+            if label:
+                return label
+        return None
+
+
+class DetectionTemplates:
+    """The built-in template plus those defined in a JSON file, reloaded when the file changes"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.default = DetectionTemplate(DEFAULT_TEMPLATE, DEFAULT_SECTION_KEYWORDS)
+        self._templates: Dict[str, DetectionTemplate] = {DEFAULT_TEMPLATE: self.default}
+        self._mtime: Optional[float] = None
+        self._lock = threading.Lock()
+        self.error: Optional[str] = None
+
+    def get(self, name: Optional[str] = None) -> DetectionTemplate:
+        """A template by name (the default when None); raises KeyError for unknown names"""
+        return self._current()[name or DEFAULT_TEMPLATE]
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [template.describe() for template in self._current().values()]
+
+    def _current(self) -> Dict[str, DetectionTemplate]:
+        if not self.path:
+            return self._templates
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+        with self._lock:
+            if mtime != self._mtime:
+                self._mtime = mtime
+                try:
+                    self._templates = self._load() if mtime is not None else {DEFAULT_TEMPLATE: self.default}
+                    self.error = None
+                except (OSError, ValueError, AttributeError, TypeError) as e:
+                    # Keep serving the last good templates until the file is fixed
+                    self.error = f"{type(e).__name__}: {e}"
+                    print(f"⚠️ Could not load detection templates from {self.path}: {self.error}")
+            return self._templates
+
+    def _load(self) -> Dict[str, DetectionTemplate]:
+        with open(self.path, 'r') as f:
+            definitions = json.load(f)
+        templates = {DEFAULT_TEMPLATE: self.default}
+        for name, definition in definitions.items():
+            keywords = list(definition.get('sectionKeywords', DEFAULT_SECTION_KEYWORDS))
+            keywords.extend(definition.get('addSectionKeywords', []))
+            templates[name] = DetectionTemplate(name, keywords)
+        print(f"🧩 Loaded {len(templates) - 1} detection templates from {self.path}")
+        return templates
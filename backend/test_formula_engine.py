@@ -0,0 +1,189 @@
+"""Tests for the formula engine: parsing, evaluation and incremental recalculation."""
+
+from datetime import date
+
+import pytest
+from openpyxl import Workbook
+from openpyxl.workbook.defined_name import DefinedName
+
+from formula_engine import (
+    MAX_COLUMN, MAX_ROW, FormulaError, FormulaModel, FormulaModelStore, FormulaSyntaxError,
+    parse_cell_key, parse_formula, tokenize
+)
+
+
+def build(cells, defined_names=None) -> FormulaModel:
+    """Model from {'Sheet!A1': value or '=formula'}, compiled and evaluated"""
+    model = FormulaModel(defined_names)
+    for ref, value in cells.items():
+        key = parse_cell_key(ref)
+        if isinstance(value, str) and value.startswith('='):
+            model.add_formula(key, value)
+        else:
+            model.add_constant(key, value)
+    model.compile()
+    model.evaluate_all()
+    return model
+
+
+def value(model: FormulaModel, ref: str):
+    return model.get(parse_cell_key(ref))
+
+
+# -- parsing -----------------------------------------------------------------
+
+def test_tokenize_refs_and_functions():
+    assert tokenize("SUM('My Sheet'!$A$1:B2)*2") == [
+        ('func', 'SUM'), ('lparen', '('), ('ref', "'My Sheet'!$A$1:B2"), ('rparen', ')'),
+        ('op', '*'), ('number', '2')
+    ]
+
+
+def test_parse_whole_column_and_row_ranges():
+    assert parse_formula('=SUM(A:A)', 'S') == ('call', 'SUM', [('range', 'S', 1, 1, MAX_ROW, 1)])
+    assert parse_formula('=SUM(Data!$C:$B)', 'S') == ('call', 'SUM', [('range', 'Data', 1, 2, MAX_ROW, 3)])
+    assert parse_formula('=SUM(3:2)', 'S') == ('call', 'SUM', [('range', 'S', 2, 1, 3, MAX_COLUMN)])
+
+
+def test_parse_errors():
+    with pytest.raises(FormulaSyntaxError):
+        parse_formula('=SUM(A1', 'S')
+    with pytest.raises(FormulaSyntaxError):
+        parse_formula('=A1:B', 'S')
+    with pytest.raises(FormulaSyntaxError):
+        parse_formula('=SUM(0:1)', 'S')
+
+
+# -- evaluation --------------------------------------------------------------
+
+def test_operator_precedence():
+    model = build({
+        'S!A1': '=-2^2', 'S!A2': '=2+3*4^2', 'S!A3': '=50%*10', 'S!A4': '="a"&1+1',
+        'S!A5': '=1+1=2', 'S!A6': '=10-4-3'
+    })
+    assert [value(model, f'S!A{row}') for row in range(1, 7)] == [4, 50, 5, 'a2', True, 3]
+
+
+def test_functions():
+    model = build({
+        'S!A1': 1, 'S!A2': 2, 'S!A3': 'x', 'S!A4': 4,
+        'S!B1': '=SUM(A1:A4)',
+        'S!B2': '=INDEX(A1:A4,MATCH(4,A1:A4,0))',
+        'S!B3': '=IF(A1>1,"big","small")',
+        'S!B4': '=IFERROR(1/0,-1)',
+        'S!B5': '=ROUND(2.5,0)+ROUNDDOWN(-1.55,1)',
+        'S!B6': '=YEAR(EOMONTH(DATE(2024,1,31),1))*100+DAY(EOMONTH(DATE(2024,1,31),1))',
+        'S!B7': '=SUMPRODUCT(A1:A2,A1:A2)',
+        'S!B8': '=NOSUCHFUNCTION(1)',
+    })
+    assert value(model, 'S!B1') == 7
+    assert value(model, 'S!B2') == 4
+    assert value(model, 'S!B3') == 'small'
+    assert value(model, 'S!B4') == -1
+    assert value(model, 'S!B5') == pytest.approx(1.5)
+    assert value(model, 'S!B6') == 202429
+    assert value(model, 'S!B7') == 5
+    assert value(model, 'S!B8') == FormulaError('#NAME?')
+
+
+def test_dates_are_serial_numbers():
+    model = build({'S!A1': date(2024, 1, 31), 'S!A2': '=EDATE(A1,1)', 'S!A3': '=MONTH(A2)*100+DAY(A2)'})
+    assert value(model, 'S!A1') == 45322
+    assert value(model, 'S!A3') == 229
+
+
+def test_defined_names_and_cross_sheet_refs():
+    model = build(
+        {'Inputs!B2': 0.1, 'Calc!A1': 100, 'Calc!A2': '=A1*(1+Rate)', 'Calc!A3': '=Inputs!B2*2'},
+        {'Rate': 'Inputs!$B$2'}
+    )
+    assert value(model, 'Calc!A2') == pytest.approx(110)
+    assert value(model, 'Calc!A3') == pytest.approx(0.2)
+
+
+def test_whole_column_and_row_ranges():
+    model = build({
+        'S!A1': 1, 'S!A2': 2, 'S!A5': 5, 'S!B1': 'x', 'S!B2': 'y', 'S!B5': 'z',
+        'T!A1': '=SUM(S!A:A)',
+        'T!A2': '=INDEX(S!A:A,MATCH("z",S!B:B,0))',
+        'T!A3': '=SUM(S!1:2)',
+        'T!A4': '=COUNT(S!$A:$B)',
+    })
+    assert value(model, 'T!A1') == 8
+    assert value(model, 'T!A2') == 5
+    assert value(model, 'T!A3') == 3
+    assert value(model, 'T!A4') == 3
+    assert model.describe(parse_cell_key('T!A1'))['precedents'] == ['S!A1', 'S!A2', 'S!A5']
+
+
+def test_circular_references():
+    model = build({'S!A1': '=A2+1', 'S!A2': '=A1+1', 'S!A3': '=5'})
+    assert value(model, 'S!A1') == FormulaError('#CIRC!')
+    assert value(model, 'S!A3') == 5
+    assert model.stats()['circularCells'] == 2
+
+
+def test_unparseable_formula_is_reported():
+    model = build({'S!A1': '=1+', 'S!A2': '=A1'})
+    assert value(model, 'S!A1') == FormulaError('#NAME?')
+    assert model.describe(parse_cell_key('S!A1'))['error']
+    assert model.stats()['parseErrors'] == 1
+
+
+# -- incremental recalculation -----------------------------------------------
+
+def test_set_inputs_recomputes_downstream_cells():
+    model = build({'S!A1': 1, 'S!A2': '=A1*2', 'S!A3': '=A2+1', 'S!B1': '=5'})
+    changed, recalculated = model.set_inputs({parse_cell_key('S!A1'): 3})
+    assert changed == {('S', 1, 1): 3, ('S', 2, 1): 6, ('S', 3, 1): 7}
+    assert recalculated == 2
+
+
+def test_set_inputs_counts_unchanged_recomputes():
+    model = build({'S!A1': 1, 'S!A2': '=MIN(A1,0)', 'S!A3': '=A2+1'})
+    changed, recalculated = model.set_inputs({parse_cell_key('S!A1'): 2})
+    assert changed == {('S', 1, 1): 2}
+    assert recalculated == 1
+
+    changed, recalculated = model.set_inputs({parse_cell_key('S!A1'): 2})
+    assert changed == {}
+    assert recalculated == 0
+
+
+def test_set_inputs_links_new_cells_into_ranges():
+    model = build({'S!A1': 1, 'S!B1': '=SUM(A1:A10)', 'S!C1': '=SUM(A:A)'})
+    changed, recalculated = model.set_inputs({parse_cell_key('S!A20'): 4, parse_cell_key('S!A3'): 2})
+    assert value(model, 'S!B1') == 3
+    assert value(model, 'S!C1') == 7
+    assert recalculated == 2
+
+
+def test_set_inputs_rejects_formula_cells():
+    model = build({'S!A1': '=1'})
+    with pytest.raises(ValueError):
+        model.set_inputs({parse_cell_key('S!A1'): 2})
+
+
+def test_from_workbook():
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = 'Inputs'
+    sheet['A1'] = 10
+    sheet['A2'] = '=A1*Growth'
+    sheet['B1'] = 1.5
+    workbook.defined_names['Growth'] = DefinedName('Growth', attr_text='Inputs!$B$1')
+    model = FormulaModel.from_workbook(workbook)
+    model.evaluate_all()
+    assert value(model, 'Inputs!A2') == 15
+
+
+def test_model_store_is_bounded_lru():
+    store = FormulaModelStore(max_models=2)
+    first, second, third = FormulaModel(), FormulaModel(), FormulaModel()
+    store.put(('p', '1'), first)
+    store.put(('p', '2'), second)
+    assert store.get(('p', '1')) is first
+    store.put(('p', '3'), third)
+    assert store.get(('p', '2')) is None
+    assert store.get(('p', '1')) is first
+    assert store.get(('p', '3')) is third
@@ -0,0 +1,168 @@
+"""Tests for case-selector parsing, range capture and reference resolution."""
+
+import pytest
+
+from name_index import (
+    CaseSelector, SheetNameScan, _parse_argument, capture_ranges, index_defined_names, merge_name_index,
+    parse_case_selector, resolve_references
+)
+
+CASES = {'K': 10, 'L': 20, 'M': 30, 'N': 40, 'O': 50, 'P': 60, 'Q': 70}
+COLUMNS = {letter: index for index, letter in enumerate('ABCDEFGHIJKLMNOPQ', 1)}
+
+
+def rows_of(cells):
+    """Sorted (row_num, [(column, value, formula)]) rows from {'F61': value or '=formula'}"""
+    rows = {}
+    for ref, value in cells.items():
+        row_num, column = int(ref[1:]), COLUMNS[ref[0]]
+        formula = value if isinstance(value, str) and value.startswith('=') else None
+        rows.setdefault(row_num, []).append((column, None if formula else value, formula))
+    return [(row_num, sorted(rows[row_num])) for row_num in sorted(rows)]
+
+
+def scan(sheet, cells, names):
+    """Stream a sheet past a SheetNameScan the way the parser does, treating formula cells as fields"""
+    names_scan = SheetNameScan(sheet, names)
+    for row_num, row_data in rows_of(cells):
+        names_scan.observe(row_num, row_data)
+        for cell_idx, (_, _, formula) in enumerate(row_data):
+            if formula is not None:
+                names_scan.field(row_num, row_data, cell_idx)
+    return names_scan.result()
+
+
+def build_index(cells, names):
+    """Index of a 'Calc' sheet holding ``cells``, with its pending ranges captured in a second pass"""
+    index, missing = merge_name_index(names, [scan('Calc', cells, names)])
+    for keys in missing.values():
+        capture_ranges(index, keys, rows_of(cells))
+    return index
+
+
+def case_row(row_num):
+    return {f'{letter}{row_num}': value + row_num for letter, value in CASES.items()}
+
+
+@pytest.fixture
+def names():
+    return index_defined_names([('LiveCase', None, 'Calc!$C$5')])
+
+
+# -- parsing -----------------------------------------------------------------
+
+@pytest.mark.parametrize('text, expected', [
+    ('', (None, 0)),
+    ('3', (None, 3)),
+    ('LiveCase', ('LiveCase', 0)),
+    ('LiveCase+1', ('LiveCase', 1)),
+    ('LiveCase - 2', ('LiveCase', -2)),
+    ('1 + Case.Num', ('Case.Num', 1)),
+    ('A1', None),
+    ('$C$5+1', None),
+    ('C5 - 1', None),
+    ('TRUE', None),
+    ('LiveCase*2', None),
+    ('2-LiveCase', None),
+])
+def test_parse_argument(text, expected):
+    assert _parse_argument(text) == expected
+
+
+def test_parse_case_selector(names):
+    assert parse_case_selector('=INDEX($K61:$Q61,0,LiveCase+1)', 'Calc', names) == CaseSelector(
+        range='Calc!K61:Q61', row=(None, 0), column=('LiveCase', 1)
+    )
+    assert parse_case_selector("= index(Inputs!K10:K12, LiveCase)", 'Calc', names) == CaseSelector(
+        range='Inputs!K10:K12', row=('LiveCase', 0)
+    )
+
+
+def test_parse_case_selector_resolves_named_ranges():
+    names = index_defined_names([('Cases', None, 'Calc!$K$61:$Q$61'), ('LiveCase', None, 'Calc!$C$5')])
+    assert parse_case_selector('=INDEX(Cases,1,LiveCase)', 'Calc', names) == CaseSelector(
+        range='Calc!K61:Q61', row=(None, 1), column=('LiveCase', 0)
+    )
+    assert parse_case_selector('=INDEX(NoSuchName,1,LiveCase)', 'Calc', names) is None
+
+
+@pytest.mark.parametrize('formula', [
+    '=INDEX($K61:$Q61,0,3)',  # no name positions it
+    '=INDEX($K61:$Q61,0,$C$5)',  # positioned by a cell
+    '=INDEX($K61:$Q61,LiveCase,C5)',
+    '=INDEX($K61:$Q61,0,LiveCase+1)*2',  # not a whole-formula INDEX
+    '=INDEX($K61:$Q61,MATCH(1,K60:Q60,0))',
+])
+def test_non_selectors_are_ignored(names, formula):
+    assert parse_case_selector(formula, 'Calc', names) is None
+
+
+# -- range capture -----------------------------------------------------------
+
+def test_ranges_on_and_below_the_field_are_captured_in_the_scan(names):
+    cells = {'C5': 2, 'F61': '=INDEX($K61:$Q61,0,LiveCase+1)', 'F62': '=INDEX($K70:$Q70,0,LiveCase)',
+             **case_row(61), **case_row(70)}
+    result = scan('Calc', cells, names)
+    assert result.pending == []
+    assert result.ranges['Calc!C5'] == [[2]]
+    assert result.ranges['Calc!K61:Q61'] == [[71, 81, 91, 101, 111, 121, 131]]
+    assert result.ranges['Calc!K70:Q70'] == [[80, 90, 100, 110, 120, 130, 140]]
+
+
+def test_ranges_above_the_field_or_on_other_sheets_are_pending(names):
+    cells = {'C5': 2, **case_row(10), 'F61': '=INDEX($K10:$Q10,0,LiveCase)', 'F62': '=INDEX(Inputs!K1:Q1,0,LiveCase)'}
+    result = scan('Calc', cells, names)
+    assert result.pending == ['Calc!K10:Q10', 'Inputs!K1:Q1']
+    assert 'Calc!K10:Q10' not in result.ranges
+
+    index, missing = merge_name_index(names, [result])
+    assert missing == {'Calc': ['Calc!K10:Q10'], 'Inputs': ['Inputs!K1:Q1']}
+    capture_ranges(index, missing['Calc'], rows_of(cells))
+    capture_ranges(index, missing['Inputs'], rows_of(case_row(1)))
+    assert index.ranges['Calc!K10:Q10'] == [[20, 30, 40, 50, 60, 70, 80]]
+    assert resolve_references(index, ['Calc!F62'])[0]['value'] == 21
+
+
+# -- resolution --------------------------------------------------------------
+
+def test_selector_resolves_with_and_without_case_values(names):
+    index = build_index({'C5': 2, 'F61': '=INDEX($K61:$Q61,0,LiveCase+1)', **case_row(61)}, names)
+    assert resolve_references(index, ['Calc!F61']) == [
+        {'ref': 'Calc!F61', 'value': 91, 'source': 'Calc!M61', 'range': 'Calc!K61:Q61'}
+    ]
+    overridden = resolve_references(index, ['Calc!F61', 'Calc!$F$61', 'LiveCase'], {'livecase': 0})
+    assert [result['value'] for result in overridden] == [71, 71, 0]
+    assert overridden[0]['source'] == 'Calc!K61'
+
+
+def test_single_row_and_single_column_ranges(names):
+    cells = {'C5': 2, 'F61': '=INDEX($K61:$Q61,LiveCase)', 'F62': '=INDEX($K70:$K72,LiveCase)',
+             'F63': '=INDEX($K70:$K72,LiveCase+1,0)', 'F64': '=INDEX($K70:$L72,LiveCase)',
+             **case_row(61), 'K70': 'a', 'K71': 'b', 'K72': 'c'}
+    index = build_index(cells, names)
+    results = resolve_references(index, ['Calc!F61', 'Calc!F62', 'Calc!F63', 'Calc!F64'])
+    assert [(result.get('value'), result.get('source')) for result in results[:3]] == [
+        (81, 'Calc!L61'), ('b', 'Calc!K71'), ('c', 'Calc!K72')
+    ]
+    assert results[3]['error'] == "INDEX without a column needs a single row or column"
+
+
+def test_sheet_local_name_shadows_workbook_name():
+    names = index_defined_names([('LiveCase', None, 'Calc!$C$5'), ('LiveCase', 'Calc', 'Calc!$C$6')])
+    index = build_index({'C5': 2, 'C6': 4, 'F61': '=INDEX($K61:$Q61,0,LiveCase+1)', **case_row(61)}, names)
+    assert resolve_references(index, ['Calc!F61'])[0]['source'] == 'Calc!O61'
+    assert resolve_references(index, ['LiveCase', 'Calc!LiveCase']) == [
+        {'ref': 'LiveCase', 'name': 'LiveCase', 'range': 'Calc!C5', 'value': 2},
+        {'ref': 'Calc!LiveCase', 'name': 'LiveCase', 'range': 'Calc!C6', 'value': 4},
+    ]
+
+
+def test_out_of_range_position_is_a_ref_error(names):
+    index = build_index({'C5': 2, 'F61': '=INDEX($K61:$Q61,0,LiveCase+1)', **case_row(61)}, names)
+    assert resolve_references(index, ['Calc!F61'], {'LiveCase': 7}) == [
+        {'ref': 'Calc!F61', 'range': 'Calc!K61:Q61', 'error': "#REF! position (1, 8) is outside the range"}
+    ]
+    assert 'error' not in resolve_references(index, ['Calc!F61'], {'LiveCase': 6})[0]
+    assert resolve_references(index, ['Calc!F61'], {'LiveCase': 'high'})[0]['error'] == (
+        "LiveCase has no whole-number value; pass it in names"
+    )
@@ -0,0 +1,197 @@
+"""Tests that single-pass row classification matches the original per-keyword detectors."""
+
+import itertools
+import random
+
+import pytest
+
+from row_detection import (
+    DEFAULT_SECTION_KEYWORDS, FIELD, HEADING, SECTION, DetectionTemplate, DetectionTemplates
+)
+
+PERIOD_KEYWORDS = ('period', 'ppa period')
+
+
+# -- the detectors classify replaced, kept as the reference ----------------------
+
+def detect_section_header(row_data, keywords):
+    for _, cell_value, _ in row_data:
+        if cell_value and isinstance(cell_value, str):
+            value = cell_value.strip()
+            if (len(value) > 3 and
+                not value.isdigit() and
+                not value.startswith('=') and
+                not value.startswith('F') and
+                (value.isupper() or any(keyword in value.lower() for keyword in keywords))):
+                return value
+    return None
+
+
+def detect_heading(row_data):
+    for _, cell_value, _ in row_data:
+        if cell_value and isinstance(cell_value, str):
+            value = cell_value.strip()
+            if (len(value) > 2 and
+                not value.isdigit() and
+                not value.startswith('=') and
+                not value.startswith('F') and
+                len(value.split()) <= 5):
+                return value
+    return None
+
+
+def is_field_label(value):
+    if not value:
+        return None
+    label = str(value).strip()
+    if (len(label) > 2 and
+        not label.isdigit() and
+        not label.startswith('=') and
+        not label.startswith('F')):
+        return label
+    return None
+
+
+def find_field_name(row_data, cell_idx):
+    column = row_data[cell_idx][0]
+    for check_idx in range(cell_idx - 1, -1, -1):
+        check_column, value, _ = row_data[check_idx]
+        if column - check_column > 3:
+            break
+        label = is_field_label(value)
+        if label:
+            return label
+    for check_idx in range(cell_idx + 1, len(row_data)):
+        check_column, value, _ = row_data[check_idx]
+        if check_column - column > 2:
+            break
+        label = is_field_label(value)
+        if label:
+            return label
+    return None
+
+
+def reference_classify(row_data, keywords, in_section):
+    section = detect_section_header(row_data, keywords)
+    if section:
+        return SECTION, section
+    if not in_section:
+        return None
+    heading = detect_heading(row_data)
+    if heading:
+        return HEADING, heading
+    for cell_idx, (_, value, formula) in enumerate(row_data):
+        if formula or (isinstance(value, str) and len(value) > 2):
+            field_name = find_field_name(row_data, cell_idx)
+            if field_name:
+                return FIELD, (cell_idx, field_name)
+    return None
+
+
+# -- fixed rows ----------------------------------------------------------------
+
+def formula(column, text):
+    # Rows as openpyxl streams them: a formula cell's value is its formula text
+    return column, text, text
+
+
+ROWS = [
+    # Sections: upper case, a keyword, surrounding whitespace, the first qualifying cell wins
+    [(2, 'OPERATIONS'), (5, 12)],
+    [(1, 'x'), (2, '  Project Costs  '), (3, 'DEBT')],
+    [(2, 'Macroeconomic inputs')],
+    [(2, 'TAX')],  # too short for a section, still a heading
+    [(2, 'Fixed Costs')],  # F-prefixed text is never a candidate
+    [(2, '2024'), (3, 'Working capital')],
+    [formula(2, '=PROJECT_COST*2'), (4, 'Rate')],
+    # PPA period precedence: both keywords match, the longer one must not shadow the shorter
+    [(2, 'PPA Period Assumptions')],
+    [(2, 'Operating period')],
+    [(2, 'ppa period'), (3, 'Period')],
+    [(2, 'Term of the ppa')],
+    # Headings: short phrases, five words at most
+    [(2, 'Rate details'), (3, 'Other text')],
+    [(2, 'one two three four five six words'), (3, 'Short one')],
+    [(2, 'abc')],
+    [(2, 'ab'), (4, 'x' * 3)],
+    # Fields: labels up to 3 columns left, nearest first
+    [(2, 'label three columns to the left'), formula(5, '=A1')],
+    [(1, 'label four columns to the left ok'), formula(5, '=A1')],
+    [(2, 'Label one two three four five'), (5, 100)],
+    [(1, 'far left label text here ok'), (5, 'value value value value value value')],
+    [(2, 'first label made of six words'), (4, 'nearest label made of six words'), formula(5, '=A1')],
+    [(1, 'left label with six words total'), formula(3, '=B2'), (4, 'right label with six words here')],
+    # ... and up to 2 right when nothing qualifies on the left
+    [formula(3, '=SUM(A1:A4)'), (5, 'right label with six words here')],
+    [formula(3, '=SUM(A1:A4)'), (6, 'too far right with six words here')],
+    [formula(3, '=A1'), (4, 'F label never counts here ok'), (5, 45000.5)],
+    [formula(3, '=A1'), (4, 12), (5, 'label after a digit only cell')],
+    [formula(3, '=A1'), formula(4, '=B1'), (5, 'label after another formula cell here')],
+    [(1, '2024'), formula(2, '=A1'), (3, True)],
+    [(1, 'Fee'), formula(2, '=A1')],
+    [(1, 'No'), formula(2, '=A1')],
+    # Nothing
+    [(2, 12), (3, 4.5)],
+    [formula(2, '=A1'), formula(3, '=B1')],
+    [(2, '   '), (3, '12345')],
+    [],
+]
+
+
+def as_row(cells):
+    return [cell if len(cell) == 3 else (cell[0], cell[1], None) for cell in cells]
+
+
+@pytest.mark.parametrize('keywords', [DEFAULT_SECTION_KEYWORDS, PERIOD_KEYWORDS], ids=['default', 'period'])
+@pytest.mark.parametrize('in_section', [True, False], ids=['in-section', 'outside'])
+def test_fixed_rows_match_reference(keywords, in_section):
+    template = DetectionTemplate('test', keywords)
+    for cells in ROWS:
+        row_data = as_row(cells)
+        # Twice, so the memoized descriptions are exercised as well
+        for _ in range(2):
+            assert template.classify(row_data, in_section) == reference_classify(row_data, keywords, in_section), cells
+
+
+def test_expected_classes():
+    template = DetectionTemplates().default
+    assert template.classify(as_row([(2, '  Project Costs  ')])) == (SECTION, 'Project Costs')
+    assert template.classify(as_row([(2, 'Plant details')]), in_section=False) == (SECTION, 'Plant details')
+    assert template.classify(as_row([(2, 'Rate of return')]), in_section=False) is None
+    assert template.classify(as_row([(2, 'Rate of return')])) == (HEADING, 'Rate of return')
+    assert template.classify(as_row([(1, 'left label with six words total'), formula(3, '=B2')])) == (
+        FIELD, (1, 'left label with six words total')
+    )
+
+    period = DetectionTemplate('period', PERIOD_KEYWORDS)
+    assert period.classify(as_row([(2, 'PPA Period Assumptions')]), in_section=False) == (
+        SECTION, 'PPA Period Assumptions'
+    )
+    assert period.classify(as_row([(2, 'Operating period')]), in_section=False) == (SECTION, 'Operating period')
+    assert period.classify(as_row([(2, 'Term of the ppa')]), in_section=False) is None
+
+
+# -- generated rows --------------------------------------------------------------
+
+STRINGS = [
+    'Revenue', 'REVENUE', 'Capex', 'Fuel', 'PPA period', 'period length', '  padded label  ', 'ab', 'abc',
+    '123', '=text', 'a longer label of seven words here', 'Opex per unit', '', ' ', 'Outputs', 'Tariff rate'
+]
+VALUES = [0, 1, 2024, 45.5, True, False] + STRINGS
+
+
+def test_generated_rows_match_reference():
+    generator = random.Random(23)
+    templates = [(DetectionTemplate('test', keywords), keywords)
+                 for keywords in (DEFAULT_SECTION_KEYWORDS, PERIOD_KEYWORDS, ())]
+    for _ in range(3000):
+        columns = sorted(generator.sample(range(1, 12), generator.randint(1, 6)))
+        row_data = []
+        for column in columns:
+            if generator.random() < 0.25:
+                row_data.append(formula(column, generator.choice(['=A1', '=SUM(B1:B9)', '=INDEX(C1:C3,1)'])))
+            else:
+                row_data.append((column, generator.choice(VALUES), None))
+        for (template, keywords), in_section in itertools.product(templates, (True, False)):
+            expected = reference_classify(row_data, keywords, in_section)
+            assert template.classify(row_data, in_section) == expected, row_data
@@ -0,0 +1,135 @@
+"""Tests for the streaming .xlsx reader: values and formulas must match openpyxl."""
+
+import zipfile
+from datetime import datetime
+
+import pytest
+from openpyxl import Workbook, load_workbook
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900
+
+from xlsx_reader import XlsxWorkbook
+
+MAIN = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+SHARED_STRINGS_TYPE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings'
+SHARED_STRINGS_CONTENT = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml'
+
+# openpyxl writes strings inline and formulas without cached values, so the
+# sheet part is replaced with one that has shared strings (plain and rich text),
+# cached formula results, a shared formula and out-of-order cells. Style 1 is
+# the date format openpyxl registered for the datetime written to B1.
+SHARED_STRINGS = (
+    f'<sst xmlns="{MAIN}" count="2" uniqueCount="2">'
+    '<si><t>Plain</t></si>'
+    '<si><r><t xml:space="preserve">Rich </t></r><r><rPr><b val="1"/></rPr><t>text</t></r></si>'
+    '</sst>'
+)
+SHEET_DATA = (
+    '<row r="1">'
+    '<c r="A1" t="s"><v>0</v></c>'
+    '<c r="B1" s="1"><v>45322</v></c>'
+    '<c r="C1" t="b"><v>1</v></c>'
+    '<c r="D1"><f>B2*2</f><v>3</v></c>'
+    '<c r="E1" t="str"><f>A1&amp;"!"</f><v>Plain!</v></c>'
+    '<c r="F1" t="e"><v>#N/A</v></c>'
+    '</row>'
+    '<row r="2">'
+    '<c r="A2" t="s"><v>1</v></c>'
+    '<c r="B2"><v>1.5</v></c>'
+    '<c r="D2"><f t="shared" ref="D2:D4" si="0">B2+$C$1</f><v>2.5</v></c>'
+    '<c r="E2" t="inlineStr"><is><t>inline</t></is></c>'
+    '<c r="F2" s="1"/>'
+    '</row>'
+    '<row r="3">'
+    '<c r="E3"><v>3</v></c>'
+    '<c r="B3"><v>2</v></c>'
+    '<c r="D3"><f t="shared" si="0"/><v>3</v></c>'
+    '</row>'
+    '<row r="4">'
+    '<c r="D4"><f t="shared" si="0"/><v>1</v></c>'
+    '<c r="B4" s="1"><v>1.25</v></c>'
+    '</row>'
+)
+
+
+@pytest.fixture(params=[CALENDAR_WINDOWS_1900, CALENDAR_MAC_1904], ids=['1900', '1904'])
+def workbook_path(request, tmp_path):
+    base = tmp_path / 'base.xlsx'
+    workbook = Workbook()
+    workbook.epoch = request.param
+    sheet = workbook.active
+    sheet.title = 'Data'
+    sheet['B1'] = datetime(2024, 1, 31)
+    workbook.save(base)
+
+    path = tmp_path / 'reader.xlsx'
+    with zipfile.ZipFile(base) as source, zipfile.ZipFile(path, 'w') as target:
+        for item in source.infolist():
+            data = source.read(item.filename).decode('utf-8')
+            if item.filename == 'xl/worksheets/sheet1.xml':
+                start = data.index('<sheetData>')
+                end = data.index('</sheetData>') + len('</sheetData>')
+                data = f'{data[:start]}<sheetData>{SHEET_DATA}</sheetData>{data[end:]}'
+            elif item.filename == 'xl/_rels/workbook.xml.rels':
+                data = data.replace('</Relationships>', f'<Relationship Id="rIdSST" Type="{SHARED_STRINGS_TYPE}" '
+                                                        'Target="sharedStrings.xml"/></Relationships>')
+            elif item.filename == '[Content_Types].xml':
+                data = data.replace('</Types>', '<Override PartName="/xl/sharedStrings.xml" '
+                                                f'ContentType="{SHARED_STRINGS_CONTENT}"/></Types>')
+            target.writestr(item, data)
+        target.writestr('xl/sharedStrings.xml', SHARED_STRINGS)
+    return str(path)
+
+
+def reader_cells(path):
+    with XlsxWorkbook(path) as workbook:
+        return {(row, column): (formula, value)
+                for row, cells in workbook['Data'].iter_rows() for column, formula, value, _ in cells}
+
+
+def openpyxl_cells(path, data_only):
+    workbook = load_workbook(path, data_only=data_only)
+    try:
+        return {(cell.row, cell.column): cell.value
+                for row in workbook['Data'].iter_rows() for cell in row if cell.value is not None}
+    finally:
+        workbook.close()
+
+
+def test_values_match_openpyxl_cached_values(workbook_path):
+    cells = reader_cells(workbook_path)
+    assert {key: value for key, (_, value) in cells.items()} == openpyxl_cells(workbook_path, data_only=True)
+
+
+def test_formulas_match_openpyxl(workbook_path):
+    cells = reader_cells(workbook_path)
+    expected = openpyxl_cells(workbook_path, data_only=False)
+    assert {key: formula or value for key, (formula, value) in cells.items()} == expected
+    assert cells[(3, 4)][0] == '=B3+$C$1'
+    assert cells[(4, 4)][0] == '=B4+$C$1'
+
+
+def test_decoded_values(workbook_path):
+    cells = reader_cells(workbook_path)
+    assert cells[(1, 1)] == (None, 'Plain')
+    assert cells[(2, 1)] == (None, 'Rich text')
+    assert cells[(2, 5)] == (None, 'inline')
+    assert cells[(1, 3)] == (None, True)
+    assert cells[(1, 6)] == (None, '#N/A')
+    assert cells[(1, 4)] == ('=B2*2', 3)
+    assert isinstance(cells[(1, 2)][1], datetime)
+    # Formatted blanks are skipped
+    assert (2, 6) not in cells
+
+
+def test_epochs_shift_dates(workbook_path):
+    with XlsxWorkbook(workbook_path) as workbook:
+        epoch = workbook.epoch
+    expected = datetime(2024, 1, 31) if epoch == CALENDAR_WINDOWS_1900 else datetime(2028, 2, 1)
+    assert reader_cells(workbook_path)[(1, 2)][1] == expected
+
+
+def test_out_of_order_cells_come_back_in_column_order(workbook_path):
+    with XlsxWorkbook(workbook_path) as workbook:
+        rows = dict(workbook['Data'].iter_rows())
+    assert [cell[0] for cell in rows[3]] == [2, 4, 5]
+    assert [cell[0] for cell in rows[4]] == [2, 4]
@@ -0,0 +1,174 @@
+"""Columnar binary encoding for /generate-timelines responses.
+
+The JSON timeline repeats every period attribute name once per period and
+sends dates as '%d-%b-%y' strings. This encoding instead sends one typed
+array per column and per row:
+
+    b"TLC1" | uint32 header length | JSON header | padding | buffers
+
+All integers are little-endian. Every buffer starts on an 8-byte boundary
+so clients can wrap it in a TypedArray without copying. The header mirrors
+the JSON response shape, but every ``values`` list and period attribute is
+replaced by a descriptor ``{"offset", "length", "dtype"}`` whose offset
+is relative to the first byte after the header:
+
+- ``int8`` / ``int16`` / ``int32`` / ``float64``: numeric arrays, using the
+  narrowest integer width that holds the row
+- ``date32``: int32 day offsets from 1970-01-01, taken from the period
+  calendar's ordinals rather than re-parsed from the two-digit-year labels
+
+Identical buffers (e.g. several rows sharing the same flag pattern) are
+written once and referenced by every descriptor that needs them.
+
+Rows that cannot be typed (mixed or free text values) keep their values
+inline in the header as ``{"dtype": "json", "values": [...]}``.
+"""
+
+import json
+import struct
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from period_calendar import PeriodCalendar
+
+COLUMNAR_MEDIA_TYPE = "application/vnd.timeline.columnar"
+COLUMNAR_MAGIC = b"TLC1"
+COLUMNAR_VERSION = 1
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Narrowest-first integer encodings
+INTEGER_DTYPES = (
+    ('int8', '<i1', -2 ** 7, 2 ** 7 - 1),
+    ('int16', '<i2', -2 ** 15, 2 ** 15 - 1),
+    ('int32', '<i4', -2 ** 31, 2 ** 31 - 1),
+)
+
+
+def wants_columnar(accept: Optional[str]) -> bool:
+    """True when the client's Accept header asks for the columnar encoding"""
+    return bool(accept) and COLUMNAR_MEDIA_TYPE in accept
+
+
+class _CalendarDates:
+    """Day offsets of a period calendar's date labels, taken from its ordinals
+
+    Labels carry a two-digit year, so in calendars spanning a century or more
+    one label can stand for several dates. Timeline dates never decrease
+    along a row or column, so each such label resolves to the earliest of its
+    dates not before the previous value.
+    """
+
+    def __init__(self, calendar: PeriodCalendar):
+        candidates: Dict[str, set] = {}
+        for name in ('date', 'month_start', 'month_end'):
+            for label, ordinal in zip(calendar.labels(name), calendar.array(name).tolist()):
+                candidates.setdefault(label, set()).add(ordinal - EPOCH_ORDINAL)
+        self._days = {label: sorted(days) for label, days in candidates.items()}
+
+    def __call__(self, values: List[str]) -> Optional[List[int]]:
+        """Day offsets of a list of labels, None unless every label is a calendar date"""
+        lookup = self._days
+        result = []
+        previous = None
+        for value in values:
+            days = lookup.get(value)
+            if days is None:
+                return None
+            chosen = days[0]
+            if len(days) > 1 and previous is not None:
+                chosen = next((day for day in days if day >= previous), days[-1])
+            result.append(chosen)
+            previous = chosen
+        return result
+
+
+class _BufferWriter:
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.offset = 0
+        self._offsets: Dict[bytes, int] = {}
+
+    def add(self, array: np.ndarray, dtype: str) -> Dict[str, Any]:
+        data = array.tobytes()
+        descriptor = {'offset': self.offset, 'length': int(array.size), 'dtype': dtype}
+
+        # Reuse an identical buffer written earlier
+        existing = self._offsets.get(data)
+        if existing is not None:
+            descriptor['offset'] = existing
+            return descriptor
+        self._offsets[data] = self.offset
+
+        self.chunks.append(data)
+        self.offset += len(data)
+        padding = -self.offset % 8
+        if padding:
+            self.chunks.append(b'\0' * padding)
+            self.offset += padding
+        return descriptor
+
+
+def _encode_values(values: List[Any], writer: _BufferWriter, calendar_dates: _CalendarDates) -> Dict[str, Any]:
+    if values and all(type(v) is int for v in values):
+        array = np.array(values, dtype=np.int64)
+        low, high = array.min(), array.max()
+        for name, dtype, minimum, maximum in INTEGER_DTYPES:
+            if low >= minimum and high <= maximum:
+                return writer.add(array.astype(dtype), name)
+        return writer.add(array.astype('<f8'), 'float64')
+    if values and all(type(v) in (int, float) for v in values):
+        return writer.add(np.array(values, dtype='<f8'), 'float64')
+    if values and all(isinstance(v, str) for v in values):
+        days = calendar_dates(values)
+        if days is not None:
+            return writer.add(np.array(days, dtype='<i4'), 'date32')
+    return {'dtype': 'json', 'values': values}
+
+
+def _encode_timeline(timeline: Dict[str, Any], writer: _BufferWriter,
+                     calendar_dates: _CalendarDates) -> Dict[str, Any]:
+    encoded = {key: value for key, value in timeline.items() if key not in ('columns', 'rows')}
+
+    periods = timeline.get('columns') or []
+    columns = {}
+    if periods:
+        for name in periods[0].keys():
+            values = [period.get(name) for period in periods]
+            columns[name] = _encode_values(values, writer, calendar_dates)
+    encoded['columns'] = columns
+
+    rows = []
+    for row in timeline.get('rows') or []:
+        encoded_row = {key: value for key, value in row.items() if key != 'values'}
+        encoded_row['values'] = _encode_values(row.get('values') or [], writer, calendar_dates)
+        rows.append(encoded_row)
+    encoded['rows'] = rows
+    return encoded
+
+
+def encode_timeline_response(response: Dict[str, Any], calendar: PeriodCalendar) -> bytes:
+    """Encode a TimelineResponse dict, generated from ``calendar``, into the columnar binary layout"""
+    calendar_dates = _CalendarDates(calendar)
+    writer = _BufferWriter()
+
+    header: Dict[str, Any] = {'version': COLUMNAR_VERSION}
+    for key, value in response.items():
+        if isinstance(value, dict) and 'rows' in value and 'columns' in value:
+            header[key] = _encode_timeline(value, writer, calendar_dates)
+        else:
+            header[key] = value
+
+    header_bytes = json.dumps(header, separators=(',', ':'), default=str).encode('utf-8')
+    # Pad the header so the buffer section starts 8-byte aligned
+    prefix_length = len(COLUMNAR_MAGIC) + 4 + len(header_bytes)
+    header_bytes += b' ' * (-prefix_length % 8)
+
+    return b''.join([
+        COLUMNAR_MAGIC,
+        struct.pack('<I', len(header_bytes)),
+        header_bytes,
+        *writer.chunks
+    ])
@@ -0,0 +1,299 @@
+"""Vectorized timeline engine.
+
+Each extracted timeline field is classified once into a rule kind, and its
+whole value row is then produced by a single NumPy expression over the
+period index instead of re-running substring checks for every period.
+
+Rule parameters that vary per scenario (construction months, PPA months)
+may be scalars or column vectors of shape ``(cases, 1)``; the expressions
+broadcast them against the ``(periods,)`` index so several cases can be
+evaluated as one stacked array.
+"""
+
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+# Rule kinds, in the precedence order of the original per-period if/elif chain
+PERIOD = 'period'
+MONTH_START = 'month_start'
+MONTH_END = 'month_end'
+DAYS_IN_MONTH = 'days_in_month'
+FINANCIAL_YEAR = 'financial_year'
+PROJECT_YEAR = 'project_year'
+CALENDAR_YEAR = 'calendar_year'
+CONSTRUCTION_START_FLAG = 'construction_start_flag'
+CONSTRUCTION_END_FLAG = 'construction_end_flag'
+CONSTRUCTION_PERIOD_FLAG = 'construction_period_flag'
+CONSTRUCTION_MONTH_COUNTER = 'construction_month_counter'
+COMMERCIAL_OPERATION_FLAG = 'commercial_operation_flag'
+OPERATION_PERIOD_FLAG = 'operation_period_flag'
+OPERATION_MONTH_COUNTER = 'operation_month_counter'
+PPA_PERIOD_FLAG = 'ppa_period_flag'
+PPA_MONTH_COUNTER = 'ppa_month_counter'
+DEBT_SERVICE_FLAG = 'debt_service_flag'
+TAX_FLAG = 'tax_flag'
+DIVIDEND_FLAG = 'dividend_flag'
+REPORTING_PERIOD = 'reporting_period'
+EDATE_MONTH_END = 'edate_month_end'
+ALTERNATING_FLAG = 'alternating_flag'
+INPUT_DEFAULT = 'input_default'
+CALCULATED_DEFAULT = 'calculated_default'
+
+# Kinds whose rows are '%d-%b-%y' date strings rather than integers
+DATE_KINDS = frozenset({MONTH_START, MONTH_END, EDATE_MONTH_END})
+
+# Months after COD before tax and dividend flags switch on
+TAX_START_OFFSET = 12
+DIVIDEND_START_OFFSET = 6
+
+
+def classify_field(field: Dict[str, Any]) -> str:
+    """Resolve the rule kind for a timeline field from its name, formula and type"""
+    field_name = (field.get('field_name') or '').lower()
+    excel_formula = field.get('excel_formula') or ''
+
+    # NB: 'period' matches first, so names such as 'ppa period' or
+    # 'reporting period' resolve to PERIOD exactly as the per-period chain did
+    if field_name == 'monthly period' or 'period' in field_name:
+        return PERIOD
+    if 'month start' in field_name:
+        return MONTH_START
+    if 'month end' in field_name:
+        return MONTH_END
+    if 'days in month' in field_name:
+        return DAYS_IN_MONTH
+    if 'financial year' in field_name:
+        return FINANCIAL_YEAR
+    if 'project year' in field_name:
+        return PROJECT_YEAR
+    if 'calendar' in field_name or 'calender' in field_name:
+        return CALENDAR_YEAR
+    if 'construction start' in field_name:
+        return CONSTRUCTION_START_FLAG
+    if 'construction end' in field_name:
+        return CONSTRUCTION_END_FLAG
+    if 'construction period' in field_name or 'construction month flag' in field_name:
+        return CONSTRUCTION_PERIOD_FLAG
+    if 'construction month counter' in field_name:
+        return CONSTRUCTION_MONTH_COUNTER
+    if 'commercial operation' in field_name:
+        return COMMERCIAL_OPERATION_FLAG
+    if 'operation period' in field_name:
+        return OPERATION_PERIOD_FLAG
+    if 'operation month counter' in field_name:
+        return OPERATION_MONTH_COUNTER
+    if 'ppa period' in field_name:
+        return PPA_PERIOD_FLAG
+    if 'ppa month counter' in field_name:
+        return PPA_MONTH_COUNTER
+    if 'debt service' in field_name:
+        return DEBT_SERVICE_FLAG
+    if 'tax' in field_name and 'flag' in field_name:
+        return TAX_FLAG
+    if 'dividend' in field_name and 'flag' in field_name:
+        return DIVIDEND_FLAG
+    if 'reporting period' in field_name:
+        return REPORTING_PERIOD
+    if 'EDATE' in excel_formula:
+        return EDATE_MONTH_END
+    if 'IF(' in excel_formula:
+        return ALTERNATING_FLAG
+    if field.get('type') == 'input':
+        return INPUT_DEFAULT
+    return CALCULATED_DEFAULT
+
+
+def evaluate_rule(kind: str, arrays: Dict[str, np.ndarray], construction_months, ppa_months) -> np.ndarray:
+    """Build a field's full value row (or stacked case rows) in one vectorized expression"""
+    i = arrays['index']
+    c = construction_months
+    as_int = np.int64
+
+    if kind == PERIOD or kind == CALCULATED_DEFAULT:
+        return arrays['period']
+    if kind == MONTH_START:
+        return arrays['month_start']
+    if kind == MONTH_END or kind == EDATE_MONTH_END:
+        return arrays['month_end']
+    if kind == DAYS_IN_MONTH:
+        return arrays['days_in_month']
+    if kind == FINANCIAL_YEAR:
+        return arrays['financial_year']
+    if kind == PROJECT_YEAR:
+        return arrays['project_year']
+    if kind == CALENDAR_YEAR:
+        return arrays['year']
+    if kind == CONSTRUCTION_START_FLAG:
+        return (i == 0).astype(as_int)
+    if kind == CONSTRUCTION_END_FLAG:
+        return (i == c - 1).astype(as_int)
+    if kind == CONSTRUCTION_PERIOD_FLAG:
+        return (i < c).astype(as_int)
+    if kind == CONSTRUCTION_MONTH_COUNTER:
+        return np.where(i < c, i + 1, 0)
+    if kind == COMMERCIAL_OPERATION_FLAG:
+        return (i == c).astype(as_int)
+    if kind == OPERATION_PERIOD_FLAG or kind == DEBT_SERVICE_FLAG:
+        return (i >= c).astype(as_int)
+    if kind == OPERATION_MONTH_COUNTER:
+        return np.where(i >= c, i - c + 1, 0)
+    if kind == PPA_PERIOD_FLAG:
+        return ((i >= c) & (i < c + ppa_months)).astype(as_int)
+    if kind == PPA_MONTH_COUNTER:
+        return np.where((i >= c) & (i < c + ppa_months), i - c + 1, 0)
+    if kind == TAX_FLAG:
+        return (i >= c + TAX_START_OFFSET).astype(as_int)
+    if kind == DIVIDEND_FLAG:
+        return (i >= c + DIVIDEND_START_OFFSET).astype(as_int)
+    if kind == REPORTING_PERIOD:
+        return i // 3 + 1
+    if kind == ALTERNATING_FLAG:
+        return (i % 2 == 0).astype(as_int)
+    if kind == INPUT_DEFAULT:
+        return np.zeros(len(i), dtype=as_int)
+    raise ValueError(f"Unknown timeline rule kind: {kind}")
+
+
+# Every stacked value (periods, years, day counts, counters, flags) fits in 32 bits
+STACK_DTYPE = np.int32
+
+
+def evaluate_kind_stack(kinds: List[str], arrays: Dict[str, np.ndarray], construction_months: np.ndarray,
+                        ppa_months: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Integer rows of each distinct kind for every case, plus the row of every field
+
+    Returns a (cases, distinct kinds, periods) array and, per entry of
+    ``kinds``, the index of its row, so fields sharing a kind (most of them)
+    are evaluated and stored once. Date kinds do not vary by case and must be
+    evaluated separately.
+    """
+    cases = len(construction_months)
+    periods = len(arrays['index'])
+    construction = np.asarray(construction_months, dtype=np.int64).reshape(-1, 1)
+    ppa = np.asarray(ppa_months, dtype=np.int64).reshape(-1, 1)
+
+    distinct: Dict[str, int] = {}
+    for kind in kinds:
+        if kind in DATE_KINDS:
+            raise ValueError(f"Date rule {kind} cannot be stacked")
+        distinct.setdefault(kind, len(distinct))
+
+    stack = np.empty((cases, len(distinct), periods), dtype=STACK_DTYPE)
+    for kind, position in distinct.items():
+        stack[:, position, :] = evaluate_rule(kind, arrays, construction, ppa)
+    return stack, np.array([distinct[kind] for kind in kinds], dtype=np.intp)
+
+
+def evaluate_case_stack(kinds: List[str], arrays: Dict[str, np.ndarray],
+                        construction_months: np.ndarray, ppa_months: np.ndarray) -> np.ndarray:
+    """Integer rows for every case and field as one (cases, fields, periods) array
+
+    Date kinds do not vary by case and must be evaluated separately. Use
+    evaluate_kind_stack for many cases, where repeating each kind's rows per
+    field would multiply the memory needed.
+    """
+    stack, rows = evaluate_kind_stack(kinds, arrays, construction_months, ppa_months)
+    return stack[:, rows, :]
+
+
+ROW_METRICS = ('sum', 'min', 'max', 'count_nonzero', 'first_period', 'last_period')
+
+
+def summarize_stack(stack: np.ndarray, metrics: List[str]) -> Dict[str, np.ndarray]:
+    """Per case and field summary metrics over the period axis, each shaped (cases, fields)
+
+    first_period/last_period are 1-based periods of the first/last non-zero value, or 0.
+    """
+    summary = {}
+    nonzero = stack != 0 if {'count_nonzero', 'first_period', 'last_period'} & set(metrics) else None
+    for metric in metrics:
+        if metric == 'sum':
+            summary[metric] = stack.sum(axis=-1, dtype=np.int64)
+        elif metric == 'min':
+            summary[metric] = stack.min(axis=-1)
+        elif metric == 'max':
+            summary[metric] = stack.max(axis=-1)
+        elif metric == 'count_nonzero':
+            summary[metric] = nonzero.sum(axis=-1)
+        elif metric == 'first_period':
+            summary[metric] = np.where(nonzero.any(axis=-1), nonzero.argmax(axis=-1) + 1, 0)
+        elif metric == 'last_period':
+            periods = stack.shape[-1]
+            last = periods - nonzero[..., ::-1].argmax(axis=-1)
+            summary[metric] = np.where(nonzero.any(axis=-1), last, 0)
+        else:
+            raise ValueError(f"Unknown metric: {metric}")
+    return summary
+
+
+# How each kind's monthly row rolls up into a coarser period
+SEQUENCE = 'sequence'
+ROLLUP_SUM = 'sum'
+ROLLUP_MAX = 'max'
+ROLLUP_FIRST = 'first'
+ROLLUP_LAST = 'last'
+
+ROLLUP_AGGREGATIONS = {
+    PERIOD: SEQUENCE,
+    CALCULATED_DEFAULT: SEQUENCE,
+    MONTH_START: ROLLUP_FIRST,
+    MONTH_END: ROLLUP_LAST,
+    EDATE_MONTH_END: ROLLUP_LAST,
+    DAYS_IN_MONTH: ROLLUP_SUM,
+    FINANCIAL_YEAR: ROLLUP_LAST,
+    PROJECT_YEAR: ROLLUP_LAST,
+    CALENDAR_YEAR: ROLLUP_LAST,
+    REPORTING_PERIOD: ROLLUP_LAST,
+    # Counters drop back to zero when their phase ends, so keep the period's peak
+    CONSTRUCTION_MONTH_COUNTER: ROLLUP_MAX,
+    OPERATION_MONTH_COUNTER: ROLLUP_MAX,
+    PPA_MONTH_COUNTER: ROLLUP_MAX,
+    # A flag is set for the period if it is set in any of its months
+    CONSTRUCTION_START_FLAG: ROLLUP_MAX,
+    CONSTRUCTION_END_FLAG: ROLLUP_MAX,
+    CONSTRUCTION_PERIOD_FLAG: ROLLUP_MAX,
+    COMMERCIAL_OPERATION_FLAG: ROLLUP_MAX,
+    OPERATION_PERIOD_FLAG: ROLLUP_MAX,
+    PPA_PERIOD_FLAG: ROLLUP_MAX,
+    DEBT_SERVICE_FLAG: ROLLUP_MAX,
+    TAX_FLAG: ROLLUP_MAX,
+    DIVIDEND_FLAG: ROLLUP_MAX,
+    ALTERNATING_FLAG: ROLLUP_MAX,
+    INPUT_DEFAULT: ROLLUP_SUM,
+}
+
+
+def rollup_stack(stack: np.ndarray, kinds: List[str], starts: np.ndarray,
+                 first_period: int = 1) -> np.ndarray:
+    """Aggregate (..., fields, periods) monthly rows into the groups beginning at ``starts``
+
+    Fields are bucketed by aggregation so each one is a single reduceat or
+    fancy-indexing pass over every field that uses it. ``first_period`` numbers
+    the first group when rolling up a window rather than the whole timeline.
+    """
+    groups = len(starts)
+    ends = np.append(starts[1:], stack.shape[-1]) - 1
+    rolled = np.empty(stack.shape[:-1] + (groups,), dtype=stack.dtype)
+    if not groups:
+        return rolled
+
+    positions_by_aggregation: Dict[str, List[int]] = {}
+    for position, kind in enumerate(kinds):
+        if kind in DATE_KINDS:
+            raise ValueError(f"Date rule {kind} cannot be rolled up numerically")
+        positions_by_aggregation.setdefault(ROLLUP_AGGREGATIONS[kind], []).append(position)
+
+    for aggregation, positions in positions_by_aggregation.items():
+        rows = stack[..., positions, :]
+        if aggregation == SEQUENCE:
+            rolled[..., positions, :] = np.arange(first_period, first_period + groups)
+        elif aggregation == ROLLUP_SUM:
+            rolled[..., positions, :] = np.add.reduceat(rows, starts, axis=-1)
+        elif aggregation == ROLLUP_MAX:
+            rolled[..., positions, :] = np.maximum.reduceat(rows, starts, axis=-1)
+        elif aggregation == ROLLUP_FIRST:
+            rolled[..., positions, :] = rows[..., starts]
+        else:
+            rolled[..., positions, :] = rows[..., ends]
+    return rolled
@@ -0,0 +1,279 @@
+"""Excel export of generated timelines.
+
+Writes one worksheet per frequency with xlsxwriter in ``constant_memory``
+mode: every row is flushed to disk as soon as the next one starts, so memory
+stays flat however many periods the project spans. Sheet layout:
+
+- rows 1-5: title and the project inputs the formulas refer to
+- rows 7-9: period number, period start and period end per column
+- row 11: column headings; one row per timeline field from row 12
+- columns A-E: source row, field name, unit, rule (or roll-up aggregation)
+  and total; periods start in column F
+
+With ``formulas=True`` the header rows and rule rows are written as Excel
+formulas (monthly rules over the header rows and inputs, roll-ups as
+SUM/MAX/first/last over the Monthly sheet) with the computed values cached,
+so the workbook recalculates in Excel but also opens correctly without it.
+"""
+
+from datetime import date
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import xlsxwriter
+from xlsxwriter.utility import xl_col_to_name
+from xlsxwriter.worksheet import Worksheet
+
+from period_calendar import FY_END_MONTHS, PeriodCalendar
+from timeline_engine import (
+    ALTERNATING_FLAG, CALCULATED_DEFAULT, CALENDAR_YEAR, COMMERCIAL_OPERATION_FLAG,
+    CONSTRUCTION_END_FLAG, CONSTRUCTION_MONTH_COUNTER, CONSTRUCTION_PERIOD_FLAG,
+    CONSTRUCTION_START_FLAG, DATE_KINDS, DAYS_IN_MONTH, DEBT_SERVICE_FLAG, DIVIDEND_FLAG,
+    DIVIDEND_START_OFFSET, EDATE_MONTH_END, FINANCIAL_YEAR, MONTH_END, MONTH_START,
+    OPERATION_MONTH_COUNTER, OPERATION_PERIOD_FLAG, PERIOD, PPA_MONTH_COUNTER, PPA_PERIOD_FLAG,
+    REPORTING_PERIOD, ROLLUP_AGGREGATIONS, ROLLUP_FIRST, ROLLUP_LAST, ROLLUP_MAX, ROLLUP_SUM,
+    SEQUENCE, TAX_FLAG, TAX_START_OFFSET, evaluate_case_stack, rollup_stack
+)
+
+XLSX_MEDIA_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+SHEET_NAMES = {'monthly': 'Monthly', 'quarterly': 'Quarterly', 'semiannual': 'Semi-annual', 'annual': 'Annual'}
+
+# Zero-based layout positions (see module docstring)
+PERIOD_ROW, START_ROW, END_ROW = 6, 7, 8
+HEADING_ROW = 10
+FIRST_FIELD_ROW = 11
+FIRST_PERIOD_COL = 5
+
+# Input cells referenced by the monthly rule formulas
+CONSTRUCTION_CELL = '$C$3'
+PPA_CELL = '$C$4'
+FY_END_CELL = '$C$5'
+
+# Excel serial day 0 as a proleptic Gregorian ordinal
+EXCEL_EPOCH = date(1899, 12, 30).toordinal()
+
+# Monthly rule formulas; {c} is the period column letter, {p} its period number cell
+_c, _ppa = CONSTRUCTION_CELL, PPA_CELL
+MONTHLY_FORMULAS = {
+    PERIOD: '={p}',
+    CALCULATED_DEFAULT: '={p}',
+    MONTH_START: '={c}$8',
+    MONTH_END: '={c}$9',
+    EDATE_MONTH_END: '={c}$9',
+    DAYS_IN_MONTH: '={c}$9-{c}$8+1',
+    FINANCIAL_YEAR: f'=YEAR({{c}}$9)+(MONTH({{c}}$9)>{FY_END_CELL})',
+    CALENDAR_YEAR: '=YEAR({c}$8)',
+    CONSTRUCTION_START_FLAG: '=--({p}=1)',
+    CONSTRUCTION_END_FLAG: f'=--({{p}}={_c})',
+    CONSTRUCTION_PERIOD_FLAG: f'=--({{p}}<={_c})',
+    CONSTRUCTION_MONTH_COUNTER: f'=IF({{p}}<={_c},{{p}},0)',
+    COMMERCIAL_OPERATION_FLAG: f'=--({{p}}={_c}+1)',
+    OPERATION_PERIOD_FLAG: f'=--({{p}}>{_c})',
+    DEBT_SERVICE_FLAG: f'=--({{p}}>{_c})',
+    OPERATION_MONTH_COUNTER: f'=IF({{p}}>{_c},{{p}}-{_c},0)',
+    PPA_PERIOD_FLAG: f'=--AND({{p}}>{_c},{{p}}<={_c}+{_ppa})',
+    PPA_MONTH_COUNTER: f'=IF(AND({{p}}>{_c},{{p}}<={_c}+{_ppa}),{{p}}-{_c},0)',
+    TAX_FLAG: f'=--({{p}}>{_c}+{TAX_START_OFFSET})',
+    DIVIDEND_FLAG: f'=--({{p}}>{_c}+{DIVIDEND_START_OFFSET})',
+    REPORTING_PERIOD: '=INT(({p}-1)/3)+1',
+    ALTERNATING_FLAG: '=MOD({p},2)',
+}
+# PROJECT_YEAR depends on the clamped period date and INPUT_DEFAULT is an input,
+# so both are always written as values
+
+# Roll-up formulas over the Monthly sheet; {first}/{last} are the period's monthly columns
+ROLLUP_FORMULAS = {
+    SEQUENCE: '={p}',
+    ROLLUP_SUM: '=SUM(Monthly!{first}{row}:{last}{row})',
+    ROLLUP_MAX: '=MAX(Monthly!{first}{row}:{last}{row})',
+    ROLLUP_FIRST: '=Monthly!{first}{row}',
+    ROLLUP_LAST: '=Monthly!{last}{row}',
+}
+
+
+def _has_total(kind: str) -> bool:
+    # Totals are meaningful for flags (months flagged) and summed rows, not counters or dates
+    return kind.endswith('_flag') or ROLLUP_AGGREGATIONS[kind] == ROLLUP_SUM
+
+
+class _TimelineWorksheet(Worksheet):
+    """Worksheet that skips xlsxwriter's future-function rewriting of formulas
+
+    The rewrite runs a few dozen regex substitutions per formula and dominates
+    formula exports (about 3x the export time). The templates above only use
+    functions Excel has always had, so there is nothing for it to rewrite.
+    xlsxwriter has no public switch for this: ``use_future_functions`` only
+    adds rewrites, and the dynamic-array ones always run. ``_prepare_formula``
+    is private, so requirements.txt pins the xlsxwriter release it was checked
+    against; re-check this override before raising the pin.
+    """
+
+    def _prepare_formula(self, formula, expand_future_functions=False):
+        return formula[1:] if formula.startswith('=') else formula
+
+
+class _Formats:
+    def __init__(self, workbook: xlsxwriter.Workbook):
+        self.title = workbook.add_format({'bold': True, 'font_size': 14})
+        self.bold = workbook.add_format({'bold': True})
+        self.heading = workbook.add_format({'bold': True, 'bottom': 1})
+        self.date = workbook.add_format({'num_format': 'dd-mmm-yy'})
+        self.header_date = workbook.add_format({'num_format': 'dd-mmm-yy', 'bold': True})
+
+
+def write_timeline_workbook(path: str, calendar: PeriodCalendar, field_rows: List[Dict], kinds: List[str],
+                            construction_months: int, ppa_months: int,
+                            rollups: Sequence[Tuple[str, int]], formulas: bool = False) -> Dict[str, int]:
+    """Write the monthly timeline and its roll-ups to ``path``; returns periods per sheet"""
+    int_positions = [i for i, kind in enumerate(kinds) if kind not in DATE_KINDS]
+    int_kinds = [kinds[i] for i in int_positions]
+    stack = evaluate_case_stack(
+        int_kinds, calendar.engine_arrays(), np.array([construction_months]), np.array([ppa_months])
+    )[0]
+    month_start = (calendar.array('month_start') - EXCEL_EPOCH).tolist()
+    month_end = (calendar.array('month_end') - EXCEL_EPOCH).tolist()
+    inputs = (
+        ('Model start date', calendar.start_date),
+        ('Construction period (months)', construction_months),
+        ('PPA term (months)', ppa_months),
+        ('Financial year end month', FY_END_MONTHS[calendar.fy_end]),
+    )
+
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    try:
+        formats = _Formats(workbook)
+        writer = _SheetWriter(workbook, formats, field_rows, kinds, int_positions, inputs, formulas)
+        periods = {'monthly': len(calendar)}
+        writer.write('monthly', stack, month_start, month_end)
+        for frequency, months_per_period in rollups:
+            starts = calendar.group_starts(months_per_period)
+            ends = (np.append(starts[1:], len(calendar)) - 1).astype(np.int64)
+            writer.write(
+                frequency, rollup_stack(stack, int_kinds, starts),
+                [month_start[i] for i in starts.tolist()], [month_end[i] for i in ends.tolist()],
+                groups=(starts.tolist(), ends.tolist())
+            )
+            periods[frequency] = len(starts)
+    finally:
+        workbook.close()
+    return periods
+
+
+class _SheetWriter:
+    """Writes one frequency's grid row by row, as constant_memory mode requires"""
+
+    def __init__(self, workbook: xlsxwriter.Workbook, formats: _Formats, field_rows: List[Dict],
+                 kinds: List[str], int_positions: List[int], inputs: Sequence[Tuple[str, object]],
+                 formulas: bool):
+        self.workbook = workbook
+        self.formats = formats
+        self.field_rows = field_rows
+        self.kinds = kinds
+        self.int_positions = int_positions
+        self.inputs = inputs
+        self.formulas = formulas
+
+    def write(self, frequency: str, stack: np.ndarray, starts: List[int], ends: List[int],
+              groups: Optional[Tuple[List[int], List[int]]] = None) -> None:
+        sheet = self.workbook.add_worksheet(SHEET_NAMES[frequency], worksheet_class=_TimelineWorksheet)
+        formats = self.formats
+        count = len(starts)
+        last_col = FIRST_PERIOD_COL + count - 1
+        letters = [xl_col_to_name(FIRST_PERIOD_COL + i) for i in range(count)]
+        period_refs = [f'{letter}$7' for letter in letters]
+        monthly_letters = None
+        if groups is not None:
+            monthly_letters = ([xl_col_to_name(FIRST_PERIOD_COL + i) for i in groups[0]],
+                               [xl_col_to_name(FIRST_PERIOD_COL + i) for i in groups[1]])
+
+        sheet.set_column(0, 0, 6)
+        sheet.set_column(1, 1, 40)
+        sheet.set_column(2, 4, 12)
+        if count:
+            sheet.set_column(FIRST_PERIOD_COL, last_col, 10)
+        sheet.freeze_panes(FIRST_FIELD_ROW, FIRST_PERIOD_COL)
+
+        title = f'{SHEET_NAMES[frequency]} timeline'
+        sheet.write_string(0, 0, title, formats.title)
+        for row, (label, value) in enumerate(self.inputs, start=1):
+            sheet.write_string(row, 0, label)
+            if isinstance(value, str):
+                ordinal = date.fromisoformat(value).toordinal()
+                sheet.write_number(row, 2, ordinal - EXCEL_EPOCH, formats.date)
+            else:
+                sheet.write_number(row, 2, value)
+
+        # Header rows: period number, period start and period end
+        write_formula, write_number = sheet.write_formula, sheet.write_number
+        sheet.write_string(PERIOD_ROW, 1, 'Period', formats.bold)
+        for i in range(count):
+            if self.formulas and i:
+                write_formula(PERIOD_ROW, FIRST_PERIOD_COL + i, f'={letters[i - 1]}7+1', formats.bold, i + 1)
+            else:
+                write_number(PERIOD_ROW, FIRST_PERIOD_COL + i, i + 1, formats.bold)
+        for row, label, dates, edge in ((START_ROW, 'Period start', starts, 0), (END_ROW, 'Period end', ends, 1)):
+            sheet.write_string(row, 1, label, formats.bold)
+            for i, serial in enumerate(dates):
+                col = FIRST_PERIOD_COL + i
+                if not self.formulas:
+                    write_number(row, col, serial, formats.header_date)
+                elif monthly_letters is not None:
+                    excel_row = row + 1
+                    write_formula(row, col, f'=Monthly!{monthly_letters[edge][i]}${excel_row}',
+                                  formats.header_date, serial)
+                elif row == START_ROW and i:
+                    write_formula(row, col, f'=EDATE({letters[i - 1]}8,1)', formats.header_date, serial)
+                elif row == END_ROW:
+                    write_formula(row, col, f'=EOMONTH({letters[i]}8,0)', formats.header_date, serial)
+                else:
+                    write_number(row, col, serial, formats.header_date)
+
+        headings = ('Row', 'Field', 'Unit', 'Rule' if groups is None else 'Aggregation', 'Total')
+        for col, heading in enumerate(headings):
+            sheet.write_string(HEADING_ROW, col, heading, formats.heading)
+
+        stack_rows = dict(zip(self.int_positions, stack.tolist()))
+        for field_index, field in enumerate(self.field_rows):
+            row = FIRST_FIELD_ROW + field_index
+            kind = self.kinds[field_index]
+            aggregation = ROLLUP_AGGREGATIONS[kind]
+            sheet.write_number(row, 0, field.get('row', 0))
+            sheet.write_string(row, 1, str(field.get('field_name', '')))
+            sheet.write_string(row, 2, str(field.get('unit', '')))
+            sheet.write_string(row, 3, kind if groups is None else aggregation)
+
+            values = stack_rows.get(field_index)
+            is_date = values is None
+            if is_date:
+                values = starts if kind == MONTH_START else ends
+            cell_format = formats.date if is_date else None
+
+            if _has_total(kind) and count:
+                total = sum(values)
+                if self.formulas:
+                    write_formula(row, 4, f'=SUM({letters[0]}{row + 1}:{letters[-1]}{row + 1})', None, total)
+                else:
+                    write_number(row, 4, total)
+
+            template = self._template(kind, aggregation, groups is not None)
+            if template is None:
+                for i, value in enumerate(values):
+                    write_number(row, FIRST_PERIOD_COL + i, value, cell_format)
+            elif groups is None:
+                for i, value in enumerate(values):
+                    formula = template.format(c=letters[i], p=period_refs[i])
+                    write_formula(row, FIRST_PERIOD_COL + i, formula, cell_format, value)
+            else:
+                excel_row = row + 1
+                firsts, lasts = monthly_letters
+                for i, value in enumerate(values):
+                    formula = template.format(p=period_refs[i], first=firsts[i], last=lasts[i], row=excel_row)
+                    write_formula(row, FIRST_PERIOD_COL + i, formula, cell_format, value)
+
+    def _template(self, kind: str, aggregation: str, rollup: bool) -> Optional[str]:
+        if not self.formulas:
+            return None
+        if rollup:
+            return ROLLUP_FORMULAS[aggregation]
+        return MONTHLY_FORMULAS.get(kind)
@@ -0,0 +1,146 @@
+"""Compiled rule table for the extracted timeline fields.
+
+extracted_timeline_fields.json is read once, each field is converted to its
+timeline row definition and classified into a rule kind, and the result is
+kept as an immutable table. Requests only evaluate the pre-resolved rules.
+The file's mtime is checked on access and the table is rebuilt when it
+changes, so edits to the field list are picked up without a restart.
+"""
+
+import json
+import os
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from timeline_engine import classify_field
+
+DEFAULT_FIELDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'extracted_timeline_fields.json')
+
+# Calendar rows used when no extracted timeline fields are available
+BASIC_TIMELINE_FIELDS = [
+    {"field_name": "Monthly period", "type": "calculated", "unit": "number", "formula": "sequence"},
+    {"field_name": "Month start date", "type": "calculated", "unit": "date", "formula": "month_start"},
+    {"field_name": "Month end date", "type": "calculated", "unit": "date", "formula": "month_end"},
+    {"field_name": "Days in month", "type": "calculated", "unit": "days", "formula": "days_in_month"},
+    {"field_name": "Financial year", "type": "calculated", "unit": "number", "formula": "financial_year"},
+]
+
+
+def field_row_from_extracted(field: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert one extracted Excel field into a timeline row definition"""
+    return {
+        "field_name": field.get('name', 'Unknown Field'),
+        "type": field.get('type', 'calculated'),
+        "unit": field.get('unit', 'text'),
+        "formula": field.get('formula', '').replace('= ', '') if field.get('formula') else 'excel_calculation',
+        "row": field.get('row', 0),
+        "excel_formula": field.get('formula', '')
+    }
+
+
+class TimelineRule:
+    """A timeline field with its resolved rule kind"""
+
+    __slots__ = ('index', 'kind', 'field')
+
+    def __init__(self, index: int, kind: str, field: Dict[str, Any]):
+        self.index = index
+        self.kind = kind
+        # Row definition copied into every timeline row; treat as read-only
+        self.field = field
+
+    def describe(self) -> Dict[str, Any]:
+        return {'index': self.index, 'kind': self.kind, **self.field}
+
+
+class TimelineRuleTable:
+    """Immutable list of compiled rules plus the parallel lists requests consume"""
+
+    __slots__ = ('rules', 'field_rows', 'kinds', 'source', 'mtime', 'loaded_at')
+
+    def __init__(self, field_rows: List[Dict[str, Any]], source: Optional[str] = None,
+                 mtime: Optional[float] = None):
+        self.rules: Tuple[TimelineRule, ...] = tuple(
+            TimelineRule(index, classify_field(field), field) for index, field in enumerate(field_rows)
+        )
+        self.field_rows = [rule.field for rule in self.rules]
+        self.kinds = [rule.kind for rule in self.rules]
+        self.source = source
+        self.mtime = mtime
+        self.loaded_at = datetime.now().isoformat()
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def describe(self, include_rules: bool = True) -> Dict[str, Any]:
+        info = {
+            'source': self.source,
+            'mtime': datetime.fromtimestamp(self.mtime).isoformat() if self.mtime else None,
+            'loaded_at': self.loaded_at,
+            'rule_count': len(self.rules),
+            'kinds': dict(Counter(self.kinds))
+        }
+        if include_rules:
+            info['rules'] = [rule.describe() for rule in self.rules]
+        return info
+
+
+BASIC_RULE_TABLE = TimelineRuleTable([dict(field) for field in BASIC_TIMELINE_FIELDS])
+
+
+class TimelineRuleSource:
+    """Loads the rule table from disk and rebuilds it when the file's mtime changes"""
+
+    def __init__(self, path: str = DEFAULT_FIELDS_PATH):
+        self.path = path
+        self.reloads = 0
+        self.error: Optional[str] = None
+        self._table = TimelineRuleTable([], path)
+        self._failed_mtime: Optional[float] = None
+        self._lock = threading.Lock()
+        self.table()
+
+    def _current_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def table(self) -> TimelineRuleTable:
+        """The compiled table, reloaded first if the file changed"""
+        mtime = self._current_mtime()
+        table = self._table
+        if mtime == table.mtime or mtime == self._failed_mtime:
+            return table
+        with self._lock:
+            if mtime != self._table.mtime and mtime != self._failed_mtime:
+                self._table = self._load(mtime)
+                self.reloads += 1
+            return self._table
+
+    def _load(self, mtime: Optional[float]) -> TimelineRuleTable:
+        if mtime is None:
+            self.error = f"{self.path} not found"
+            print(f"⚠️ Timeline fields not found at {self.path}")
+            return TimelineRuleTable([], self.path)
+        try:
+            with open(self.path, 'r') as f:
+                extracted_fields = json.load(f)
+        except (OSError, ValueError) as e:
+            # Keep serving the previous table if the file is mid-write or invalid
+            self.error = str(e)
+            self._failed_mtime = mtime
+            print(f"⚠️ Could not load timeline fields from {self.path}: {e}")
+            return self._table
+        self.error = None
+        self._failed_mtime = None
+        table = TimelineRuleTable([field_row_from_extracted(field) for field in extracted_fields], self.path, mtime)
+        print(f"📋 Loaded {len(table)} timeline rules from {self.path}")
+        return table
+
+    def table_or_basic(self) -> TimelineRuleTable:
+        """The compiled table, or the basic calendar rows when it is empty"""
+        table = self.table()
+        return table if len(table) else BASIC_RULE_TABLE
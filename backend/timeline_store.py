@@ -0,0 +1,157 @@
+"""Generated-timeline handles for windowed row queries.
+
+A handle keeps everything needed to evaluate a project's timeline (shared
+period calendar, classified fields, scenario parameters) but no values.
+Each query evaluates only the requested rows over the requested period
+window, so scrolling a long extended project costs only the visible cells.
+Rolled-up frequencies evaluate just the months behind the requested periods.
+Handle ids cover the rule table as well as the inputs, and a handle built
+from a table that has since been reloaded is reported stale rather than
+served with the old rules.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from period_calendar import PeriodCalendar
+from timeline_engine import (
+    DATE_KINDS, MONTH_START, ROLLUP_AGGREGATIONS, evaluate_case_stack, rollup_stack
+)
+from timeline_rules import TimelineRuleTable
+
+MONTHLY = 'monthly'
+
+
+class TimelineHandle:
+    """Lazily evaluated timeline for one set of project inputs"""
+
+    def __init__(self, timeline_id: str, calendar: PeriodCalendar, rules: TimelineRuleTable,
+                 construction_months: int, ppa_months: int, rollups: Dict[str, int]):
+        self.id = timeline_id
+        self.calendar = calendar
+        self.rules = rules
+        self.field_rows = rules.field_rows
+        self.kinds = rules.kinds
+        self.construction_months = construction_months
+        self.ppa_months = ppa_months
+        self.rollups = rollups
+        self._arrays = calendar.engine_arrays()
+
+    @property
+    def frequencies(self) -> List[str]:
+        return [MONTHLY, *self.rollups]
+
+    def total_periods(self, frequency: str) -> int:
+        if frequency == MONTHLY:
+            return len(self.calendar)
+        return len(self.calendar.group_starts(self.rollups[frequency]))
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            'timeline_id': self.id,
+            'start_date': self.calendar.start_date,
+            'end_date': self.calendar.end_date,
+            'total_periods': {frequency: self.total_periods(frequency) for frequency in self.frequencies},
+            'rows': [
+                {'index': index, 'field_name': field['field_name'], 'unit': field.get('unit'), 'row': field.get('row')}
+                for index, field in enumerate(self.field_rows)
+            ]
+        }
+
+    def window(self, frequency: str, row_indexes: Optional[Sequence[int]] = None,
+               period_from: int = 1, period_to: Optional[int] = None) -> Dict[str, Any]:
+        """Values of the selected rows over periods period_from..period_to (1-based, inclusive)"""
+        if frequency != MONTHLY and frequency not in self.rollups:
+            raise ValueError(f"Unknown frequency: {frequency}")
+        total = self.total_periods(frequency)
+        if period_to is None or period_to > total:
+            period_to = total
+        if period_from < 1 or period_from > period_to:
+            raise ValueError(f"Invalid period window {period_from}..{period_to} of {total}")
+        if row_indexes is None:
+            row_indexes = range(len(self.field_rows))
+        for index in row_indexes:
+            if not 0 <= index < len(self.field_rows):
+                raise ValueError(f"Row index {index} out of range")
+
+        # Months backing the window, and where each requested period starts within them
+        if frequency == MONTHLY:
+            first_month, end_month = period_from - 1, period_to
+            starts = None
+            columns = self.calendar.columns(first_month, end_month)
+        else:
+            all_starts = self.calendar.group_starts(self.rollups[frequency])
+            first_month = int(all_starts[period_from - 1])
+            end_month = int(all_starts[period_to]) if period_to < total else len(self.calendar)
+            starts = all_starts[period_from - 1:period_to] - first_month
+            columns = self.calendar.rollup_columns(self.rollups[frequency], period_from - 1, period_to)
+
+        window_arrays = {name: array[first_month:end_month] for name, array in self._arrays.items()}
+        kinds = [self.kinds[index] for index in row_indexes]
+        int_positions = [position for position, kind in enumerate(kinds) if kind not in DATE_KINDS]
+        int_kinds = [kinds[position] for position in int_positions]
+
+        stack = evaluate_case_stack(
+            int_kinds, window_arrays, np.array([self.construction_months]), np.array([self.ppa_months])
+        )[0]
+        month_start = window_arrays['month_start']
+        month_end = window_arrays['month_end']
+        if starts is not None:
+            stack = rollup_stack(stack, int_kinds, starts, period_from)
+            month_start = month_start[starts]
+            month_end = month_end[np.append(starts[1:], end_month - first_month) - 1]
+
+        stack_rows = dict(zip(int_positions, stack.tolist()))
+        rows = []
+        for position, index in enumerate(row_indexes):
+            values = stack_rows.get(position)
+            if values is None:
+                values = (month_start if kinds[position] == MONTH_START else month_end).tolist()
+            row = {'index': index, **self.field_rows[index], 'values': values}
+            if frequency != MONTHLY:
+                row['aggregation'] = ROLLUP_AGGREGATIONS[kinds[position]]
+            rows.append(row)
+
+        return {
+            'timeline_id': self.id,
+            'frequency': frequency,
+            'total_periods': total,
+            'total_rows': len(self.field_rows),
+            'period_from': period_from,
+            'period_to': period_to,
+            'columns': columns,
+            'rows': rows
+        }
+
+
+def timeline_id_for(inputs_json: str, rules: TimelineRuleTable) -> str:
+    """Stable id for a set of timeline inputs under one rule table, so identical projects share a handle"""
+    key = f"{inputs_json}\n{rules.source}\n{rules.mtime}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+
+
+class TimelineStore:
+    """Bounded LRU of timeline handles"""
+
+    def __init__(self, max_handles: int):
+        self.max_handles = max_handles
+        self._handles: "OrderedDict[str, TimelineHandle]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, timeline_id: str) -> Optional[TimelineHandle]:
+        with self._lock:
+            handle = self._handles.get(timeline_id)
+            if handle is not None:
+                self._handles.move_to_end(timeline_id)
+            return handle
+
+    def put(self, handle: TimelineHandle) -> None:
+        with self._lock:
+            self._handles[handle.id] = handle
+            self._handles.move_to_end(handle.id)
+            while len(self._handles) > self.max_handles:
+                self._handles.popitem(last=False)
@@ -0,0 +1,176 @@
+"""Background job queue for workbook uploads.
+
+Uploads are written to disk by the request handler and parsed on a bounded
+thread pool, so a large model never stalls the event loop. Each job records
+per-sheet progress events that clients can poll or stream, and keeps what
+the runner returned until it is evicted from the bounded job history. The
+runner should return something small (e.g. the id of a stored result), since
+finished jobs stay in memory.
+"""
+
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+FINISHED_STATES = (COMPLETED, FAILED)
+
+
+class JobQueueFull(Exception):
+    """Raised when the number of unfinished jobs has reached the configured limit"""
+
+
+class UploadJob:
+    """State of one upload as it moves through the queue"""
+
+    def __init__(self, filename: str, path: str, content_hash: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.path = path
+        self.content_hash = content_hash
+        self.status = QUEUED
+        self.sheets_total = 0
+        self.sheets_done = 0
+        self.current_sheet: Optional[str] = None
+        self.error: Optional[str] = None
+        # What the runner returned, e.g. the published analysis id
+        self.result: Any = None
+        # Extra summary fields set by the runner, e.g. the published analysis id
+        self.details: Dict[str, Any] = {}
+        self.created_at = datetime.now().isoformat()
+        self.updated_at = self.created_at
+        self.events: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._add_event('queued')
+
+    def _add_event(self, event: str, **details) -> None:
+        self.updated_at = datetime.now().isoformat()
+        self.events.append({
+            'event': event,
+            'status': self.status,
+            'sheetsDone': self.sheets_done,
+            'sheetsTotal': self.sheets_total,
+            'timestamp': self.updated_at,
+            **details
+        })
+
+    def report_sheet(self, sheet_name: str, done: int, total: int) -> None:
+        """Progress callback invoked as each sheet finishes"""
+        with self._lock:
+            self.sheets_done = done
+            self.sheets_total = total
+            self.current_sheet = sheet_name
+            self._add_event('sheet', sheet=sheet_name)
+
+    def annotate(self, **details) -> None:
+        with self._lock:
+            self.details.update(details)
+
+    def mark_running(self) -> None:
+        with self._lock:
+            self.status = RUNNING
+            self._add_event('started')
+
+    def mark_completed(self, result: Any) -> None:
+        with self._lock:
+            self.result = result
+            self.status = COMPLETED
+            self._add_event('completed')
+
+    def mark_failed(self, error: str) -> None:
+        with self._lock:
+            self.error = error
+            self.status = FAILED
+            self._add_event('failed', error=error)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'jobId': self.id,
+                'filename': self.filename,
+                'status': self.status,
+                'progress': {
+                    'sheetsDone': self.sheets_done,
+                    'sheetsTotal': self.sheets_total,
+                    'currentSheet': self.current_sheet
+                },
+                'error': self.error,
+                'createdAt': self.created_at,
+                'updatedAt': self.updated_at,
+                **self.details
+            }
+
+    def events_since(self, index: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            return self.events[index:]
+
+
+class UploadJobManager:
+    """Runs upload jobs on a bounded worker pool and tracks their state"""
+
+    def __init__(self, upload_dir: str, max_workers: int, max_pending: int, history_size: int):
+        self.upload_dir = upload_dir
+        self.max_pending = max_pending
+        self.history_size = history_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='upload-job')
+        self._jobs: "OrderedDict[str, UploadJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(self.upload_dir, exist_ok=True)
+
+    def upload_path(self, suffix: str = '.xlsx') -> str:
+        """A fresh path inside the upload directory for an incoming file"""
+        return os.path.join(self.upload_dir, f"{uuid.uuid4().hex}{suffix}")
+
+    def submit(self, filename: str, path: str, runner: Callable[[UploadJob], Any],
+               content_hash: Optional[str] = None) -> UploadJob:
+        """Queue a job; runner(job) returns the result and may call job.report_sheet"""
+        with self._lock:
+            pending = sum(1 for job in self._jobs.values() if not job.finished)
+            if pending >= self.max_pending:
+                raise JobQueueFull(f"{pending} uploads are already being processed")
+            job = UploadJob(filename, path, content_hash)
+            self._jobs[job.id] = job
+            self._evict_finished()
+        self._executor.submit(self._run, job, runner)
+        return job
+
+    def get(self, job_id: str) -> Optional[UploadJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counts = {QUEUED: 0, RUNNING: 0, COMPLETED: 0, FAILED: 0}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return counts
+
+    def _run(self, job: UploadJob, runner: Callable[[UploadJob], Any]) -> None:
+        job.mark_running()
+        try:
+            job.mark_completed(runner(job))
+        except Exception as e:
+            job.mark_failed(str(e))
+        finally:
+            try:
+                os.remove(job.path)
+            except OSError:
+                pass
+
+    def _evict_finished(self) -> None:
+        # Drop the oldest finished jobs once the history is full
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(self._jobs) - self.history_size)]:
+            del self._jobs[job_id]
@@ -0,0 +1,170 @@
+"""Per-sheet fingerprints of .xlsx packages.
+
+An .xlsx file is a zip of XML parts: one part per worksheet plus parts shared
+by every sheet (the shared string table, cell formats, defined names). A
+sheet's fingerprint hashes its worksheet part together with exactly the
+shared pieces it depends on:
+
+- the shared strings its cells reference (by index)
+- the cell formats (``xf`` records) it references, plus the custom number
+  formats, which decide whether a number is read as a date
+- the workbook's date system and defined names
+
+so editing one sheet, even when that adds strings to the shared table,
+leaves the fingerprints of the other sheets unchanged. Equal fingerprints
+mean the parser sees identical cells, so a sheet's analysis can be reused
+across versions of a model. Only regular expressions run over the sheet
+XML; nothing is parsed cell by cell.
+"""
+
+import hashlib
+import io
+import posixpath
+import re
+import zipfile
+from typing import Dict, List, Optional, Tuple
+from xml.etree import ElementTree
+
+PACKAGE_RELS_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+RELATIONSHIP_ID = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id'
+OFFICE_DOCUMENT = '/officeDocument'
+
+_SHARED_STRING = re.compile(rb'<(?:\w+:)?si\b[^>]*?(?:/>|>.*?</(?:\w+:)?si>)', re.S)
+_CELL_XFS = re.compile(rb'<(?:\w+:)?cellXfs\b.*?</(?:\w+:)?cellXfs>', re.S)
+_XF = re.compile(rb'<(?:\w+:)?xf\b[^>]*?(?:/>|>.*?</(?:\w+:)?xf>)', re.S)
+_NUM_FMTS = re.compile(rb'<(?:\w+:)?numFmts\b.*?</(?:\w+:)?numFmts>', re.S)
+_DEFINED_NAMES = re.compile(rb'<(?:\w+:)?definedNames\b.*?</(?:\w+:)?definedNames>', re.S)
+_WORKBOOK_PR = re.compile(rb'<(?:\w+:)?workbookPr\b[^>]*>')
+# Shared string cells: t="s" ... <v>index</v>; style references: s="index" on cells and rows
+_STRING_REF = re.compile(rb'\bt="s"[^>]*>\s*<(?:\w+:)?v>(\d+)<')
+_STYLE_REF = re.compile(rb'\bs="(\d+)"')
+
+
+class WorkbookPackageError(Exception):
+    """Raised when a file is not an .xlsx package we can read"""
+
+
+def sheet_fingerprints(source, salt: str = '') -> Dict[str, str]:
+    """Fingerprint of every sheet, in workbook order
+
+    ``source`` is a path or the workbook bytes; ``salt`` (the parser version)
+    is mixed into every fingerprint.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    try:
+        with zipfile.ZipFile(source) as package:
+            workbook_xml, sheets, shared_parts = workbook_layout(package)
+
+            shared_strings = _SHARED_STRING.findall(_read_optional(package, shared_parts.get('sharedStrings')))
+            styles = _read_optional(package, shared_parts.get('styles'))
+            cell_xfs = _CELL_XFS.search(styles)
+            cell_formats = _XF.findall(cell_xfs.group(0)) if cell_xfs else []
+
+            workbook_digest = hashlib.sha256(salt.encode('utf-8'))
+            for pattern, content in ((_WORKBOOK_PR, workbook_xml), (_DEFINED_NAMES, workbook_xml),
+                                     (_NUM_FMTS, styles)):
+                match = pattern.search(content)
+                workbook_digest.update(match.group(0) if match else b'-')
+                workbook_digest.update(b'\0')
+
+            fingerprints = {}
+            for name, part in sheets:
+                digest = workbook_digest.copy()
+                digest.update(name.encode('utf-8') + b'\0')
+                sheet_xml = package.read(part) if part in package.NameToInfo else b''
+                digest.update(sheet_xml)
+                _update_references(digest, b'strings', _STRING_REF, sheet_xml, shared_strings)
+                _update_references(digest, b'styles', _STYLE_REF, sheet_xml, cell_formats)
+                fingerprints[name] = digest.hexdigest()
+            return fingerprints
+    except (zipfile.BadZipFile, KeyError, ElementTree.ParseError) as e:
+        raise WorkbookPackageError(str(e)) from e
+
+
+def workbook_layout(package: zipfile.ZipFile) -> Tuple[bytes, List[Tuple[str, str]], Dict[str, str]]:
+    """The workbook XML, (sheet name, part) in workbook order, and the shared parts by relationship type"""
+    workbook_part = _office_document(package)
+    workbook_xml = package.read(workbook_part)
+    sheets, shared_parts = _workbook_parts(package, workbook_part, workbook_xml)
+    return workbook_xml, sheets, shared_parts
+
+
+def parse_defined_names(workbook_xml: bytes) -> List[Tuple[str, Optional[str], str]]:
+    """(name, scope sheet, definition) of every defined name; the scope is None for workbook-wide names
+
+    Built-in names (print areas, filter ranges) are skipped.
+    """
+    root = ElementTree.fromstring(workbook_xml)
+    sheet_names = [sheet.get('name') for sheet in root.iter(f'{MAIN_NS}sheet')]
+    names = []
+    for defined_name in root.iter(f'{MAIN_NS}definedName'):
+        name = defined_name.get('name') or ''
+        if not name or name.startswith('_xlnm.'):
+            continue
+        scope = None
+        local_sheet_id = defined_name.get('localSheetId')
+        if local_sheet_id is not None and local_sheet_id.isdigit() and int(local_sheet_id) < len(sheet_names):
+            scope = sheet_names[int(local_sheet_id)]
+        names.append((name, scope, defined_name.text or ''))
+    return names
+
+
+def read_defined_names(source) -> List[Tuple[str, Optional[str], str]]:
+    """Defined names of a workbook path or byte payload, see parse_defined_names"""
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    try:
+        with zipfile.ZipFile(source) as package:
+            return parse_defined_names(package.read(_office_document(package)))
+    except (zipfile.BadZipFile, KeyError, ElementTree.ParseError) as e:
+        raise WorkbookPackageError(str(e)) from e
+
+
+def _office_document(package: zipfile.ZipFile) -> str:
+    root = ElementTree.fromstring(package.read('_rels/.rels'))
+    for rel in root.iter(f'{PACKAGE_RELS_NS}Relationship'):
+        if rel.get('Type', '').endswith(OFFICE_DOCUMENT):
+            return _resolve('', rel.get('Target'))
+    raise WorkbookPackageError('Package has no workbook part')
+
+
+def _workbook_parts(package: zipfile.ZipFile, workbook_part: str,
+                    workbook_xml: bytes) -> Tuple[List[Tuple[str, str]], Dict[str, str]]:
+    """(sheet name, part) in workbook order, and the shared parts by relationship type"""
+    folder, filename = posixpath.split(workbook_part)
+    rels_xml = package.read(posixpath.join(folder, '_rels', f'{filename}.rels'))
+    targets, shared = {}, {}
+    for rel in ElementTree.fromstring(rels_xml).iter(f'{PACKAGE_RELS_NS}Relationship'):
+        if rel.get('TargetMode') == 'External':
+            continue
+        part = _resolve(folder, rel.get('Target'))
+        targets[rel.get('Id')] = part
+        shared[rel.get('Type', '').rsplit('/', 1)[-1]] = part
+
+    sheets = [
+        (sheet.get('name'), targets.get(sheet.get(RELATIONSHIP_ID), ''))
+        for sheet in ElementTree.fromstring(workbook_xml).iter(f'{MAIN_NS}sheet')
+    ]
+    return sheets, shared
+
+
+def _resolve(folder: str, target: str) -> str:
+    if target.startswith('/'):
+        return target[1:]
+    return posixpath.normpath(posixpath.join(folder, target))
+
+
+def _read_optional(package: zipfile.ZipFile, part: Optional[str]) -> bytes:
+    return package.read(part) if part and part in package.NameToInfo else b''
+
+
+def _update_references(digest, label: bytes, reference: re.Pattern, sheet_xml: bytes,
+                       elements: List[bytes]) -> None:
+    """Hash the raw XML of every shared element the sheet references, in index order"""
+    digest.update(b'\0' + label + b'\0')
+    for index in sorted({int(value) for value in reference.findall(sheet_xml)}):
+        digest.update(b'%d\0' % index)
+        if index < len(elements):
+            digest.update(elements[index])
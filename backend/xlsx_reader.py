@@ -0,0 +1,265 @@
+"""Streaming .xlsx reader yielding formulas and cached values in one pass.
+
+openpyxl shows a workbook either with formulas (``data_only=False``) or
+with the values Excel last calculated (``data_only=True``), so seeing both
+means loading the model twice. Each worksheet part already stores both: a
+formula cell carries its formula in ``<f>`` and its cached result in
+``<v>``. This reader streams a worksheet part with an incremental XML parser
+and emits, per non-empty cell, ``(column, formula, cached value, style id)``
+grouped by row.
+
+Values are decoded the way openpyxl decodes them, so input cells come out
+identical under either reader:
+
+- shared strings are resolved from the shared string table (rich text runs
+  flattened to plain text) and inline strings are read in place
+- numbers become ints or floats, and dates when the cell's format is a date
+  format (in the workbook's 1900 or 1904 date system)
+- booleans become bools and error cells keep their ``#N/A``-style text
+- shared formulas are translated from their anchor cell with openpyxl's
+  Translator; array formulas yield their text and data tables ``=TABLE(..)``
+
+Only the worksheet, shared string, style and workbook parts are read; no
+cell objects, styles or other sheet metadata are built. Cells holding
+neither a value nor a formula (formatted blanks) are skipped.
+"""
+
+import io
+import zipfile
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from xml.etree.ElementTree import ParseError, fromstring, iterparse
+
+from openpyxl.formula.translate import Translator
+from openpyxl.styles.numbers import builtin_format_code, is_date_format, is_timedelta_format
+from openpyxl.utils.cell import column_index_from_string, get_column_letter
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_ISO8601, from_excel
+
+from workbook_parts import MAIN_NS, WorkbookPackageError, parse_defined_names, workbook_layout
+
+ROW_TAG = f'{MAIN_NS}row'
+VALUE_TAG = f'{MAIN_NS}v'
+FORMULA_TAG = f'{MAIN_NS}f'
+INLINE_STRING_TAG = f'{MAIN_NS}is'
+STRING_ITEM_TAG = f'{MAIN_NS}si'
+TEXT_TAG = f'{MAIN_NS}t'
+RUN_TAG = f'{MAIN_NS}r'
+
+# (column, formula, cached value, style id) of one cell
+XlsxCell = Tuple[int, Optional[str], Any, int]
+
+_DIGITS = '0123456789'
+
+
+def _text_content(element) -> str:
+    """Plain text of a string item: its ``<t>`` plus the ``<t>`` of every rich text run"""
+    snippets = []
+    for child in element:
+        if child.tag == TEXT_TAG:
+            if child.text is not None:
+                snippets.append(child.text)
+        elif child.tag == RUN_TAG:
+            for part in child:
+                if part.tag == TEXT_TAG and part.text is not None:
+                    snippets.append(part.text)
+    return ''.join(snippets)
+
+
+def _cast_number(value: str):
+    if '.' in value or 'E' in value or 'e' in value:
+        return float(value)
+    return int(value)
+
+
+class XlsxWorkbook:
+    """An open .xlsx package whose sheets are streamed on demand"""
+
+    def __init__(self, source):
+        if isinstance(source, (bytes, bytearray)):
+            source = io.BytesIO(source)
+        try:
+            self._package = zipfile.ZipFile(source)
+        except zipfile.BadZipFile as e:
+            raise WorkbookPackageError(str(e)) from e
+        try:
+            workbook_xml, sheets, shared_parts = workbook_layout(self._package)
+            self._sheet_parts = dict(sheets)
+            self.sheetnames = [name for name, _ in sheets]
+            self.epoch = self._read_epoch(workbook_xml)
+            # (name, scope sheet or None, definition)
+            self.defined_names = parse_defined_names(workbook_xml)
+            self.shared_strings = self._read_shared_strings(shared_parts.get('sharedStrings'))
+            self.date_styles, self.timedelta_styles = self._read_date_styles(shared_parts.get('styles'))
+        except (zipfile.BadZipFile, KeyError, ParseError) as e:
+            self._package.close()
+            raise WorkbookPackageError(str(e)) from e
+        except WorkbookPackageError:
+            self._package.close()
+            raise
+
+    def __getitem__(self, sheet_name: str) -> 'XlsxSheet':
+        if sheet_name not in self._sheet_parts:
+            raise KeyError(f"Worksheet {sheet_name} does not exist.")
+        return XlsxSheet(self, sheet_name, self._sheet_parts[sheet_name])
+
+    def __enter__(self) -> 'XlsxWorkbook':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._package.close()
+
+    def open_part(self, part: str):
+        return self._package.open(part)
+
+    def has_part(self, part: Optional[str]) -> bool:
+        return bool(part) and part in self._package.NameToInfo
+
+    def _read_epoch(self, workbook_xml: bytes):
+        properties = fromstring(workbook_xml).find(f'{MAIN_NS}workbookPr')
+        date1904 = properties.get('date1904', '') if properties is not None else ''
+        return CALENDAR_MAC_1904 if date1904.lower() in ('1', 'true') else CALENDAR_WINDOWS_1900
+
+    def _read_shared_strings(self, part: Optional[str]) -> List[str]:
+        strings = []
+        if not self.has_part(part):
+            return strings
+        with self.open_part(part) as stream:
+            for _, element in iterparse(stream):
+                if element.tag == STRING_ITEM_TAG:
+                    strings.append(_text_content(element).replace('x005F_', ''))
+                    element.clear()
+        return strings
+
+    def _read_date_styles(self, part: Optional[str]) -> Tuple[Set[int], Set[int]]:
+        """Indexes of the cell formats that show numbers as dates, and those that show durations"""
+        date_styles, timedelta_styles = set(), set()
+        if not self.has_part(part):
+            return date_styles, timedelta_styles
+        styles = fromstring(self._package.read(part))
+        custom_formats = {}
+        num_fmts = styles.find(f'{MAIN_NS}numFmts')
+        if num_fmts is not None:
+            for num_fmt in num_fmts.iter(f'{MAIN_NS}numFmt'):
+                custom_formats[int(num_fmt.get('numFmtId'))] = num_fmt.get('formatCode')
+        cell_xfs = styles.find(f'{MAIN_NS}cellXfs')
+        if cell_xfs is not None:
+            for index, xf in enumerate(cell_xfs.iter(f'{MAIN_NS}xf')):
+                num_fmt_id = int(xf.get('numFmtId', 0))
+                code = custom_formats[num_fmt_id] if num_fmt_id in custom_formats else builtin_format_code(num_fmt_id)
+                if is_date_format(code):
+                    date_styles.add(index)
+                if is_timedelta_format(code):
+                    timedelta_styles.add(index)
+        return date_styles, timedelta_styles
+
+
+class XlsxSheet:
+    """One worksheet of an XlsxWorkbook"""
+
+    def __init__(self, workbook: XlsxWorkbook, title: str, part: str):
+        self.parent = workbook
+        self.title = title
+        self.part = part
+
+    def iter_rows(self) -> Iterator[Tuple[int, List[XlsxCell]]]:
+        """Stream non-empty rows as (row number, cells), cells in column order"""
+        if not self.parent.has_part(self.part):
+            return
+        with self.parent.open_part(self.part) as stream:
+            row_num = 0
+            shared_formulas: Dict[str, Translator] = {}
+            try:
+                for _, element in iterparse(stream):
+                    if element.tag != ROW_TAG:
+                        continue
+                    row_ref = element.get('r')
+                    row_num = int(float(row_ref)) if row_ref else row_num + 1
+                    cells = self._read_row(element, row_num, shared_formulas)
+                    element.clear()
+                    if cells:
+                        yield row_num, cells
+            except ParseError as e:
+                raise WorkbookPackageError(f"{self.title}: {e}") from e
+
+    def _read_row(self, row, row_num: int, shared_formulas: Dict[str, Translator]) -> List[XlsxCell]:
+        workbook = self.parent
+        shared_strings = workbook.shared_strings
+        date_styles = workbook.date_styles
+        cells = []
+        column = 0
+        ordered = True
+        for cell in row:
+            coordinate = cell.get('r')
+            if coordinate:
+                previous = column
+                column = column_index_from_string(coordinate.rstrip(_DIGITS))
+                ordered = ordered and column > previous
+            else:
+                column += 1
+
+            style_id = cell.get('s')
+            style_id = int(style_id) if style_id else 0
+            data_type = cell.get('t', 'n')
+            raw = formula_element = inline = None
+            for child in cell:
+                tag = child.tag
+                if tag == VALUE_TAG:
+                    raw = child.text
+                elif tag == FORMULA_TAG:
+                    formula_element = child
+                elif tag == INLINE_STRING_TAG:
+                    inline = child
+
+            value = None
+            if raw:
+                if data_type == 'n':
+                    value = _cast_number(raw)
+                    if style_id in date_styles:
+                        try:
+                            value = from_excel(value, workbook.epoch,
+                                               timedelta=style_id in workbook.timedelta_styles)
+                        except (OverflowError, ValueError):
+                            value = '#VALUE!'
+                elif data_type == 's':
+                    value = shared_strings[int(raw)]
+                elif data_type == 'b':
+                    value = bool(int(raw))
+                elif data_type == 'd':
+                    value = from_ISO8601(raw)
+                else:
+                    # 'str' (formula string results) and 'e' (error codes) are kept as text
+                    value = raw
+            elif inline is not None and data_type == 'inlineStr':
+                value = _text_content(inline)
+
+            formula = None
+            if formula_element is not None:
+                formula = self._formula_text(formula_element, coordinate or f'{get_column_letter(column)}{row_num}',
+                                             shared_formulas)
+            elif value is None:
+                continue
+            cells.append((column, formula, value, style_id))
+
+        if not ordered:
+            # Out-of-order or repeated cells: later ones win, as in openpyxl
+            cells = sorted({cell[0]: cell for cell in cells}.values(), key=lambda cell: cell[0])
+        return cells
+
+    @staticmethod
+    def _formula_text(element, coordinate: str, shared_formulas: Dict[str, Translator]) -> str:
+        formula_type = element.get('t')
+        text = '=' + (element.text or '')
+        if formula_type == 'shared':
+            index = element.get('si')
+            translator = shared_formulas.get(index)
+            if translator is not None:
+                text = translator.translate_formula(coordinate)
+            elif text != '=':
+                shared_formulas[index] = Translator(text, coordinate)
+        elif formula_type == 'dataTable':
+            inputs = [element.get(key) for key in ('r1', 'r2') if element.get(key)]
+            text = f"=TABLE({','.join(inputs)})"
+        return text
+
@@ -1,16 +1,19 @@
 import { NextRequest, NextResponse } from 'next/server';
+import { COLUMNAR_MEDIA_TYPE } from '@/lib/timeline-columnar';
 
 // Timeline generation endpoint
 export async function POST(request: NextRequest) {
   try {
     const timelineInputs = await request.json();
     console.log('API Route - Received inputs:', timelineInputs);
+    const wantsColumnar = (request.headers.get('accept') || '').includes(COLUMNAR_MEDIA_TYPE);
     
     // Call backend FastAPI service for timeline generation
     const backendResponse = await fetch('http://localhost:8000/generate-timelines', {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
+        'Accept': wantsColumnar ? COLUMNAR_MEDIA_TYPE : 'application/json',
       },
       body: JSON.stringify(timelineInputs),
     });
@@ -23,6 +26,13 @@ export async function POST(request: NextRequest) {
       throw new Error(`Backend API error: ${backendResponse.status} - ${errorText}`);
     }
 
+    // Pass the compact binary encoding straight through to the browser
+    if (wantsColumnar) {
+      return new NextResponse(await backendResponse.arrayBuffer(), {
+        headers: { 'Content-Type': COLUMNAR_MEDIA_TYPE },
+      });
+    }
+
     const timelines = await backendResponse.json();
     console.log('API Route - Sending timelines:', Object.keys(timelines));
     
@@ -5,6 +5,7 @@ import RouteProtection from "@/components/RouteProtection";
 import DashboardLayout from "@/components/DashboardLayout";
 import TimelineInputs from "@/components/TimelineInputs";
 import TimelineGenerator from "@/components/TimelineGenerator";
+import { COLUMNAR_MEDIA_TYPE, decodeColumnarTimelines } from "@/lib/timeline-columnar";
 
 export default function TimelinesPage() {
   const [timelineInputs, setTimelineInputs] = useState<any>({});
@@ -25,12 +26,13 @@ export default function TimelinesPage() {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          'Accept': COLUMNAR_MEDIA_TYPE,
         },
         body: JSON.stringify(timelineInputs),
       });
       
       if (response.ok) {
-        const timelines = await response.json();
+        const timelines = decodeColumnarTimelines(await response.arrayBuffer());
         console.log('Received timelines:', timelines);
         setGeneratedTimelines(timelines);
       } else {
@@ -2,14 +2,15 @@
 
 import React, { useState, useEffect } from 'react';
 import { useBackendAPI, useAnalysisData } from '@/hooks/useBackendAPI';
-import { backendAPI } from '@/lib/backend-api';
+import { AnalysisSession, backendAPI } from '@/lib/backend-api';
 
 interface BackendIntegrationProps {
   onAnalysisComplete?: (analysis: any) => void;
   onError?: (error: string) => void;
+  session?: AnalysisSession;
 }
 
-export default function BackendIntegration({ onAnalysisComplete, onError }: BackendIntegrationProps) {
+export default function BackendIntegration({ onAnalysisComplete, onError, session }: BackendIntegrationProps) {
   const {
     analysis,
     loading,
@@ -20,7 +21,7 @@ export default function BackendIntegration({ onAnalysisComplete, onError }: Back
     exportToCSV,
     uploadExcelFile,
     clearError
-  } = useBackendAPI();
+  } = useBackendAPI(session);
 
   const {
     inputFields,
@@ -71,13 +72,12 @@ export default function BackendIntegration({ onAnalysisComplete, onError }: Back
 
   const handleExportCSV = async () => {
     try {
-      const csvData = await exportToCSV();
-      // Create and download CSV file
-      const blob = new Blob([JSON.stringify(csvData, null, 2)], { type: 'application/json' });
+      const blob = await exportToCSV();
+      // Download the CSV file
       const url = URL.createObjectURL(blob);
       const a = document.createElement('a');
       a.href = url;
-      a.download = 'excel-analysis.json';
+      a.download = 'excel-analysis.csv';
       document.body.appendChild(a);
       a.click();
       document.body.removeChild(a);
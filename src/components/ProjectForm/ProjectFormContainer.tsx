@@ -690,7 +690,12 @@ export default function ProjectFormContainer({ isViewMode = false }: ProjectForm
       case 0:
         return <ProjectTypeStep {...commonProps} />;
       case 1:
-        return <RealInputSheetStep {...commonProps} />;
+        return (
+          <RealInputSheetStep
+            {...commonProps}
+            session={projectId ? { projectId, versionId: formData.version || undefined } : undefined}
+          />
+        );
       default:
         return <ProjectTypeStep {...commonProps} />;
     }
@@ -5,6 +5,7 @@ import { COMPREHENSIVE_SECTIONS, calculateComprehensiveFormulas, getDataStatisti
 import { COMPREHENSIVE_ASSUMPTIONS } from '@/lib/comprehensive-assumptions';
 import { formulaEngine } from '@/lib/financial-formula-engine';
 import BackendIntegration from '@/components/BackendIntegration';
+import { AnalysisSession } from '@/lib/backend-api';
 import { 
   ChevronDownIcon, 
   ChevronRightIcon,
@@ -22,13 +23,16 @@ interface RealInputSheetStepProps {
   errors: Record<string, string>;
   handleChange: (e: React.ChangeEvent<HTMLInputElement | HTMLSelectElement>) => void;
   isViewMode?: boolean;
+  // Project version whose backend analysis session this step reads and writes
+  session?: AnalysisSession;
 }
 
 export default function RealInputSheetStep({ 
   formData, 
   errors, 
   handleChange, 
-  isViewMode = false 
+  isViewMode = false,
+  session
 }: RealInputSheetStepProps) {
   const [expandedSections, setExpandedSections] = useState<Set<string>>(new Set(['project_basic_information']));
   const [expandedHeadings, setExpandedHeadings] = useState<Set<string>>(new Set());
@@ -308,6 +312,7 @@ export default function RealInputSheetStep({
       <BackendIntegration 
         onAnalysisComplete={handleBackendAnalysisComplete}
         onError={handleBackendError}
+        session={session}
       />
 
       {/* Header */}
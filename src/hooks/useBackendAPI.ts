@@ -1,5 +1,5 @@
-import { useState, useEffect, useCallback } from 'react';
-import { backendAPI, ExcelAnalysisResult, FieldInfo, SectionInfo } from '@/lib/backend-api';
+import { useState, useEffect, useCallback, useMemo } from 'react';
+import { AnalysisSession, backendAPI, ExcelAnalysisResult, FieldInfo, SectionInfo } from '@/lib/backend-api';
 
 export interface UseBackendAPIState {
   analysis: ExcelAnalysisResult | null;
@@ -17,11 +17,20 @@ export interface UseBackendAPIActions {
   clearError: () => void;
 }
 
-export function useBackendAPI(): UseBackendAPIState & UseBackendAPIActions {
+// Requests go to the session of the given project version; omitted means the default session
+export function useBackendAPI(session?: AnalysisSession): UseBackendAPIState & UseBackendAPIActions {
+  const projectId = session?.projectId;
+  const versionId = session?.versionId;
+
   const [analysis, setAnalysis] = useState<ExcelAnalysisResult | null>(null);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [isConnected, setIsConnected] = useState(false);
+  // Stable while the ids are unchanged, so callers may pass a fresh object on every render
+  const currentSession = useMemo<AnalysisSession | undefined>(
+    () => (projectId ? { projectId, versionId } : undefined),
+    [projectId, versionId]
+  );
 
   // Check backend connection on mount
   useEffect(() => {
@@ -43,7 +52,7 @@ export function useBackendAPI(): UseBackendAPIState & UseBackendAPIActions {
     setError(null);
     
     try {
-      const result = await backendAPI.analyzeExcelFile(filename);
+      const result = await backendAPI.analyzeExcelFile(filename, currentSession);
       setAnalysis(result);
       setIsConnected(true);
     } catch (err) {
@@ -52,14 +61,14 @@ export function useBackendAPI(): UseBackendAPIState & UseBackendAPIActions {
     } finally {
       setLoading(false);
     }
-  }, []);
+  }, [currentSession]);
 
   const getCurrentAnalysis = useCallback(async () => {
     setLoading(true);
     setError(null);
     
     try {
-      const result = await backendAPI.getCurrentAnalysis();
+      const result = await backendAPI.getCurrentAnalysis(currentSession);
       setAnalysis(result);
       setIsConnected(true);
     } catch (err) {
@@ -68,14 +77,14 @@ export function useBackendAPI(): UseBackendAPIState & UseBackendAPIActions {
     } finally {
       setLoading(false);
     }
-  }, []);
+  }, [currentSession]);
 
   const exportToCSV = useCallback(async () => {
     setLoading(true);
     setError(null);
     
     try {
-      const result = await backendAPI.exportToCSV();
+      const result = await backendAPI.exportToCSV(currentSession);
       setIsConnected(true);
       return result;
     } catch (err) {
@@ -85,14 +94,14 @@ export function useBackendAPI(): UseBackendAPIState & UseBackendAPIActions {
     } finally {
       setLoading(false);
     }
-  }, []);
+  }, [currentSession]);
 
   const uploadExcelFile = useCallback(async (file: File) => {
     setLoading(true);
     setError(null);
     
     try {
-      const result = await backendAPI.uploadExcelFile(file);
+      const result = await backendAPI.uploadExcelFile(file, currentSession);
       setAnalysis(result);
       setIsConnected(true);
     } catch (err) {
@@ -101,7 +110,7 @@ export function useBackendAPI(): UseBackendAPIState & UseBackendAPIActions {
     } finally {
       setLoading(false);
     }
-  }, []);
+  }, [currentSession]);
 
   const refreshAnalysis = useCallback(async () => {
     if (analysis) {
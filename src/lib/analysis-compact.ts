@@ -0,0 +1,77 @@
+// Expander for the backend's compact analysis schema (?compact=true)
+import type { ExcelAnalysisResult, FieldInfo, SectionInfo } from './backend-api';
+
+export const COMPACT_SCHEMA = 'compact-1';
+
+interface CompactHeading {
+  id: string;
+  name: string;
+  fields: number[];
+}
+
+interface CompactSection {
+  id: string;
+  name: string;
+  row: number;
+  sheet?: string;
+  headings: Record<string, CompactHeading>;
+  fieldRange: [number, number];
+}
+
+export interface CompactAnalysis {
+  schema: string;
+  totalSheets: number;
+  totalFields: number;
+  inputFields: number;
+  calculatedFields: number;
+  formulaPatterns: Record<string, number>;
+  analysisTimestamp: string;
+  fieldColumns: string[];
+  internedColumns: string[];
+  strings: string[];
+  sections: CompactSection[];
+  fields: any[][];
+}
+
+// Rebuild the full ExcelAnalysisResult shape; heading fields share the section's field objects
+export const expandCompactAnalysis = (compact: CompactAnalysis): ExcelAnalysisResult => {
+  if (compact.schema !== COMPACT_SCHEMA) {
+    throw new Error(`Unsupported analysis schema: ${compact.schema}`);
+  }
+
+  const interned = new Set(compact.internedColumns);
+  const fields = compact.fields.map((values) => {
+    const field: Record<string, any> = {};
+    compact.fieldColumns.forEach((column, index) => {
+      const value = values[index];
+      field[column] = interned.has(column) && value !== null ? compact.strings[value] : value;
+    });
+    return field as FieldInfo;
+  });
+
+  const sections: SectionInfo[] = compact.sections.map((section) => {
+    const [start, count] = section.fieldRange;
+    const headings: Record<string, any> = {};
+    Object.entries(section.headings).forEach(([name, heading]) => {
+      headings[name] = { id: heading.id, name: heading.name, fields: heading.fields.map((index) => fields[index]) };
+    });
+    return {
+      id: section.id,
+      name: section.name,
+      ...(section.sheet !== undefined ? { sheet: section.sheet } : {}),
+      row: section.row,
+      headings,
+      fields: fields.slice(start, start + count)
+    };
+  });
+
+  return {
+    totalSheets: compact.totalSheets,
+    totalFields: compact.totalFields,
+    inputFields: compact.inputFields,
+    calculatedFields: compact.calculatedFields,
+    sections,
+    formulaPatterns: compact.formulaPatterns,
+    analysisTimestamp: compact.analysisTimestamp
+  };
+};
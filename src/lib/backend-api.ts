@@ -1,4 +1,6 @@
 // Backend API service for connecting to FastAPI
+import { expandCompactAnalysis } from './analysis-compact';
+
 const BACKEND_URL = 'http://localhost:8000';
 
 export interface FieldInfo {
@@ -21,6 +23,7 @@ export interface FieldInfo {
 export interface SectionInfo {
   id: string;
   name: string;
+  sheet?: string;
   row: number;
   headings: Record<string, any>;
   fields: FieldInfo[];
@@ -36,21 +39,54 @@ export interface ExcelAnalysisResult {
   analysisTimestamp: string;
 }
 
-export interface CSVExportData {
-  metadata: {
-    totalSheets: number;
-    totalFields: number;
-    inputFields: number;
-    calculatedFields: number;
-    analysisTimestamp: string;
+export interface UploadJobStatus {
+  jobId: string;
+  filename: string;
+  status: 'queued' | 'running' | 'completed' | 'failed';
+  progress: {
+    sheetsDone: number;
+    sheetsTotal: number;
+    currentSheet: string | null;
   };
-  sections: Array<{
-    id: string;
-    name: string;
-    row: number;
-    fieldCount: number;
-  }>;
-  fields: FieldInfo[];
+  error: string | null;
+  createdAt: string;
+  updatedAt: string;
+  // Set once the analysis is published; diff only when the session had a base version
+  analysisId?: number;
+  baseAnalysisId?: number | null;
+  diff?: {
+    summary: { added: number; removed: number; changed: number };
+    changedSheets: string[];
+  };
+  diffUrl?: string;
+}
+
+// One entry per requested reference; error is set instead of value when it cannot be resolved
+export interface ResolvedReference {
+  ref: string;
+  value?: any;
+  source?: string;
+  range?: string | null;
+  name?: string;
+  error?: string;
+}
+
+// Project version an analysis belongs to; omitted means the default session
+export interface AnalysisSession {
+  projectId: string;
+  versionId?: string;
+}
+
+function sessionParams(session?: AnalysisSession, params: Record<string, string> = {}): string {
+  const query = new URLSearchParams(params);
+  if (session) {
+    query.set('project_id', session.projectId);
+    if (session.versionId) {
+      query.set('version_id', session.versionId);
+    }
+  }
+  const encoded = query.toString();
+  return encoded ? `?${encoded}` : '';
 }
 
 class BackendAPI {
@@ -68,35 +104,55 @@ class BackendAPI {
     return response.json();
   }
 
-  async analyzeExcelFile(filename: string): Promise<ExcelAnalysisResult> {
-    const response = await fetch(`${this.baseURL}/analyze-excel/${filename}`);
+  async analyzeExcelFile(filename: string, session?: AnalysisSession): Promise<ExcelAnalysisResult> {
+    const response = await fetch(`${this.baseURL}/analyze-excel/${filename}${sessionParams(session)}`);
     if (!response.ok) {
       throw new Error(`Excel analysis failed: ${response.statusText}`);
     }
     return response.json();
   }
 
-  async getCurrentAnalysis(): Promise<ExcelAnalysisResult> {
-    const response = await fetch(`${this.baseURL}/get-analysis`);
+  async getCurrentAnalysis(session?: AnalysisSession): Promise<ExcelAnalysisResult> {
+    const response = await fetch(`${this.baseURL}/get-analysis${sessionParams(session, { compact: 'true' })}`);
     if (!response.ok) {
       throw new Error(`Get analysis failed: ${response.statusText}`);
     }
-    return response.json();
+    return expandCompactAnalysis(await response.json());
   }
 
-  async exportToCSV(): Promise<CSVExportData> {
-    const response = await fetch(`${this.baseURL}/export-csv`);
+  async exportToCSV(session?: AnalysisSession): Promise<Blob> {
+    const response = await fetch(`${this.baseURL}/export-csv${sessionParams(session)}`);
     if (!response.ok) {
       throw new Error(`CSV export failed: ${response.statusText}`);
     }
-    return response.json();
+    return response.blob();
   }
 
-  async uploadExcelFile(file: File): Promise<ExcelAnalysisResult> {
+  // Resolve case selectors ('Inputs!F61'), named cells and defined names, optionally for other selector values
+  async resolveReferences(
+    refs: string[],
+    names: Record<string, any> = {},
+    session?: AnalysisSession
+  ): Promise<ResolvedReference[]> {
+    const projectId = encodeURIComponent(session?.projectId ?? 'default');
+    const versionId = encodeURIComponent(session?.versionId ?? 'current');
+    const response = await fetch(`${this.baseURL}/sessions/${projectId}/${versionId}/resolve`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ refs, names }),
+    });
+    if (!response.ok) {
+      throw new Error(`Reference resolution failed: ${response.statusText}`);
+    }
+    const result: { results: ResolvedReference[] } = await response.json();
+    return result.results;
+  }
+
+  async uploadExcelFile(file: File, session?: AnalysisSession): Promise<ExcelAnalysisResult> {
     const formData = new FormData();
     formData.append('file', file);
 
-    const response = await fetch(`${this.baseURL}/upload-excel`, {
+    const response = await fetch(`${this.baseURL}/upload-excel${sessionParams(session)}`, {
       method: 'POST',
       body: formData,
     });
@@ -104,9 +160,43 @@ class BackendAPI {
     if (!response.ok) {
       throw new Error(`File upload failed: ${response.statusText}`);
     }
+    const job: UploadJobStatus = await response.json();
+    return this.waitForUploadJob(job.jobId);
+  }
+
+  async getUploadJob(jobId: string): Promise<UploadJobStatus> {
+    const response = await fetch(`${this.baseURL}/upload-jobs/${jobId}`);
+    if (!response.ok) {
+      throw new Error(`Upload job lookup failed: ${response.statusText}`);
+    }
     return response.json();
   }
 
+  // Poll a queued upload until its analysis is ready
+  async waitForUploadJob(
+    jobId: string,
+    onProgress?: (job: UploadJobStatus) => void,
+    intervalMs: number = 500
+  ): Promise<ExcelAnalysisResult> {
+    for (;;) {
+      const job = await this.getUploadJob(jobId);
+      onProgress?.(job);
+      if (job.status === 'failed') {
+        throw new Error(`File analysis failed: ${job.error}`);
+      }
+      if (job.status === 'completed') {
+        break;
+      }
+      await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    }
+
+    const response = await fetch(`${this.baseURL}/upload-jobs/${jobId}/result?compact=true`);
+    if (!response.ok) {
+      throw new Error(`Upload result failed: ${response.statusText}`);
+    }
+    return expandCompactAnalysis(await response.json());
+  }
+
   // Utility methods for data transformation
   transformToComprehensiveSections(analysis: ExcelAnalysisResult): any {
     const comprehensiveSections: any = {};
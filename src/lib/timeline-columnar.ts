@@ -0,0 +1,89 @@
+// Decoder for the backend's columnar timeline encoding
+// (Accept: application/vnd.timeline.columnar on /generate-timelines)
+export const COLUMNAR_MEDIA_TYPE = 'application/vnd.timeline.columnar';
+
+const MAGIC = 'TLC1';
+const MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'];
+const MS_PER_DAY = 86400000;
+
+interface BufferDescriptor {
+  dtype: 'int8' | 'int16' | 'int32' | 'float64' | 'date32' | 'json';
+  offset?: number;
+  length?: number;
+  values?: any[];
+}
+
+const readTypedArray = (buffer: ArrayBuffer, base: number, descriptor: BufferDescriptor) => {
+  const start = base + (descriptor.offset ?? 0);
+  const length = descriptor.length ?? 0;
+  switch (descriptor.dtype) {
+    case 'int8':
+      return new Int8Array(buffer, start, length);
+    case 'int16':
+      return new Int16Array(buffer, start, length);
+    case 'int32':
+    case 'date32':
+      return new Int32Array(buffer, start, length);
+    case 'float64':
+      return new Float64Array(buffer, start, length);
+    default:
+      throw new Error(`Unsupported columnar dtype: ${descriptor.dtype}`);
+  }
+};
+
+// Format day offsets the same way the JSON response does ('%d-%b-%y')
+export const formatDayOffset = (days: number): string => {
+  const date = new Date(days * MS_PER_DAY);
+  const day = String(date.getUTCDate()).padStart(2, '0');
+  const year = String(date.getUTCFullYear() % 100).padStart(2, '0');
+  return `${day}-${MONTHS[date.getUTCMonth()]}-${year}`;
+};
+
+const decodeValues = (buffer: ArrayBuffer, base: number, descriptor: BufferDescriptor): any[] => {
+  if (descriptor.dtype === 'json') {
+    return descriptor.values ?? [];
+  }
+  const values = Array.from(readTypedArray(buffer, base, descriptor));
+  return descriptor.dtype === 'date32' ? values.map(formatDayOffset) : values;
+};
+
+const decodeTimeline = (buffer: ArrayBuffer, base: number, timeline: any) => {
+  const columnEntries = Object.entries(timeline.columns || {}) as [string, BufferDescriptor][];
+  const columnValues = columnEntries.map(([name, descriptor]) => [name, decodeValues(buffer, base, descriptor)] as const);
+  const periodCount = columnValues.length > 0 ? columnValues[0][1].length : 0;
+
+  const columns = Array.from({ length: periodCount }, (_, index) => {
+    const period: Record<string, any> = {};
+    columnValues.forEach(([name, values]) => {
+      period[name] = values[index];
+    });
+    return period;
+  });
+
+  const rows = (timeline.rows || []).map((row: any) => ({
+    ...row,
+    values: decodeValues(buffer, base, row.values)
+  }));
+
+  return { ...timeline, columns, rows };
+};
+
+// Rebuild the JSON-shaped TimelineResponse from a columnar payload
+export const decodeColumnarTimelines = (buffer: ArrayBuffer): any => {
+  const view = new DataView(buffer);
+  const magic = new TextDecoder().decode(new Uint8Array(buffer, 0, 4));
+  if (magic !== MAGIC) {
+    throw new Error('Invalid columnar timeline payload');
+  }
+
+  const headerLength = view.getUint32(4, true);
+  const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 8, headerLength)));
+  const base = 8 + headerLength;
+
+  const decoded: Record<string, any> = {};
+  Object.entries(header).forEach(([key, value]: [string, any]) => {
+    if (key === 'version') return;
+    decoded[key] = value && value.rows && value.columns ? decodeTimeline(buffer, base, value) : value;
+  });
+  return decoded;
+};